@@ -1,10 +1,18 @@
 import os
 import pathlib
+import sys
 import textwrap
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 
 import yaml
 
+# chat/ lives next to this package; make it importable for the retriever
+_PKG = pathlib.Path(__file__).resolve().parents[1]
+if str(_PKG) not in sys.path:
+    sys.path.insert(0, str(_PKG))
+
+from chat.rag_index import RagIndex
+
 CONFIG_PATH = pathlib.Path(__file__).parent / "config_llm.yaml"
 
 
@@ -29,6 +37,13 @@ class AegisLLMConfig:
         )
         self.max_context_files = int(asst.get("max_context_files", 10))
 
+        rag = raw.get("rag", {})
+        self.rag_enabled = bool(rag.get("enabled", True))
+        self.rag_index_path = pathlib.Path(rag.get("index_path", self.root / "rag" / "index.jsonl"))
+        self.rag_top_k = int(rag.get("top_k", 6))
+        # 0 = keyword (BM25) only, 1 = embeddings only
+        self.rag_alpha = float(rag.get("alpha", 0.5))
+
 
 def load_config() -> AegisLLMConfig:
     with open(CONFIG_PATH, "r", encoding="utf-8") as f:
@@ -44,41 +59,45 @@ class AegisLLM:
     Later: we swap in actual local model calls.
     """
 
-    def __init__(self, cfg: AegisLLMConfig):
+    def __init__(self, cfg: AegisLLMConfig, retriever: Optional[RagIndex] = None):
         self.cfg = cfg
+        # Local RAG index (BM25 + hashing embeddings); None disables retrieval
+        if retriever is None and cfg.rag_enabled:
+            retriever = RagIndex(cfg.rag_index_path)
+        self.retriever = retriever
+
+    def retrieve(self, query: str, k: int | None = None) -> List[str]:
+        """
+        Top-k chunk texts for query from the local index (no network).
+        """
+        if self.retriever is None:
+            return []
+        hits = self.retriever.search(query, k or self.cfg.rag_top_k, alpha=self.cfg.rag_alpha)
+        return [f"{h.get('path')}#{h.get('chunk_id')}\n{h['text']}" for h in hits]
 
     def chat(
         self,
         system_prompt: str,
         user_prompt: str,
         extra_context: List[str] | None = None,
+        retrieve: bool = True,
     ) -> str:
         """
         For now this is a stub. We keep the signature stable so we can
         replace the implementation later without touching call sites.
+
+        With retrieve=True, chunks retrieved for user_prompt are appended
+        to extra_context.
         """
+        if retrieve:
+            extra_context = list(extra_context or []) + self.retrieve(user_prompt)
+
         context_blob = ""
         if extra_context:
             context_blob = "\n\n".join(
                 f"[CTX {i+1}]\n{c}" for i, c in enumerate(extra_context)
             )
 
-if __name__ == "__main__":
-    cfg = load_config()
-    llm = AegisLLM(cfg)
-
-    system = (
-        f"You are {cfg.assistant_name}, {cfg.assistant_role} "
-        "You specialize in the Aegis repo structure and strategy code."
-    )
-
-    user = "Summarize the purpose of this Aegis project in 3-5 bullet points."
-
-    # For now we don't pass extra_context; later we'll plug in tools_local
-    reply = llm.chat(system_prompt=system, user_prompt=user, extra_context=None)
-    print(reply)
-
-
         # Stubbed answer – this is where the real model call will go.
         # For now we just echo the prompts so you can test wiring.
         response = textwrap.dedent(
@@ -98,3 +117,19 @@ if __name__ == "__main__":
         ).strip()
 
         return response
+
+
+if __name__ == "__main__":
+    cfg = load_config()
+    llm = AegisLLM(cfg)
+
+    system = (
+        f"You are {cfg.assistant_name}, {cfg.assistant_role} "
+        "You specialize in the Aegis repo structure and strategy code."
+    )
+
+    user = "Summarize the purpose of this Aegis project in 3-5 bullet points."
+
+    # For now we don't pass extra_context; later we'll plug in tools_local
+    reply = llm.chat(system_prompt=system, user_prompt=user, extra_context=None)
+    print(reply)
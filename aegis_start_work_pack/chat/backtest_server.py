@@ -1,8 +1,8 @@
-from fastapi import FastAPI, Body, HTTPException
+from fastapi import FastAPI, Body, HTTPException, Header
 from pydantic import BaseModel
 from typing import Optional, List, Dict, Any
 from pathlib import Path
-import subprocess, json, os, yaml
+import subprocess, json, os, yaml, threading, asyncio, time
 from io import BytesIO
 from fastapi.responses import StreamingResponse
 
@@ -23,6 +23,11 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from strategies.strategy_engine import StrategyResult, run_strategy_on_csv
+from strategies.price_store import STORE_SUFFIX, load_frame
+from chat.run_backtest import run as run_backtest_inprocess, format_report, output_stem
+from chat.jobs import JobQueue, QueueFull, FINISHED, COMPLETE
+from chat.tool_stream import sse
+from strategies.parallel_grid import run_sma_cross_grid_parallel
 
 
 # ---------- CONFIG ----------
@@ -40,6 +45,17 @@ class BacktestRequest(BaseModel):
     fast: int
     slow: int
 
+class JobSubmitRequest(BaseModel):
+    kind: str = "run_backtest"   # run_backtest | run_and_plot | run_and_plot_save
+    request: BacktestRequest
+
+class GridJobRequest(BaseModel):
+    csv_path: str               # absolute or relative to data/backtests
+    fast: List[int]
+    slow: List[int]
+    workers: Optional[int] = None
+    score: str = "abs"          # abs | positive
+
 class RunTaskRequest(BaseModel):
     name: str
     args: Optional[List[str]] = None
@@ -53,12 +69,15 @@ class StrategyRunRequest(BaseModel):
     csv_path: str          # absolute or relative to AEGIS_HOME
     strategy: str          # e.g. "sma_cross"
     params: dict = {}      # e.g. {"fast": 10, "slow": 100}
+    include_equity: bool = True        # False: metrics only, no curve
+    max_points: Optional[int] = None   # downsample equity_curve to at most N points
 
 
 class StrategyRunResponse(BaseModel):
     name: str
     params: dict
     equity_curve: list
+    equity_length: Optional[int] = None  # full curve length before downsampling
     trades: list
     metrics: dict
 
@@ -92,17 +111,52 @@ def _is_under(root: Path, child: Path) -> bool:
     except Exception:
         return False
 
+# pyplot keeps global figure state; job workers plot concurrently
+_PLOT_LOCK = threading.Lock()
+
+def _downsample(values: np.ndarray, max_points: Optional[int]) -> np.ndarray:
+    # Evenly spaced points, always keeping the first and last bar
+    n = len(values)
+    if not max_points or max_points <= 0 or n <= max_points:
+        return values
+    if max_points == 1:
+        return values[-1:]
+    idx = np.unique(np.linspace(0, n - 1, max_points).round().astype(np.int64))
+    return values[idx]
+
+def _open_equity(path: Path) -> np.ndarray:
+    """
+    Equity curve from a per-run .equity.npy, a run JSON (binary reference
+    or legacy inline list), a .store dir or a legacy CSV. Binary sources
+    are memory-mapped, so only the slices actually sent are read.
+    """
+    if path.suffix == ".npy":
+        return np.load(path, mmap_mode="r")
+    if path.suffix == ".json":
+        meta = json.loads(path.read_text(encoding="utf-8"))
+        ref = meta.get("equity")
+        if isinstance(ref, dict) and ref.get("file"):
+            return np.load(path.parent / ref["file"], mmap_mode="r")
+        if "equity_curve" in meta:
+            return np.asarray(meta["equity_curve"], dtype=np.float64)
+        raise ValueError(f"No equity curve in {path.name}")
+    df = load_frame(path)
+    if "equity" not in df.columns:
+        raise ValueError(f"No 'equity' column in {path.name}")
+    return pd.to_numeric(df["equity"], errors="coerce").dropna().to_numpy(dtype=np.float64)
+
 
 
 # ---------- HEALTH ----------
 @app.get("/health")
 def health():
-    return {"status": "ok"}
+    out = {"status": "ok"}
+    if _JOBS is not None:
+        out["jobs"] = _JOBS.stats()
+    return out
 
 # ---------- BACKTEST ----------
-@app.post("/run_backtest")
-def run_backtest(req: BacktestRequest):
-    cfg = load_cfg()
+def _run_backtest_subprocess(req: BacktestRequest, cfg: dict) -> dict:
     py_exe   = Path(cfg["executor_python"]).resolve()
     script   = Path(cfg["backtest_script"]).resolve()
     logs_dir = Path(cfg["logs_dir"]).resolve()
@@ -114,12 +168,7 @@ def run_backtest(req: BacktestRequest):
         errors["backtest_script"] = f"Not a file: {script}"
     if errors:
         # EARLY RETURN on config errors
-        return {
-            "symbol": req.symbol,
-            "stdout": "",
-            "stderr": json.dumps(errors),
-            "exit_code": 2
-        }
+        return {"stdout": "", "stderr": json.dumps(errors), "exit_code": 2}
 
     # Run the backtest with full parameters
     cmd = [
@@ -143,7 +192,8 @@ def run_backtest(req: BacktestRequest):
     if not csv_path:
         logs_dir.mkdir(parents=True, exist_ok=True)
         try:
-            candidates = list(logs_dir.glob(f"{req.symbol}_SMA{req.fast}-{req.slow}_*.csv"))
+            stem = f"{req.symbol}_SMA{req.fast}-{req.slow}_*"
+            candidates = list(logs_dir.glob(f"{stem}.csv")) + list(logs_dir.glob(f"{stem}{STORE_SUFFIX}"))
             if candidates:
                 latest = max(candidates, key=lambda p: p.stat().st_mtime)
                 if datetime.fromtimestamp(latest.stat().st_mtime) > datetime.now() - timedelta(minutes=10):
@@ -151,6 +201,39 @@ def run_backtest(req: BacktestRequest):
         except Exception:
             pass
 
+    result["csv_path"] = csv_path
+    return result
+
+def _run_backtest_inprocess(req: BacktestRequest, cfg: dict) -> dict:
+    # Same load_prices/sma_crossover/summarize path as the script, minus
+    # interpreter startup, and the output path comes back directly.
+    logs_dir = Path(cfg["logs_dir"]).resolve()
+    try:
+        out = run_backtest_inprocess(req.symbol, req.start, req.end, req.fast, req.slow, outdir=logs_dir)
+    except ValueError as e:
+        return {"stdout": f"ERROR: {e}", "stderr": "", "exit_code": 2, "csv_path": None}
+    except Exception as e:
+        return {"stdout": "", "stderr": repr(e), "exit_code": 1, "csv_path": None}
+
+    return {
+        "stdout": format_report(req.symbol, req.start, req.end, out["stats"], out["path"]),
+        "stderr": "",
+        "exit_code": 0,
+        "csv_path": out["path"],
+        "stats": out["stats"],
+    }
+
+@app.post("/run_backtest")
+def run_backtest(req: BacktestRequest):
+    cfg = load_cfg()
+
+    # "inprocess" (default) or "subprocess" (legacy: fresh interpreter per run)
+    execution = cfg.get("execution", "inprocess")
+    if execution == "subprocess":
+        result = _run_backtest_subprocess(req, cfg)
+    else:
+        result = _run_backtest_inprocess(req, cfg)
+
     # FINAL SUCCESS RETURN (must be indented inside the function)
     return {
         "symbol": req.symbol,
@@ -158,7 +241,9 @@ def run_backtest(req: BacktestRequest):
         "end": req.end,
         "fast": req.fast,
         "slow": req.slow,
-        "csv_path": csv_path,
+        "csv_path": result.get("csv_path"),
+        "stats": result.get("stats"),
+        "execution": execution,
         "stdout": result.get("stdout", ""),
         "stderr": result.get("stderr", ""),
         "exit_code": result.get("exit_code", -1),
@@ -171,12 +256,12 @@ def plot_equity(req: PlotRequest):
     logs_dir = Path(cfg["logs_dir"]).resolve()
     csv_path = Path(req.csv_path).resolve()
 
-    # Safety: must be a file under logs_dir
-    if not csv_path.is_file() or not _is_under(logs_dir, csv_path):
+    # Safety: must be a CSV file or .store dir under logs_dir
+    if not csv_path.exists() or not _is_under(logs_dir, csv_path):
         raise HTTPException(status_code=400, detail="csv_path invalid or not found")
 
-    # Read CSV and pick a sensible y-series
-    df = pd.read_csv(csv_path)
+    # Read series (CSV or columnar store) and pick a sensible y-series
+    df = load_frame(csv_path)
     lower = {c.lower(): c for c in df.columns}
     equity_cols = [lower[k] for k in ("equity", "equity_curve", "cumret", "cum_return") if k in lower]
     price_cols  = [lower[k] for k in ("adj close", "adj_close", "close", "price") if k in lower]
@@ -191,24 +276,25 @@ def plot_equity(req: PlotRequest):
             raise HTTPException(status_code=400, detail="No numeric columns to plot")
         ycol = num_cols[0]
 
-    fig = plt.figure(figsize=(8, 4.5), dpi=120)
-    ax = plt.gca()
-    ax.plot(df.index, df[ycol], label=ycol)
-    ax.set_title(req.title or csv_path.name)
-    ax.set_xlabel("Bars")
-    ax.set_ylabel(ycol)
-    ax.grid(True, alpha=0.3)
-    ax.legend()
-
-    buf = BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
+    with _PLOT_LOCK:
+        fig = plt.figure(figsize=(8, 4.5), dpi=120)
+        ax = plt.gca()
+        ax.plot(df.index, df[ycol], label=ycol)
+        ax.set_title(req.title or csv_path.name)
+        ax.set_xlabel("Bars")
+        ax.set_ylabel(ycol)
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+
+        buf = BytesIO()
+        plt.tight_layout()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
     buf.seek(0)
     return StreamingResponse(buf, media_type="image/png")
 
 def _plot_png_bytes(csv_path: Path, title: str | None = None) -> bytes:
-    df = pd.read_csv(csv_path)
+    df = load_frame(csv_path)
     lower = {c.lower(): c for c in df.columns}
     equity_cols = [lower[k] for k in ("equity","equity_curve","cumret","cum_return") if k in lower]
     price_cols  = [lower[k] for k in ("adj close","adj_close","close","price") if k in lower]
@@ -223,18 +309,19 @@ def _plot_png_bytes(csv_path: Path, title: str | None = None) -> bytes:
             raise HTTPException(status_code=400, detail="No numeric columns to plot")
         ycol = num_cols[0]
 
-    fig = plt.figure(figsize=(8, 4.5), dpi=120)
-    ax = plt.gca()
-    ax.plot(df.index, df[ycol], label=ycol)
-    ax.set_title(title or csv_path.name)
-    ax.set_xlabel("Bars")
-    ax.set_ylabel(ycol)
-    ax.grid(True, alpha=0.3)
-    ax.legend()
-    buf = BytesIO()
-    plt.tight_layout()
-    fig.savefig(buf, format="png")
-    plt.close(fig)
+    with _PLOT_LOCK:
+        fig = plt.figure(figsize=(8, 4.5), dpi=120)
+        ax = plt.gca()
+        ax.plot(df.index, df[ycol], label=ycol)
+        ax.set_title(title or csv_path.name)
+        ax.set_xlabel("Bars")
+        ax.set_ylabel(ycol)
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+        buf = BytesIO()
+        plt.tight_layout()
+        fig.savefig(buf, format="png")
+        plt.close(fig)
     return buf.getvalue()
 
 @app.post("/run_and_plot")
@@ -246,7 +333,7 @@ def run_and_plot(req: BacktestRequest):
     csv_path = Path(result["csv_path"]).resolve()
     cfg = load_cfg()
     logs_dir = Path(cfg["logs_dir"]).resolve()
-    if not csv_path.is_file() or not str(csv_path).startswith(str(logs_dir)):
+    if not csv_path.exists() or not str(csv_path).startswith(str(logs_dir)):
         raise HTTPException(status_code=400, detail="csv_path invalid or not under logs_dir")
 
     png = _plot_png_bytes(csv_path, title=f"{req.symbol} SMA({req.fast}/{req.slow})")
@@ -289,14 +376,18 @@ def strategy_run(req: StrategyRunRequest):
 
         result: StrategyResult = run_strategy_on_csv(
             csv_path=csv_path,
-            strategy_name=req.strategy,
+            strat_name=req.strategy,
             params=req.params or {},
         )
 
+        equity = np.asarray(result.equity_curve, dtype=np.float64)
+        curve = _downsample(equity, req.max_points).tolist() if req.include_equity else []
+
         return StrategyRunResponse(
             name=result.name,
             params=result.params,
-            equity_curve=result.equity_curve,
+            equity_curve=curve,
+            equity_length=len(equity),
             trades=result.trades,
             metrics=result.metrics,
         )
@@ -307,6 +398,48 @@ def strategy_run(req: StrategyRunRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Strategy error: {e}")
 
+@app.get("/equity")
+def stream_equity(
+    path: str,
+    chunk: int = 8192,
+    max_points: Optional[int] = None,
+    format: str = "ndjson",
+):
+    """
+    Stream a stored equity curve in chunks.
+
+    path: run JSON, .equity.npy, .store dir or CSV, absolute or relative
+    to data/backtests. format "ndjson" sends one {"offset", "values"} line
+    per chunk; "f64" sends raw little-endian float64 bytes.
+    """
+    base = Path(__file__).resolve().parents[1] / "data" / "backtests"
+    src = Path(path)
+    if not src.is_absolute():
+        src = base / src
+    if not src.exists() or not _is_under(base, src):
+        raise HTTPException(status_code=404, detail="equity source not found under data/backtests")
+    if format not in ("ndjson", "f64"):
+        raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'f64'")
+
+    try:
+        values = _downsample(_open_equity(src), max_points)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    chunk = max(1, min(int(chunk), 1_000_000))
+    headers = {"X-Equity-Length": str(len(values))}
+
+    def gen():
+        for lo in range(0, len(values), chunk):
+            part = np.asarray(values[lo:lo + chunk], dtype="<f8")
+            if format == "f64":
+                yield part.tobytes()
+            else:
+                yield json.dumps({"offset": lo, "values": part.tolist()}) + "\n"
+
+    media = "application/octet-stream" if format == "f64" else "application/x-ndjson"
+    return StreamingResponse(gen(), media_type=media, headers=headers)
+
 @app.post("/run_and_plot_save", response_model=RunAndPlotResponse)
 def run_and_plot_save(req: BacktestRequest):
     out = run_backtest(req)  # existing function
@@ -314,7 +447,7 @@ def run_and_plot_save(req: BacktestRequest):
         raise HTTPException(status_code=400, detail="Backtest produced no CSV")
 
     # reuse the existing /plot_equity logic without HTTP hop
-    df = pd.read_csv(out["csv_path"])
+    df = load_frame(Path(out["csv_path"]))
     lower = {c.lower(): c for c in df.columns}
     ycol = lower.get("equity") or lower.get("equity_curve") or next(
         (c for c in df.columns if pd.api.types.is_numeric_dtype(df[c])), None
@@ -322,17 +455,18 @@ def run_and_plot_save(req: BacktestRequest):
     if not ycol:
         raise HTTPException(status_code=400, detail="No numeric column to plot")
 
-    fig = plt.figure(figsize=(8, 4.5), dpi=120)
-    ax = plt.gca()
-    ax.plot(df.index, df[ycol], label=ycol)
-    ax.set_title(f"{req.symbol} SMA({req.fast}/{req.slow})")
-    ax.set_xlabel("Bars")
-    ax.set_ylabel(ycol)
-    ax.grid(True, alpha=0.3)
-    ax.legend()
-    png_path = PLOTS_DIR / f"{req.symbol}_SMA{req.fast}-{req.slow}_{datetime.now():%Y%m%d-%H%M%S}.png"
-    fig.savefig(png_path)
-    plt.close(fig)
+    with _PLOT_LOCK:
+        fig = plt.figure(figsize=(8, 4.5), dpi=120)
+        ax = plt.gca()
+        ax.plot(df.index, df[ycol], label=ycol)
+        ax.set_title(f"{req.symbol} SMA({req.fast}/{req.slow})")
+        ax.set_xlabel("Bars")
+        ax.set_ylabel(ycol)
+        ax.grid(True, alpha=0.3)
+        ax.legend()
+        png_path = PLOTS_DIR / f"{output_stem(req.symbol, req.fast, req.slow)}.png"
+        fig.savefig(png_path)
+        plt.close(fig)
 
     with open(png_path, "rb") as f:
         img_b64 = base64.b64encode(f.read()).decode()
@@ -343,7 +477,147 @@ def run_and_plot_save(req: BacktestRequest):
         "png_path": str(png_path),
     }
 
-   
+
+# ---------- JOBS ----------
+# Submit a backtest and poll for it instead of holding the connection open
+# for the whole run. Sizing comes from config_backtest.json "jobs".
+JOB_KINDS = {
+    "run_backtest": lambda **kw: run_backtest(BacktestRequest(**kw)),
+    "run_and_plot": lambda **kw: run_and_plot(BacktestRequest(**kw)),
+    "run_and_plot_save": lambda **kw: run_and_plot_save(BacktestRequest(**kw)),
+}
+
+def _sma_cross_grid_job(csv_path: str, fast: List[int], slow: List[int], workers: Optional[int] = None,
+                        score: str = "abs", progress=None):
+    path = Path(csv_path)
+    if not path.is_absolute():
+        path = Path(__file__).resolve().parents[1] / "data" / "backtests" / path
+    if not path.exists():
+        raise HTTPException(status_code=404, detail=f"CSV not found: {path}")
+    rows = run_sma_cross_grid_parallel(
+        path, fast, slow, workers=workers, per_run="none", score=score, progress=progress,
+    )
+    best = max(rows, key=lambda r: r["score"]) if rows else None
+    return {"csv_path": str(path), "runs": len(rows), "best": best, "rows": rows}
+
+# Kinds that take a progress(item, done, total) callback; their
+# /jobs/{id}/events stream carries one "item" event per finished unit
+PROGRESS_JOB_KINDS = {
+    "sma_cross_grid": _sma_cross_grid_job,
+}
+
+SSE_POLL_S = 0.25
+SSE_HEARTBEAT_S = 15.0
+
+_JOBS: Optional[JobQueue] = None
+_JOBS_LOCK = threading.Lock()
+
+def _job_queue() -> JobQueue:
+    global _JOBS
+    with _JOBS_LOCK:
+        if _JOBS is None:
+            jcfg = load_cfg().get("jobs", {})
+            _JOBS = JobQueue(
+                max_workers=jcfg.get("max_workers", 2),
+                max_queue=jcfg.get("max_queue", 32),
+                keep_finished=jcfg.get("keep_finished", 500),
+            )
+        return _JOBS
+
+@app.on_event("shutdown")
+def _shutdown_jobs():
+    if _JOBS is not None:
+        _JOBS.shutdown()
+
+@app.post("/jobs", status_code=202)
+def submit_job(req: JobSubmitRequest):
+    fn = JOB_KINDS.get(req.kind)
+    if fn is None:
+        raise HTTPException(status_code=400, detail=f"Unknown job kind '{req.kind}' (one of {sorted(JOB_KINDS)})")
+    try:
+        job = _job_queue().submit(req.kind, fn, req.request.dict())
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job.job_id, "status": job.status}
+
+@app.post("/jobs/grid", status_code=202)
+def submit_grid_job(req: GridJobRequest):
+    # Follow it with GET /jobs/{job_id}/events instead of polling
+    try:
+        job = _job_queue().submit("sma_cross_grid", PROGRESS_JOB_KINDS["sma_cross_grid"], req.dict(), with_progress=True)
+    except QueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "5"})
+    return {"job_id": job.job_id, "status": job.status, "events": f"/jobs/{job.job_id}/events"}
+
+@app.get("/jobs")
+def list_jobs(limit: int = 50):
+    q = _job_queue()
+    return {"jobs": [j.to_dict() for j in q.list(max(1, min(limit, 500)))], **q.stats()}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = _job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+def job_events(job_id: str, last_event_id: Optional[str] = Header(default=None)):
+    """
+    Server-sent events for one job: "status" on each state change, "item"
+    per finished combo for grid jobs (with done/total, runs_per_sec and
+    eta_s), then "done" and the stream closes. Reconnecting with
+    Last-Event-ID resumes after that event.
+    """
+    job = _job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    try:
+        seq = int(last_event_id) if last_event_id else 0
+    except ValueError:
+        seq = 0
+
+    async def gen():
+        nonlocal seq
+        beat = time.monotonic()
+        while True:
+            events, closed = job.feed.since(seq)
+            for seq, event, data in events:
+                yield sse(event, data, id=seq)
+            if closed and not events:
+                return
+            if events:
+                beat = time.monotonic()
+            elif time.monotonic() - beat >= SSE_HEARTBEAT_S:
+                beat = time.monotonic()
+                yield ": ping\n\n"
+            await asyncio.sleep(SSE_POLL_S)
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    if job.status not in FINISHED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {job.status}")
+    if job.status != COMPLETE:
+        return {"job_id": job_id, "status": job.status, "error": job.error}
+    return {"job_id": job_id, "status": job.status, "result": job.result}
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job = _job_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job.to_dict()
+
+
 # ---------- TASKS ----------
 @app.get("/tasks/list")
 def list_tasks():
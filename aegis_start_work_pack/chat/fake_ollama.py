@@ -0,0 +1,112 @@
+"""
+Tiny stand-in for Ollama's /api/chat, for exercising the orchestrator's
+/chat (streaming and not) without a model.
+
+    python chat/fake_ollama.py --port 11435 --delay 0.05
+    set AEGIS_OLLAMA_URL=http://127.0.0.1:11435/api/chat
+
+The reply is split into small tokens and, when the request asks for
+"stream": true, sent as NDJSON lines the way Ollama does, one every
+--delay seconds. --reply sets the canned answer; use a tool JSON to test
+tool dispatch, e.g.
+
+    --reply "Running it now. {\"tool\":\"backtest.run\",\"args\":{\"symbol\":\"SPY\",\"start\":\"2020-01-01\",\"end\":\"2024-01-01\"}}"
+
+--truncate N cuts the stream after N tokens in the middle of an NDJSON
+line, the way a dropped upstream connection looks to the client.
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = "SPY's 50/200 crossover is a slow trend filter; it trades rarely and lags turns."
+
+
+def tokens(text):
+    # Roughly model-sized pieces: words with their trailing space, punctuation on its own
+    return re.findall(r"\w+\s*|[^\w\s]\s*|\s+", text)
+
+
+def make_handler(reply, delay, truncate=None):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _chunk(self, content, done):
+            return {
+                "model": self._model,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": content},
+                "done": done,
+            }
+
+        def do_POST(self):
+            if self.path != "/api/chat":
+                self.send_error(404)
+                return
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            self._model = body.get("model", "fake")
+
+            if not body.get("stream", True):
+                out = json.dumps(self._chunk(reply, True)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+                return
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            try:
+                for i, tok in enumerate(tokens(reply)):
+                    line = json.dumps(self._chunk(tok, False))
+                    if truncate is not None and i >= truncate:
+                        self._write(line[: len(line) // 2] + "\n")
+                        break
+                    self._write(line + "\n")
+                    time.sleep(delay)
+                else:
+                    self._write(json.dumps(self._chunk("", True)) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # client stopped reading (e.g. tool call detected)
+
+        def _write(self, line):
+            data = line.encode()
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def serve(host="127.0.0.1", port=11435, reply=DEFAULT_REPLY, delay=0.05, background=False, truncate=None):
+    server = ThreadingHTTPServer((host, port), make_handler(reply, delay, truncate))
+    if background:
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    print(f"[fake-ollama] http://{host}:{port}/api/chat (delay={delay}s)")
+    server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Fake Ollama /api/chat server for local testing.")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--delay", type=float, default=0.05, help="seconds between streamed tokens")
+    ap.add_argument("--reply", default=DEFAULT_REPLY)
+    ap.add_argument("--truncate", type=int, help="cut the stream mid-line after this many tokens")
+    args = ap.parse_args()
+    serve(args.host, args.port, args.reply, args.delay, truncate=args.truncate)
+
+
+if __name__ == "__main__":
+    main()
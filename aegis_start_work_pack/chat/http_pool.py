@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import importlib.util
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx  # type: ignore
+
+
+# HTTP/2 needs the optional 'h2' package (pip install "httpx[http2]").
+# httpx only negotiates it over TLS, so plain-http upstreams stay on
+# HTTP/1.1 keep-alive either way.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class Upstream:
+    """
+    Connection settings for one upstream service.
+
+    timeout is the default read/write/pool timeout; individual calls can
+    still pass their own (e.g. a short plot vs. a long backtest).
+    """
+    name: str
+    base_url: str = ""
+    timeout: float = 60.0
+    connect_timeout: float = 5.0
+    max_connections: int = 20
+    max_keepalive: int = 10
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+
+
+@dataclass
+class _Stats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    last_error: Optional[str] = field(default=None)
+
+
+class UpstreamPool:
+    """
+    One long-lived, pooled httpx.AsyncClient per upstream.
+
+    Clients are opened on app startup (start) and closed on shutdown
+    (close); client() also creates one lazily if a call arrives outside
+    the lifespan (tests, scripts). Requests made through request() are
+    counted per upstream for /debug/http.
+    """
+
+    def __init__(self, upstreams: Dict[str, Upstream]):
+        self.upstreams = dict(upstreams)
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._stats: Dict[str, _Stats] = {name: _Stats() for name in self.upstreams}
+
+    def _make_client(self, up: Upstream) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=up.base_url,
+            http2=up.http2 and HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(up.timeout, connect=up.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=up.max_connections,
+                max_keepalive_connections=up.max_keepalive,
+                keepalive_expiry=up.keepalive_expiry,
+            ),
+        )
+
+    async def start(self) -> None:
+        # Lazily made clients may be bound to another event loop; start fresh
+        self._clients = {}
+        for name in self.upstreams:
+            self.client(name)
+
+    async def close(self) -> None:
+        clients, self._clients = self._clients, {}
+        for c in clients.values():
+            await c.aclose()
+
+    def client(self, name: str) -> httpx.AsyncClient:
+        c = self._clients.get(name)
+        if c is None or c.is_closed:
+            c = self._clients[name] = self._make_client(self.upstreams[name])
+        return c
+
+    async def request(self, name: str, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        st = self._stats[name]
+        st.requests += 1
+        st.in_flight += 1
+        st.peak_in_flight = max(st.peak_in_flight, st.in_flight)
+        t0 = time.perf_counter()
+        try:
+            return await self.client(name).request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            st.errors += 1
+            st.last_error = repr(e)
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            st.in_flight -= 1
+            st.total_ms += ms
+            st.max_ms = max(st.max_ms, ms)
+
+    @asynccontextmanager
+    async def stream(self, name: str, method: str, url: str, **kwargs: Any) -> AsyncIterator[httpx.Response]:
+        """
+        Streaming variant of request(); latency counts until the body is
+        fully consumed or the caller stops reading.
+        """
+        st = self._stats[name]
+        st.requests += 1
+        st.in_flight += 1
+        st.peak_in_flight = max(st.peak_in_flight, st.in_flight)
+        t0 = time.perf_counter()
+        try:
+            async with self.client(name).stream(method, url, **kwargs) as r:
+                yield r
+        except httpx.HTTPError as e:
+            st.errors += 1
+            st.last_error = repr(e)
+            raise
+        finally:
+            ms = (time.perf_counter() - t0) * 1000.0
+            st.in_flight -= 1
+            st.total_ms += ms
+            st.max_ms = max(st.max_ms, ms)
+
+    async def post(self, name: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(name, "POST", url, **kwargs)
+
+    async def get(self, name: str, url: str, **kwargs: Any) -> httpx.Response:
+        return await self.request(name, "GET", url, **kwargs)
+
+    @staticmethod
+    def _connections(c: Optional[httpx.AsyncClient]) -> Dict[str, int]:
+        # httpcore's pool isn't public API; report what it exposes, if anything
+        pool = getattr(getattr(c, "_transport", None), "_pool", None)
+        conns = list(getattr(pool, "connections", []) or [])
+        return {
+            "open": len(conns),
+            "idle": sum(1 for x in conns if getattr(x, "is_idle", lambda: False)()),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name, up in self.upstreams.items():
+            st = self._stats[name]
+            c = self._clients.get(name)
+            out[name] = {
+                "base_url": up.base_url,
+                "http2": up.http2 and HTTP2_AVAILABLE,
+                "max_connections": up.max_connections,
+                "max_keepalive": up.max_keepalive,
+                "connections": self._connections(c),
+                "requests": st.requests,
+                "errors": st.errors,
+                "in_flight": st.in_flight,
+                "peak_in_flight": st.peak_in_flight,
+                "avg_ms": round(st.total_ms / st.requests, 2) if st.requests else None,
+                "max_ms": round(st.max_ms, 2),
+                "last_error": st.last_error,
+            }
+        return out
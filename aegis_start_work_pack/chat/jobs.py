@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from chat.progress import ProgressFeed, Throughput
+
+
+# Same status vocabulary as orchestrator_app's run registry
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETE = "COMPLETE"
+FAILED = "FAILED"
+CANCELLED = "CANCELLED"
+
+FINISHED = (COMPLETE, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Raised by JobQueue.submit when max_queue jobs are already pending."""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+@dataclass
+class Job:
+    job_id: str
+    kind: str
+    args: Dict[str, Any]
+    status: str = QUEUED
+    created_at: str = field(default_factory=_now)
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    progress: Optional[Throughput] = None
+    future: Optional[Future] = field(default=None, repr=False)
+    feed: ProgressFeed = field(default_factory=ProgressFeed, repr=False)
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        out = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "args": self.args,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "cancel_requested": self.cancel_requested,
+        }
+        if self.progress is not None:
+            out["progress"] = self.progress.snapshot()
+        if include_result:
+            out["result"] = self.result
+        return out
+
+
+class JobQueue:
+    """
+    Bounded local worker pool for long-running backtest calls.
+
+    - max_workers jobs run at once on a thread pool; the rest wait.
+    - At most max_queue jobs may be waiting; submit() raises QueueFull
+      beyond that so callers can answer 429 instead of piling up work.
+    - Queued jobs are cancelled outright. Running jobs can't be
+      interrupted mid-backtest, so they are flagged and their result is
+      discarded (status CANCELLED) when they return.
+    - The newest keep_finished finished jobs are retained for polling.
+    - Every job has a ProgressFeed (job.feed) with "status" and a final
+      "done" event; kinds submitted with_progress also get a
+      progress(item, done, total) callback whose calls become "item"
+      events carrying runs/sec and ETA.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 32, keep_finished: int = 500):
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue = max(0, int(max_queue))
+        self.keep_finished = max(1, int(keep_finished))
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bt-job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    # ----- submission -----
+
+    def submit(self, kind: str, fn: Callable[..., Any], args: Dict[str, Any], with_progress: bool = False) -> Job:
+        with self._lock:
+            queued = sum(1 for j in self._jobs.values() if j.status == QUEUED)
+            if queued >= self.max_queue:
+                raise QueueFull(f"{queued} jobs already queued (max_queue={self.max_queue})")
+
+            job = Job(job_id=uuid.uuid4().hex[:12], kind=kind, args=args)
+            if with_progress:
+                job.progress = Throughput()
+            self._jobs[job.job_id] = job
+            job.feed.publish("status", {"job_id": job.job_id, "status": QUEUED})
+            job.future = self._pool.submit(self._run, job, fn)
+            self._trim()
+        return job
+
+    def _run(self, job: Job, fn: Callable[..., Any]) -> None:
+        with self._lock:
+            # Cancelled after the pool had already picked the job up
+            cancelled = job.cancel_requested
+            if cancelled:
+                job.status = CANCELLED
+                job.finished_at = _now()
+            else:
+                job.status = RUNNING
+                job.started_at = _now()
+        if cancelled:
+            self._finish_feed(job)
+            return
+        job.feed.publish("status", {"job_id": job.job_id, "status": RUNNING})
+
+        kwargs = dict(job.args)
+        if job.progress is not None:
+            job.progress.started = time.time()
+            kwargs["progress"] = lambda item, done, total: self._report(job, item, done, total)
+
+        try:
+            result, error, status = fn(**kwargs), None, COMPLETE
+        except Exception as e:
+            detail = getattr(e, "detail", None)  # HTTPException from the endpoint helpers
+            result, error, status = None, str(detail or repr(e)), FAILED
+
+        with self._lock:
+            job.finished_at = _now()
+            if job.cancel_requested:
+                job.status = CANCELLED
+            else:
+                job.status, job.result, job.error = status, result, error
+        self._finish_feed(job)
+
+    @staticmethod
+    def _report(job: Job, item: Dict[str, Any], done: int, total: int) -> None:
+        prog = job.progress
+        failed = prog.failed + (1 if isinstance(item, dict) and item.get("error") else 0)
+        prog.update(done, failed, total)
+        job.feed.publish("item", {"job_id": job.job_id, "item": item, **prog.snapshot()})
+
+    @staticmethod
+    def _finish_feed(job: Job) -> None:
+        data = {"job_id": job.job_id, "status": job.status, "error": job.error}
+        if job.progress is not None:
+            job.progress.stop()
+            data.update(job.progress.snapshot())
+        job.feed.publish("done", data)
+        job.feed.close()
+
+    def _trim(self) -> None:
+        finished = [j.job_id for j in self._jobs.values() if j.status in FINISHED]
+        for job_id in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    # ----- queries / control -----
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self, limit: int = 50) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())[-limit:][::-1]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status in FINISHED:
+                return job
+            job.cancel_requested = True
+            if job.status == QUEUED and job.future is not None and job.future.cancel():
+                job.status = CANCELLED
+                job.finished_at = _now()
+                self._finish_feed(job)
+            return job
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.status] = counts.get(j.status, 0) + 1
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "counts": counts,
+        }
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,13 @@
-import os, json, yaml, time
+import os, json, time, threading, asyncio
 from pathlib import Path
 from typing import Dict, Any, Optional, List
 import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timezone
 
 import requests
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Header, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 
 # -----------------------------
@@ -18,25 +20,44 @@ INDEX_PATH = ROOT / "rag" / "index.json"
 OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434/api/generate")
 MODEL_ID = os.getenv("AEGIS_MODEL", "llama3.1:8b-instruct")
 
-def load_policy() -> Dict[str, Any]:
-    with open(POLICY_PATH, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f) or {}
-
 def load_index() -> Dict[str, Any]:
     if INDEX_PATH.exists():
         return json.loads(INDEX_PATH.read_text(encoding="utf-8"))
     return {"items": []}
 
-POLICY = load_policy()
+# Compiled policy, swapped in whenever policy.yaml changes (chat/policy.py)
+from chat.policy import PolicyStore
+
+RATE_BATCH_RESERVE = float(os.getenv("AEGIS_RATE_BATCH_RESERVE", "0.2"))
+POLICY = PolicyStore(POLICY_PATH, reserve=RATE_BATCH_RESERVE)
 INDEX = load_index()
 
 # -----------------------------
 # Run registry (Multi-Run v0)
 # -----------------------------
-RUNS_DIR = ROOT / "runs"
+RUNS_DIR = Path(os.getenv("AEGIS_RUNS_DIR", str(ROOT / "runs")))
 RUNS_DIR.mkdir(parents=True, exist_ok=True)
 
-RUN_REGISTRY: Dict[str, Dict[str, Any]] = {}
+# SQLite (WAL) so runs survive restarts and every uvicorn worker sees the same registry
+from chat.run_registry import FINISHED, RunRegistry
+from chat.progress import Throughput
+from chat.tool_stream import sse
+
+RUNS_DB = Path(os.getenv("AEGIS_RUNS_DB", str(RUNS_DIR / "registry.db")))
+RUNS = RunRegistry(RUNS_DB)
+RUNS.import_artifacts(RUNS_DIR)
+# Runs whose process died mid-way would otherwise stay RUNNING forever
+_orphans = RUNS.interrupt_orphans()
+if _orphans:
+    print(f"[runs] marked {len(_orphans)} orphaned run(s) INTERRUPTED: {', '.join(_orphans)}")
+
+# Multi-run cells (strategy x symbol) from all runs share this bounded pool
+MULTI_RUN_WORKERS = int(os.getenv("AEGIS_MULTI_RUN_WORKERS", "8"))
+MULTI_RUN_POOL = ThreadPoolExecutor(max_workers=MULTI_RUN_WORKERS, thread_name_prefix="multi-run")
+
+# /multi-run/{id}/events tails the registry, so any worker can serve it
+EVENTS_POLL_S = float(os.getenv("AEGIS_EVENTS_POLL_S", "0.5"))
+EVENTS_HEARTBEAT_S = 15.0
 
 # -----------------------------
 # Tools
@@ -53,14 +74,19 @@ TOOLS = {
     "risk.simulate": risk_simulate,
 }
 
+from chat.rate_limit import RateLimiter, caller_of, BATCH
+
+# policy.yaml rate_limits, per tool and client (X-Client-Id or address).
+# /multi-run spends one backtest.run token per strategy x symbol cell, in
+# the batch lane unless the caller sends X-Priority: interactive. The first
+# cell is charged at admission (429 + Retry-After when the caller is out of
+# tokens); the rest are charged as they are scheduled, so a matrix bigger
+# than the bucket still runs, paced at the refill rate.
+RATES = RateLimiter(POLICY.current().rate_limits)
+POLICY.subscribe(lambda p: RATES.set_specs(p.rate_limits))
+
 def allowed_tool(name: str) -> bool:
-    allow = POLICY.get("allowed_tools", [])
-    deny = POLICY.get("denied_tools", [])
-    if name in deny:
-        return False
-    if allow and name not in allow:
-        return False
-    return True
+    return POLICY.current().allows(name)
 
 # -----------------------------
 # API
@@ -86,25 +112,22 @@ def health():
         "model_id": MODEL_ID,
         "ollama_url": OLLAMA_URL,
         "runs_dir": str(RUNS_DIR),
+        "runs_db": str(RUNS_DB),
+        "runs": RUNS.counts(),
+        "policy": POLICY.stats(),
+        "rate_limits": RATES.stats(),
     }
 
 @app.get("/runs")
-def list_runs(limit: int = 50):
-    # Lists JSON artifacts in RUNS_DIR, newest first.
-    items = []
-    if not RUNS_DIR.exists():
-        return {"count": 0, "items": []}
-
-    paths = sorted(RUNS_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
-    for p in paths[: max(0, min(limit, 500))]:
-        st = p.stat()
-        items.append({
-            "run_id": p.stem,
-            "path": str(p),
-            "size_bytes": st.st_size,
-            "updated_at": datetime.fromtimestamp(st.st_mtime, tz=timezone.utc).isoformat(),
-        })
-    return {"count": len(items), "items": items}
+def list_runs(limit: int = 50, cursor: Optional[str] = None, status: Optional[str] = None):
+    # Newest first; pass next_cursor back as ?cursor= for the next page.
+    try:
+        items, next_cursor = RUNS.list(limit=limit, cursor=cursor, status=status)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for item in items:
+        item["path"] = item.get("artifact")
+    return {"count": len(items), "items": items, "next_cursor": next_cursor}
 
 @app.post("/ask")
 def ask(req: Ask):
@@ -115,50 +138,201 @@ def _write_run_artifact(run_id: str, payload: Dict[str, Any]) -> str:
     path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
     return str(path)
 
-def _multi_run_job(run_id: str, req: MultiRunRequest):
-    results = []
-    for strategy in req.strategies:
-        for symbol in req.symbols:
-            if not allowed_tool("backtest.run"):
-                raise HTTPException(status_code=403, detail="Tool not allowed by policy: backtest.run")
-            output = backtest_run(strategy=strategy, symbols=[symbol], params=None)
-            results.append({
-                "strategy": strategy,
-                "symbol": symbol,
-                "output": output,
-            })
+def _run_cell(run_id: str, idx: int, strategy: str, symbol: str) -> Dict[str, Any]:
+    # One matrix cell; its failure is recorded on the cell, never raised
+    RUNS.start_cell(run_id, idx)
+    try:
+        output = backtest_run(strategy=strategy, symbols=[symbol], params=None)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        RUNS.finish_cell(run_id, idx, error=error)
+        return {"strategy": strategy, "symbol": symbol, "error": error}
+    RUNS.finish_cell(run_id, idx, output=output)
+    return {"strategy": strategy, "symbol": symbol, "output": output}
 
+def _finish_multi_run(run_id: str, req: MultiRunRequest, results: List[Dict[str, Any]]):
+    failed = sum(1 for r in results if "error" in r)
+    status = "FAILED" if results and failed == len(results) else "COMPLETE"
     artifact_payload = {
         "run_id": run_id,
-        "status": "COMPLETE",
+        "status": status,
         "request": req.dict(),
+        "failed": failed,
         "results": results,
     }
+    try:
+        artifact = _write_run_artifact(run_id, artifact_payload)
+    except Exception as e:
+        RUNS.update(run_id, status="FAILED", error=f"{type(e).__name__}: {e}")
+        return
+    RUNS.update(
+        run_id,
+        status=status,
+        artifact=artifact,
+        size_bytes=Path(artifact).stat().st_size,
+        error=f"all {failed} cells failed" if status == "FAILED" else None,
+    )
+
+def _multi_run_job(run_id: str, req: MultiRunRequest, client: str = "anon", lane: str = BATCH):
+    # Fan the strategies x symbols matrix out on MULTI_RUN_POOL. Each cell
+    # records its own result as it finishes (GET /multi-run/{id} shows
+    # them); the last one to finish writes the artifact. Nothing here
+    # blocks waiting for cells; cells past the first wait for their
+    # backtest.run token on a scheduler thread of their own.
+    if not allowed_tool("backtest.run"):
+        RUNS.update(run_id, status="FAILED", error="Tool not allowed by policy: backtest.run")
+        return
+
+    cells = [{"strategy": st, "symbol": sym} for st in req.strategies for sym in req.symbols]
+    RUNS.add_cells(run_id, cells)
+    RUNS.update(run_id, status="RUNNING")
+    if not cells:
+        _finish_multi_run(run_id, req, [])
+        return
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(cells)
+    remaining = [len(cells)]
+    lock = threading.Lock()
+
+    def on_done(idx: int, fut: Future):
+        try:
+            results[idx] = fut.result()
+        except Exception as e:  # registry write failed; keep the cell in the artifact anyway
+            results[idx] = {**cells[idx], "error": f"{type(e).__name__}: {e}"}
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            _finish_multi_run(run_id, req, results)
+
+    def schedule():
+        for idx, cell in enumerate(cells):
+            # Cell 0's token was taken when the run was admitted
+            while idx > 0:
+                rate = RATES.acquire("backtest.run", client, lane)
+                if rate.allowed:
+                    break
+                time.sleep(rate.retry_after)
+            fut = MULTI_RUN_POOL.submit(_run_cell, run_id, idx, cell["strategy"], cell["symbol"])
+            fut.add_done_callback(lambda f, idx=idx: on_done(idx, f))
 
-    artifact = _write_run_artifact(run_id, artifact_payload)
-    RUN_REGISTRY[run_id]["status"] = "COMPLETE"
-    RUN_REGISTRY[run_id]["updated_at"] = datetime.now(timezone.utc).isoformat()
-    RUN_REGISTRY[run_id]["artifact"] = artifact
+    threading.Thread(target=schedule, name=f"multi-run-{run_id}", daemon=True).start()
 
 @app.post("/multi-run")
-def start_multi_run(req: MultiRunRequest, background: BackgroundTasks):
+def start_multi_run(req: MultiRunRequest, background: BackgroundTasks, request: Request):
+    policy = POLICY.current()
+    if not policy.allows("backtest.run"):
+        raise HTTPException(status_code=403, detail="Tool not allowed by policy: backtest.run")
+    if policy.max_symbols is not None and len(req.symbols) > policy.max_symbols:
+        raise HTTPException(
+            status_code=403,
+            detail=f"{len(req.symbols)} symbols exceeds policy max_symbols={policy.max_symbols}",
+        )
+    client, lane = caller_of(request, BATCH)
+    rate = RATES.acquire("backtest.run", client, lane)
+    if not rate.allowed:
+        raise HTTPException(status_code=429, detail=rate.detail(), headers=rate.headers())
     run_id = uuid.uuid4().hex[:12]
-    now = datetime.now(timezone.utc).isoformat()
+    run = RUNS.create(run_id, req.dict())
 
-    RUN_REGISTRY[run_id] = {
-        "run_id": run_id,
-        "status": "QUEUED",
-        "created_at": now,
-        "updated_at": now,
-        "request": req.dict(),
-        "artifact": None,
+    background.add_task(_multi_run_job, run_id, req, client, lane)
+    return {"run_id": run_id, "status": run["status"], "created_at": run["created_at"]}
+
+@app.get("/multi-run/{run_id}")
+def get_multi_run(run_id: str, cells: bool = True):
+    # Partial results: finished cells carry their output (or error) while the run is RUNNING
+    run = RUNS.get(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail="run_id not found")
+    run["progress"] = {
+        "total": run["total"],
+        "done": run["done"],
+        "failed": run["failed"],
+        "pct": round(100.0 * run["done"] / run["total"], 1) if run["total"] else None,
     }
+    if cells:
+        run["cells"] = RUNS.cells(run_id)
+    return run
 
-    background.add_task(_multi_run_job, run_id, req)
-    return {"run_id": run_id, "status": "QUEUED", "created_at": now}
+def _epoch(ts: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(ts).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
 
-@app.get("/multi-run/{run_id}")
-def get_multi_run(run_id: str):
-    if run_id not in RUN_REGISTRY:
+@app.get("/multi-run/{run_id}/events")
+def multi_run_events(run_id: str, last_event_id: Optional[str] = Header(default=None)):
+    # Push instead of polling GET /multi-run/{id}: "snapshot" on connect,
+    # one "cell" per finished cell (with done/total, runs_per_sec, eta_s),
+    # then "done" once the run is finalized (COMPLETE, FAILED or
+    # INTERRUPTED), after which the stream ends. Event ids count cells, so
+    # a client reconnecting with Last-Event-ID skips what it already has.
+    # Each heartbeat also checks that the run's process is still alive.
+    run = RUNS.get(run_id)
+    if run is None:
         raise HTTPException(status_code=404, detail="run_id not found")
-    return RUN_REGISTRY[run_id]
+    try:
+        skip = max(0, int(last_event_id)) if last_event_id else 0
+    except ValueError:
+        skip = 0
+
+    async def gen():
+        meter = Throughput(run["total"], started=_epoch(run["created_at"]))
+        seen: set = set()
+        failed = 0
+        since: Optional[str] = None
+        beat = time.monotonic()
+        current = run
+        rescanned = False
+
+        yield sse("snapshot", {"run_id": run_id, "status": current["status"], **meter.snapshot()})
+        while True:
+            new = []
+            if current["done"] > len(seen):
+                new = await asyncio.to_thread(RUNS.finished_cells, run_id, since)
+                if len(seen) + sum(1 for c in new if c["idx"] not in seen) < current["done"]:
+                    # A cell committed with an older finished_at than our
+                    # watermark; rescan the run once
+                    new = await asyncio.to_thread(RUNS.finished_cells, run_id)
+
+            for cell in new:
+                if cell["idx"] in seen:
+                    continue
+                seen.add(cell["idx"])
+                since = max(since or "", cell["finished_at"])
+                failed += cell["status"] == "FAILED"
+                meter.update(len(seen), failed, current["total"])
+                if len(seen) <= skip:
+                    continue
+                yield sse("cell", {"run_id": run_id, **cell, **meter.snapshot()}, id=len(seen))
+
+            if current["status"] in FINISHED and len(seen) < current["done"] and not rescanned:
+                # Finalized but cells missing from the tail: one full rescan
+                rescanned = True
+                since = None
+                continue
+            if current["status"] in FINISHED:
+                yield sse("done", {
+                    "run_id": run_id,
+                    "status": current["status"],
+                    "error": current["error"],
+                    "artifact": current["artifact"],
+                    **meter.snapshot(now=_epoch(current["updated_at"])),
+                })
+                return
+
+            if new:
+                beat = time.monotonic()
+            elif time.monotonic() - beat >= EVENTS_HEARTBEAT_S:
+                beat = time.monotonic()
+                await asyncio.to_thread(RUNS.interrupt_orphans, run_id)
+                yield ": ping\n\n"
+            await asyncio.sleep(EVENTS_POLL_S)
+            current = await asyncio.to_thread(RUNS.get, run_id) or current
+            meter.update(len(seen), failed, current["total"])
+
+    return StreamingResponse(
+        gen(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
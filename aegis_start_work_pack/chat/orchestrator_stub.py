@@ -1,8 +1,22 @@
-from fastapi import FastAPI, HTTPException  # type: ignore
+from fastapi import FastAPI, HTTPException, Request  # type: ignore
+from fastapi.responses import StreamingResponse  # type: ignore
 from pydantic import BaseModel              # type: ignore
 from typing import Union
 from pathlib import Path
-import os, json, re, base64, httpx          # type: ignore
+from contextlib import asynccontextmanager
+import os, sys, json, re, base64, httpx     # type: ignore
+
+# make chat/ importable when launched as a script or via uvicorn
+_PKG = Path(__file__).resolve().parents[1]
+if str(_PKG) not in sys.path:
+    sys.path.insert(0, str(_PKG))
+
+from chat.http_pool import Upstream, UpstreamPool
+from chat.rag_index import RagIndex
+from chat.tool_stream import ToolCallDetector, sse
+from chat.tool_cache import ToolResultCache
+from chat.rate_limit import RateLimiter, caller_of, INTERACTIVE, BATCH
+from chat.policy import PolicyStore
 
 # -------------------------------------------------
 # Paths & config
@@ -18,62 +32,94 @@ INDEX_PATH  = ROOT / "rag" / "index.jsonl"
 
 # Your existing backtest API (port 8001)
 BACKTEST_URL = "http://127.0.0.1:8001"
-# Local LLM (Ollama etc.)
-OLLAMA_URL   = "http://127.0.0.1:11434/api/chat"
+# Local LLM (Ollama etc.); point AEGIS_OLLAMA_URL at chat/fake_ollama.py for tests
+OLLAMA_URL   = os.environ.get("AEGIS_OLLAMA_URL", "http://127.0.0.1:11434/api/chat")
+OLLAMA_MODEL = os.environ.get("AEGIS_OLLAMA_MODEL", "llama3.1:8b-instruct-q4_K_M")
+
+# One pooled keep-alive client per upstream, opened for the app's lifetime
+HTTP = UpstreamPool({
+    "backtest": Upstream("backtest", base_url=BACKTEST_URL, timeout=180, max_connections=20, max_keepalive=10),
+    "ollama":   Upstream("ollama", timeout=60, max_connections=8, max_keepalive=4),
+})
+
+# Results of identical tool calls (tool + canonical args) are reused for
+# AEGIS_TOOL_CACHE_TTL seconds; AEGIS_TOOL_CACHE_TTL=0 turns caching off.
+TOOL_CACHE_TTL = float(os.environ.get("AEGIS_TOOL_CACHE_TTL", "3600"))
+TOOL_CACHE = ToolResultCache(
+    ttl=TOOL_CACHE_TTL,
+    max_entries=int(os.environ.get("AEGIS_TOOL_CACHE_ENTRIES", "256")),
+    disk_dir=ROOT / "data" / "tool_cache",
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await HTTP.start()
+    try:
+        yield
+    finally:
+        await HTTP.close()
 
-app = FastAPI(title="Aegis Orchestrator", version="0.1.0")
+app = FastAPI(title="Aegis Orchestrator", version="0.1.0", lifespan=lifespan)
 
 # -------------------------------------------------
-# Tiny YAML reader (no dependency)
+# Policy (compiled, reloaded when policy.yaml changes)
 # -------------------------------------------------
-def read_policy():
-    mode = "paper"
-    allowed = []
-    rates = {}
-    if not POLICY_PATH.exists():
-        return {"mode": mode, "allowed_tools": allowed, "rate_limits": rates}
-
-    for line in POLICY_PATH.read_text(encoding="utf-8").splitlines():
-        s = line.strip()
-        if s.startswith("mode:"):
-            mode = s.split(":", 1)[1].strip()
-        elif s.startswith("- "):
-            allowed.append(s[2:].strip())
+RATE_BATCH_RESERVE = float(os.environ.get("AEGIS_RATE_BATCH_RESERVE", "0.2"))
+POLICY = PolicyStore(POLICY_PATH, reserve=RATE_BATCH_RESERVE)
+_p = POLICY.current()
+print(f"[Aegis] Policy loaded from: {POLICY_PATH} | mode={_p.mode}, tools={_p.allowed_tools}")
 
-    return {"mode": mode, "allowed_tools": allowed, "rate_limits": rates}
-
-POLICY = read_policy()
-print(f"[Aegis] Policy loaded from: {POLICY_PATH} | mode={POLICY.get('mode')}, tools={POLICY.get('allowed_tools')}")
+# -------------------------------------------------
+# Rate limits (token bucket per tool and client)
+# -------------------------------------------------
+# Clients identify with X-Client-Id (else their address) and may send
+# X-Priority: batch|interactive. /chat defaults to interactive and
+# /tool/run (scripts, agents) to batch; batch callers can't drain the
+# last AEGIS_RATE_BATCH_RESERVE of a bucket. The combined tools run a
+# backtest too, so they draw from the backtest.run bucket.
+TOOL_RATE_ALIASES = {"run_and_plot": "backtest.run", "run_and_plot_save": "backtest.run"}
+RATES = RateLimiter(_p.rate_limits, aliases=TOOL_RATE_ALIASES)
+POLICY.subscribe(lambda p: RATES.set_specs(p.rate_limits))
+
+def check_rate(tool: str, client: str = "anon", lane: str = INTERACTIVE):
+    d = RATES.acquire(tool, client, lane)
+    if not d.allowed:
+        raise HTTPException(status_code=429, detail=d.detail(), headers=d.headers())
 
 # -------------------------------------------------
-# Minimal RAG (keyword overlap on index.jsonl)
+# RAG (BM25 over index.jsonl, reloaded when the file changes)
 # -------------------------------------------------
+RAG = RagIndex(INDEX_PATH)
+
 def search_chunks(query: str, k: int = 6):
-    if not INDEX_PATH.exists():
-        return []
-    q = set(re.findall(r"\w+", query.lower()))
-    scored = []
-    with INDEX_PATH.open("r", encoding="utf-8") as f:
-        for line in f:
-            rec = json.loads(line)
-            t = set(re.findall(r"\w+", rec["text"].lower()))
-            score = len(q & t)
-            if score:
-                scored.append((score, rec))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [r for _, r in scored[:k]]
+    return RAG.search(query, k)
 
 @app.get("/debug/policy")
 def debug_policy():
-    return POLICY
+    return {**POLICY.current().to_dict(), "store": POLICY.stats()}
+
+@app.get("/debug/rate_limits")
+def debug_rate_limits():
+    return RATES.stats()
+
+@app.get("/debug/rag")
+def debug_rag():
+    return RAG.stats()
+
+@app.get("/debug/http")
+def debug_http():
+    return HTTP.stats()
 
 @app.get("/health")
 def orch_health():
+    policy = POLICY.current()
     return {
         "status": "ok",
         "policy_path": str(POLICY_PATH),
-        "mode": POLICY.get("mode"),
-        "allowed_tools": POLICY.get("allowed_tools", []),
+        "mode": policy.mode,
+        "allowed_tools": policy.allowed_tools,
+        "policy_version": policy.version,
+        "tool_cache": TOOL_CACHE.stats(),
     }
 
 # -------------------------------------------------
@@ -82,6 +128,7 @@ def orch_health():
 class ChatRequest(BaseModel):
     message: Union[str, dict]
     system: str | None = None
+    stream: bool = False   # True: server-sent events (token / tool_call / tool_result / done)
 
 class ToolBacktest(BaseModel):
     symbol: str
@@ -105,34 +152,71 @@ class RunPlotArgs(BaseModel):
 # Tool allow-list
 # -------------------------------------------------
 def tool_allowed(name: str) -> bool:
-    return name in POLICY.get("allowed_tools", [])
+    return POLICY.current().allows(name)
 
 # -------------------------------------------------
 # Low-level tool helpers that call the backtest API
 # -------------------------------------------------
+def _artifact_exists(out) -> bool:
+    # A cached backtest points at its .store/.csv under data/backtests;
+    # once that is deleted or pruned the result is useless to plot from
+    if not isinstance(out, dict) or not out.get("csv_path"):
+        return True
+    path = Path(out["csv_path"])
+    return (path if path.is_absolute() else ROOT / path).exists()
+
+# Per-tool check run on every cache hit
+CACHE_VALID = {"backtest.run": _artifact_exists}
+
+async def cached_tool(name: str, args: BaseModel, call, cacheable=lambda out: True):
+    # Identical calls share one result (and one in-flight request)
+    if TOOL_CACHE_TTL <= 0:
+        return await call()
+    return await TOOL_CACHE.get_or_compute(
+        name, args.dict(), call, cacheable, CACHE_VALID.get(name, lambda out: True))
+
+async def cached_result(name: str, args: BaseModel):
+    # (hit, result) without calling the backend
+    if TOOL_CACHE_TTL <= 0:
+        return False, None
+    return await TOOL_CACHE.lookup(name, args.dict(), CACHE_VALID.get(name, lambda out: True))
+
+def _backtest_ok(out) -> bool:
+    # Don't pin failed runs (bad symbol, download error) in the cache
+    return isinstance(out, dict) and out.get("exit_code", 0) == 0 and bool(out.get("csv_path"))
+
 async def tool_backtest(args: ToolBacktest):
-    async with httpx.AsyncClient(timeout=180) as client:
-        r = await client.post(f"{BACKTEST_URL}/run_backtest", json=args.dict())
+    async def call():
+        r = await HTTP.post("backtest", "/run_backtest", json=args.dict())
         r.raise_for_status()
         return r.json()
+    return await cached_tool("backtest.run", args, call, _backtest_ok)
 
 async def tool_plot(args: PlotRequest):
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(f"{BACKTEST_URL}/plot_equity", json=args.dict())
+    async def call():
+        r = await HTTP.post("backtest", "/plot_equity", json=args.dict(), timeout=60)
         r.raise_for_status()
         return {"image/png;base64": base64.b64encode(r.content).decode()}
+    return await cached_tool("plot.equity", args, call)
 
 async def tool_run_and_plot(args: RunPlotArgs):
-    async with httpx.AsyncClient(timeout=180) as client:
-        r = await client.post(f"{BACKTEST_URL}/run_and_plot", json=args.dict())
+    async def call():
+        r = await HTTP.post("backtest", "/run_and_plot", json=args.dict())
         r.raise_for_status()
         return r.json()
+    return await cached_tool("run_and_plot", args, call)
 
 async def tool_run_and_plot_save(args: RunPlotArgs):
-    async with httpx.AsyncClient(timeout=180) as client:
-        r = await client.post(f"{BACKTEST_URL}/run_and_plot_save", json=args.dict())
+    async def call():
+        r = await HTTP.post("backtest", "/run_and_plot_save", json=args.dict())
         r.raise_for_status()
         return r.json()
+    return await cached_tool("run_and_plot_save", args, call)
+
+@app.delete("/debug/tool_cache")
+def clear_tool_cache():
+    TOOL_CACHE.clear()
+    return TOOL_CACHE.stats()
 
 # -------------------------------------------------
 # /tool/run – unified entrypoint for tools
@@ -140,12 +224,13 @@ async def tool_run_and_plot_save(args: RunPlotArgs):
 from fastapi import Body  # keep import local if your linter whines
 
 @app.post("/tool/run")
-async def tool_run(payload: dict = Body(...)):
+async def tool_run(request: Request, payload: dict = Body(...)):
     name = payload.get("tool", "")
     args = payload.get("args", {})
 
     if not tool_allowed(name):
         raise HTTPException(status_code=403, detail=f"Tool '{name}' not allowed by policy.")
+    check_rate(name, *caller_of(request, BATCH))
 
     if name == "backtest.run":
         return {"tool": name, "result": await tool_backtest(ToolBacktest(**args))}
@@ -173,52 +258,55 @@ async def tool_run(payload: dict = Body(...)):
     raise HTTPException(status_code=400, detail=f"Unknown tool '{name}'")
 
 # -------------------------------------------------
-# /chat – normal LLM path, with optional tool calls
+# Tool dispatch shared by the /chat paths
 # -------------------------------------------------
-@app.post("/chat")
-async def chat(req: ChatRequest):
-    # 1) First: see if the user directly sent a tool JSON
+# name -> (args model, tool); the tool is looked up at call time
+CHAT_TOOLS = {
+    "backtest.run": (ToolBacktest, lambda a: tool_backtest(a)),
+    "plot.equity": (PlotRequest, lambda a: tool_plot(a)),
+    "run_and_plot": (RunPlotArgs, lambda a: tool_run_and_plot(a)),
+    "run_and_plot_save": (RunPlotArgs, lambda a: tool_run_and_plot_save(a)),
+}
+
+async def dispatch_tool(call: dict, client: str = "anon", lane: str = INTERACTIVE):
+    tool = call.get("tool", "")
+    args = call.get("args", {})
+
+    if not tool_allowed(tool):
+        raise HTTPException(status_code=403, detail=f"Tool '{tool}' not allowed by policy.")
+    if tool not in CHAT_TOOLS:
+        raise HTTPException(status_code=400, detail=f"Unknown tool '{tool}'")
+    model, fn = CHAT_TOOLS[tool]
+    parsed = model(**args)
+
+    # A cached result costs the backend nothing, so it costs no rate token
+    hit, out = await cached_result(tool, parsed)
+    if not hit:
+        check_rate(tool, client, lane)
+        out = await fn(parsed)
+    return {"tool": tool, "result": out}
+
+def direct_tool_call(message):
+    # The user may send a tool JSON directly instead of a question
     try:
-        maybe = req.message if isinstance(req.message, dict) else json.loads(req.message)
-        if isinstance(maybe, dict) and "tool" in maybe:
-            call = maybe
-            tool = call.get("tool", "")
-            args = call.get("args", {})
-
-            if not tool_allowed(tool):
-                raise HTTPException(status_code=403, detail=f"Tool '{tool}' not allowed by policy.")
-
-            if tool == "backtest.run":
-                out = await tool_backtest(ToolBacktest(**args))
-                return {"tool": tool, "result": out}
-            if tool == "plot.equity":
-                out = await tool_plot(PlotRequest(**args))
-                return {"tool": tool, "result": out}
-            if tool == "run_and_plot":
-                out = await tool_run_and_plot(RunPlotArgs(**args))
-                return {"tool": tool, "result": out}
-            if tool == "run_and_plot_save":
-                out = await tool_run_and_plot_save(RunPlotArgs(**args))
-                return {"tool": tool, "result": out}
-
-            raise HTTPException(status_code=400, detail=f"Unknown tool '{tool}'")
+        maybe = message if isinstance(message, dict) else json.loads(message)
     except (json.JSONDecodeError, TypeError):
-        # Not direct JSON; fall through to model call
-        pass
+        return None
+    return maybe if isinstance(maybe, dict) and "tool" in maybe else None
 
-    # 2) Normal LLM chat with RAG context
+def ollama_payload(req: ChatRequest, stream: bool) -> dict:
     ctx = search_chunks(str(req.message), k=6)
     context = "\n\n---\n".join([c["text"] for c in ctx]) if ctx else "No RAG context."
 
     system = req.system or (
         "You are Aegis, a single-mind trading model. "
-        f"Policy mode: {POLICY['mode']}. Use tools only if needed. "
+        f"Policy mode: {POLICY.current().mode}. Use tools only if needed. "
         "When using tools, respond ONLY with a JSON object like "
         '{"tool":"backtest.run","args":{"symbol":"SPY","start":"2020-01-01","end":"2025-11-01","fast":50,"slow":200}}'
     )
 
-    payload = {
-        "model": "llama3.1:8b-instruct-q4_K_M",
+    return {
+        "model": OLLAMA_MODEL,
         "messages": [
             {"role": "system", "content": system},
             {
@@ -230,42 +318,111 @@ async def chat(req: ChatRequest):
                 ),
             },
         ],
-        "stream": False,
+        "stream": stream,
     }
 
-    async with httpx.AsyncClient(timeout=60) as client:
-        r = await client.post(OLLAMA_URL, json=payload)
-        r.raise_for_status()
-        reply = r.json()["message"]["content"].strip()
+# -------------------------------------------------
+# /chat – normal LLM path, with optional tool calls
+# -------------------------------------------------
+@app.post("/chat")
+async def chat(req: ChatRequest, request: Request):
+    client, lane = caller_of(request, INTERACTIVE)
+    if req.stream:
+        return StreamingResponse(
+            chat_events(req, client, lane),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    # 1) First: see if the user directly sent a tool JSON
+    call = direct_tool_call(req.message)
+    if call is not None:
+        return await dispatch_tool(call, client, lane)
+
+    # 2) Normal LLM chat with RAG context
+    r = await HTTP.post("ollama", OLLAMA_URL, json=ollama_payload(req, stream=False))
+    r.raise_for_status()
+    reply = r.json()["message"]["content"].strip()
 
     # 3) Try to parse a tool call out of the model's reply
     m = re.search(r"\{.*\}", reply, flags=re.S)
     if m:
         try:
-            call = json.loads(m.group(0))
-            tool = call.get("tool", "")
-            args = call.get("args", {})
-
-            if not tool_allowed(tool):
-                raise HTTPException(status_code=403, detail=f"Tool '{tool}' not allowed by policy.")
-
-            if tool == "backtest.run":
-                out = await tool_backtest(ToolBacktest(**args))
-                return {"tool": tool, "result": out}
-            if tool == "plot.equity":
-                out = await tool_plot(PlotRequest(**args))
-                return {"tool": tool, "result": out}
-            if tool == "run_and_plot":
-                out = await tool_run_and_plot(RunPlotArgs(**args))
-                return {"tool": tool, "result": out}
-            if tool == "run_and_plot_save":
-                out = await tool_run_and_plot_save(RunPlotArgs(**args))
-                return {"tool": tool, "result": out}
-
-            raise HTTPException(status_code=400, detail=f"Unknown tool '{tool}'")
+            return await dispatch_tool(json.loads(m.group(0)), client, lane)
+        except HTTPException as e:
+            if e.status_code == 429:
+                raise
         except Exception:
             # If parsing fails, just fall through
             pass
 
     # 4) Plain text answer
     return {"answer": reply}
+
+async def _tool_events(call: dict, client: str, lane: str):
+    yield sse("tool_call", {"tool": call.get("tool", ""), "args": call.get("args", {})})
+    try:
+        yield sse("tool_result", await dispatch_tool(call, client, lane))
+    except HTTPException as e:
+        err = {"status": e.status_code, "detail": e.detail}
+        if e.status_code == 429:
+            err["retry_after"] = int((e.headers or {}).get("Retry-After", 1))
+        yield sse("error", err)
+    except Exception as e:
+        yield sse("error", {"status": 502, "detail": repr(e)})
+
+async def chat_events(req: ChatRequest, client: str = "anon", lane: str = INTERACTIVE):
+    """
+    Streaming /chat: model tokens are forwarded as they arrive. A tool
+    JSON in the reply is held back, and the tool is dispatched as soon
+    as its closing brace streams in (the rest of the generation is
+    dropped).
+    """
+    call = direct_tool_call(req.message)
+    if call is not None:
+        async for ev in _tool_events(call, client, lane):
+            yield ev
+        yield sse("done", {"answer": None})
+        return
+
+    detector = ToolCallDetector()
+    answer = []
+    try:
+        async with HTTP.stream("ollama", "POST", OLLAMA_URL, json=ollama_payload(req, stream=True)) as r:
+            if r.status_code >= 400:
+                await r.aread()
+                yield sse("error", {"status": r.status_code, "detail": r.text})
+                return
+            async for line in r.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except ValueError:
+                    chunk = None
+                if not isinstance(chunk, dict) or "error" in chunk:
+                    # Partial/garbled NDJSON, or Ollama reporting a failure mid-stream
+                    detail = chunk["error"] if isinstance(chunk, dict) else f"bad chunk from model: {line[:200]!r}"
+                    yield sse("error", {"status": 502, "detail": detail})
+                    return
+                text, call = detector.feed(chunk.get("message", {}).get("content", ""))
+                if text:
+                    answer.append(text)
+                    yield sse("token", {"text": text})
+                if call is not None or chunk.get("done"):
+                    break
+    except httpx.HTTPError as e:
+        yield sse("error", {"status": 502, "detail": repr(e)})
+        return
+
+    if call is not None:
+        async for ev in _tool_events(call, client, lane):
+            yield ev
+        yield sse("done", {"answer": "".join(answer).strip() or None})
+        return
+
+    tail = detector.flush()
+    if tail:
+        answer.append(tail)
+        yield sse("token", {"text": tail})
+    yield sse("done", {"answer": "".join(answer).strip()})
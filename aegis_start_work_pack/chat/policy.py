@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from pathlib import Path
+from types import MappingProxyType
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+import yaml
+
+from chat.rate_limit import DEFAULT_RESERVE, RateSpec, spec_from_policy
+
+
+log = logging.getLogger(__name__)
+
+
+class PolicyError(ValueError):
+    """policy.yaml doesn't parse or doesn't fit either schema."""
+
+
+@dataclass(frozen=True)
+class Policy:
+    """
+    One compiled policy.yaml. Immutable: a reload builds a new Policy and
+    swaps it in, so a request that grabbed one sees a consistent view.
+
+    Tools are allowed only when they are listed in allow and not in deny;
+    there is no allow-everything mode, so an empty allow set allows
+    nothing.
+    """
+
+    mode: str = "paper"
+    allow: FrozenSet[str] = frozenset()
+    deny: FrozenSet[str] = frozenset()
+    rate_limits: Mapping[str, RateSpec] = field(default_factory=lambda: MappingProxyType({}))
+    risk: Mapping[str, float] = field(default_factory=lambda: MappingProxyType({}))
+    path: str = ""
+    sha: Optional[str] = None      # of the file bytes; None when the file is missing
+    version: int = 0               # bumped by PolicyStore on every swap
+    loaded_at: str = field(default_factory=lambda: datetime.now(timezone.utc).isoformat())
+
+    def allows(self, tool: str) -> bool:
+        if tool in self.deny:
+            return False
+        return tool in self.allow
+
+    @property
+    def allowed_tools(self) -> List[str]:
+        return sorted(self.allow)
+
+    @property
+    def max_symbols(self) -> Optional[int]:
+        v = self.risk.get("max_symbols")
+        return int(v) if v is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "allowed_tools": self.allowed_tools,
+            "denied_tools": sorted(self.deny),
+            "rate_limits": {k: s.text for k, s in self.rate_limits.items()},
+            "risk": dict(self.risk),
+            "path": self.path,
+            "sha": self.sha,
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+        }
+
+
+def _names(value: Any, where: str) -> FrozenSet[str]:
+    if value is None:
+        return frozenset()
+    if not isinstance(value, list) or not all(isinstance(v, str) for v in value):
+        raise PolicyError(f"{where} must be a list of tool names")
+    return frozenset(v.strip() for v in value)
+
+
+def compile_policy(raw: Any, path: str = "", sha: Optional[str] = None,
+                   reserve: float = DEFAULT_RESERVE) -> Policy:
+    """
+    Build a Policy from parsed YAML. Both schemas in use are accepted:
+
+        allowed_tools: [...]          # config/policy.yaml
+        denied_tools: [...]
+        tools: {allow: [...], deny: [...]}   # aegis_start_work_pack/config
+
+    A file without an allow list (or with an empty one) allows no tools.
+    An empty document raises PolicyError: that is what a truncated or
+    half-written file looks like, and PolicyStore keeps the previous
+    version rather than swapping it in.
+
+    rate_limits are parsed into RateSpecs (see chat/rate_limit.py).
+    Risk caps are the numeric top-level max_* keys (max_symbols) plus
+    anything under a `risk:` mapping.
+    """
+    if raw is None or raw == {}:
+        raise PolicyError("policy is empty")
+    if not isinstance(raw, dict):
+        raise PolicyError("policy must be a mapping")
+
+    tools = raw.get("tools")
+    if tools is not None and not isinstance(tools, dict):
+        raise PolicyError("tools must be a mapping with allow/deny lists")
+    tools = tools or {}
+    if "allowed_tools" in raw and "allow" in tools:
+        raise PolicyError("use either allowed_tools or tools.allow, not both")
+
+    if "allowed_tools" in raw:
+        allow = _names(raw["allowed_tools"], "allowed_tools")
+    else:
+        allow = _names(tools.get("allow"), "tools.allow")
+    deny = _names(raw.get("denied_tools"), "denied_tools") | _names(tools.get("deny"), "tools.deny")
+
+    limits = raw.get("rate_limits") or {}
+    if not isinstance(limits, dict):
+        raise PolicyError("rate_limits must be a mapping")
+    specs: Dict[str, RateSpec] = {}
+    for key, value in limits.items():
+        try:
+            spec = spec_from_policy(str(key), value, reserve=reserve)
+        except (ValueError, KeyError, TypeError) as e:
+            raise PolicyError(f"rate_limits.{key}: {e}")
+        specs[spec.key] = spec
+
+    risk: Dict[str, float] = {}
+    extra = raw.get("risk") or {}
+    if not isinstance(extra, dict):
+        raise PolicyError("risk must be a mapping")
+    for key, value in [*((k, v) for k, v in raw.items() if str(k).startswith("max_")), *extra.items()]:
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise PolicyError(f"risk cap {key} must be a number")
+        risk[str(key)] = value
+
+    return Policy(
+        mode=str(raw.get("mode", "paper")),
+        allow=allow,
+        deny=deny,
+        rate_limits=MappingProxyType(specs),
+        risk=MappingProxyType(risk),
+        path=path,
+        sha=sha,
+    )
+
+
+def load_policy(path: Path, reserve: float = DEFAULT_RESERVE) -> Policy:
+    """
+    Compile the file at `path`. A missing file gives a policy that allows
+    no tools.
+    """
+    path = Path(path)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return Policy(path=str(path))
+    try:
+        raw = yaml.safe_load(data.decode("utf-8"))
+    except (UnicodeDecodeError, yaml.YAMLError) as e:
+        raise PolicyError(f"{path}: {e}")
+    return compile_policy(raw, str(path), hashlib.sha256(data).hexdigest()[:12], reserve=reserve)
+
+
+class PolicyStore:
+    """
+    The live policy for one policy.yaml, recompiled when the file's mtime
+    or size changes (checked with a stat at most every check_every
+    seconds, on access). The new Policy is swapped in with a single
+    assignment, so edits apply without a restart and no request sees a
+    half-loaded policy.
+
+    A file that fails to compile is reported (last_error) and the
+    previous policy stays in force; the startup load raises instead.
+    Subscribers are called with each new Policy after it is swapped in.
+    """
+
+    def __init__(self, path: Path, check_every: float = 1.0, reserve: float = DEFAULT_RESERVE):
+        self.path = Path(path)
+        self.check_every = float(check_every)
+        self.reserve = float(reserve)
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[Policy], None]] = []
+        self.reloads = 0
+        self.last_error: Optional[str] = None
+        self._sig = self._stat()
+        self._policy = self._compile(version=1)
+        self._checked = time.monotonic()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _compile(self, version: int) -> Policy:
+        return replace(load_policy(self.path, reserve=self.reserve), version=version)
+
+    def subscribe(self, fn: Callable[[Policy], None]) -> None:
+        self._listeners.append(fn)
+
+    def current(self) -> Policy:
+        if time.monotonic() - self._checked >= self.check_every:
+            return self.refresh()
+        return self._policy
+
+    def refresh(self) -> Policy:
+        self._checked = time.monotonic()
+        sig = self._stat()
+        if sig == self._sig:
+            return self._policy
+        with self._lock:
+            if sig == self._sig:
+                return self._policy
+            self._sig = sig
+            try:
+                new = self._compile(self._policy.version + 1)
+            except PolicyError as e:
+                self.last_error = str(e)
+                log.warning("%s: keeping policy version %d: %s", self.path, self._policy.version, e)
+                return self._policy
+            self._policy = new
+            self.reloads += 1
+            self.last_error = None
+        log.info("%s: loaded policy version %d (sha %s)", self.path, new.version, new.sha)
+        for fn in self._listeners:
+            fn(new)
+        return new
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "version": self._policy.version,
+            "sha": self._policy.sha,
+            "reloads": self.reloads,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class Throughput:
+    """
+    Completion counter with a throughput and ETA estimate.
+
+    runs_per_sec is finished units over wall time since `started`
+    (epoch seconds, default: now) until stop() (or `now`); eta_s is the
+    remaining units at that rate, None until the first unit finishes.
+    """
+
+    def __init__(self, total: int = 0, started: Optional[float] = None):
+        self.total = int(total)
+        self.done = 0
+        self.failed = 0
+        self.started = time.time() if started is None else float(started)
+        self.stopped: Optional[float] = None
+
+    def update(self, done: int, failed: int = 0, total: Optional[int] = None) -> None:
+        self.done = int(done)
+        self.failed = int(failed)
+        if total is not None:
+            self.total = int(total)
+
+    def stop(self) -> None:
+        self.stopped = time.time()
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Any]:
+        if now is None:
+            now = self.stopped or time.time()
+        elapsed = max(0.0, now - self.started)
+        rate = self.done / elapsed if self.done and elapsed > 0 else None
+        remaining = max(0, self.total - self.done)
+        return {
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "pct": round(100.0 * self.done / self.total, 1) if self.total else None,
+            "elapsed_s": round(elapsed, 3),
+            "runs_per_sec": round(rate, 3) if rate else None,
+            "eta_s": round(remaining / rate, 1) if rate else (0.0 if self.total and not remaining else None),
+        }
+
+
+class ProgressFeed:
+    """
+    Append-only event log for one job, written by worker threads and read
+    by any number of SSE subscribers.
+
+    Every event gets a sequence number; a subscriber remembers the last
+    one it saw and asks for what came after, so a client that connects
+    late (or reconnects with Last-Event-ID) still gets the full history.
+    At most `keep` events are retained.
+    """
+
+    def __init__(self, keep: int = 10_000):
+        self.keep = max(1, int(keep))
+        self._events: List[Tuple[int, str, Dict[str, Any]]] = []
+        self._seq = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def publish(self, event: str, data: Dict[str, Any]) -> int:
+        with self._cond:
+            self._seq += 1
+            self._events.append((self._seq, event, data))
+            if len(self._events) > self.keep:
+                del self._events[: len(self._events) - self.keep]
+            self._cond.notify_all()
+            return self._seq
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def since(self, seq: int, timeout: float = 0.0) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], bool]:
+        """
+        Events after `seq`, waiting up to `timeout` seconds for one to
+        arrive. Returns (events, closed).
+        """
+        with self._cond:
+            if timeout > 0 and self._seq <= seq and not self._closed:
+                self._cond.wait(timeout)
+            if not self._events:
+                return [], self._closed
+            # Sequence numbers are consecutive, so the tail is one slice
+            start = max(0, seq + 1 - self._events[0][0])
+            return self._events[start:], self._closed
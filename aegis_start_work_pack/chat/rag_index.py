@@ -0,0 +1,444 @@
+from __future__ import annotations
+
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+# --- Tokenizer ------------------------------------------------------
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    # Same tokens the old keyword-overlap search used
+    return _WORD.findall(text.lower())
+
+
+# --- Inverted index -------------------------------------------------
+
+class InvertedIndex:
+    """
+    BM25 index over RAG chunk records ({"path", "chunk_id", "text"}).
+
+    Each term maps to a postings list of (doc ids, term frequencies) held
+    as int32 arrays, so a query only touches the chunks that contain one
+    of its terms instead of re-tokenising the whole corpus.
+    """
+
+    def __init__(
+        self,
+        records: List[Dict[str, Any]],
+        postings: Dict[str, Tuple[np.ndarray, np.ndarray]],
+        doc_len: np.ndarray,
+        k1: float = 1.2,
+        b: float = 0.75,
+    ):
+        self.records = records
+        self.postings = postings
+        self.doc_len = doc_len.astype(np.float32, copy=False)
+        self.k1 = k1
+        self.b = b
+        self.avgdl = float(self.doc_len.mean()) if len(self.doc_len) else 0.0
+        # Per-chunk length normalisation, fixed for the life of the index
+        self._norm = (k1 * (1.0 - b + b * self.doc_len / (self.avgdl or 1.0))).astype(np.float32)
+        self.dense: Optional["VectorIndex"] = None  # attached by load_binary
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, Any]], **kw: Any) -> "InvertedIndex":
+        # Map every token to a term id, then let numpy count (term, doc)
+        # pairs in one sort instead of a Counter per chunk.
+        vocab: Dict[str, int] = {}
+        flat: List[int] = []
+        doc_len = np.zeros(len(records), dtype=np.int32)
+        for doc, rec in enumerate(records):
+            toks = tokenize(rec.get("text", ""))
+            doc_len[doc] = len(toks)
+            flat.extend([vocab.setdefault(t, len(vocab)) for t in toks])
+
+        n = max(1, len(records))
+        docs = np.repeat(np.arange(len(records), dtype=np.int64), doc_len)
+        pairs, tf = np.unique(np.asarray(flat, dtype=np.int64) * n + docs, return_counts=True)
+        term_of = pairs // n
+        bounds = np.searchsorted(term_of, np.arange(len(vocab) + 1))
+        doc_ids = (pairs % n).astype(np.int32)
+        tf = tf.astype(np.int32)
+
+        postings = {
+            term: (doc_ids[bounds[tid]:bounds[tid + 1]], tf[bounds[tid]:bounds[tid + 1]])
+            for term, tid in vocab.items()
+        }
+        return cls(records, postings, doc_len, **kw)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def _accumulate(self, query: str) -> Tuple[Optional[np.ndarray], List[np.ndarray]]:
+        # Dense per-chunk BM25 scores plus the postings that touched them
+        n = len(self.records)
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t in self.postings]
+        if not terms or not n:
+            return None, []
+
+        acc = np.zeros(n, dtype=np.float32)
+        touched = []
+        for term in terms:
+            ids, tfs = self.postings[term]
+            df = len(ids)
+            idf = math.log(1.0 + (n - df + 0.5) / (df + 0.5))
+            tf = tfs.astype(np.float32)
+            # ids are unique within a postings list, so fancy += is safe
+            acc[ids] += idf * tf * (self.k1 + 1.0) / (tf + self._norm[ids])
+            touched.append(ids)
+        return acc, touched
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (doc ids, BM25 scores) for every chunk matching at least one
+        query term.
+        """
+        acc, touched = self._accumulate(query)
+        if acc is None:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        cand = np.unique(np.concatenate(touched)) if len(touched) > 1 else touched[0]
+        return cand, acc[cand]
+
+    def search(self, query: str, k: int = 6, alpha: float = 0.5) -> List[Tuple[float, Dict[str, Any]]]:
+        """
+        Top-k (score, record). With embedding vectors attached and
+        alpha > 0 the score is alpha * cosine + (1 - alpha) * BM25
+        (scaled to the best keyword hit); otherwise plain BM25.
+        """
+        if self.dense is None or alpha <= 0 or not tokenize(query):
+            cand, sc = self.scores(query)
+            top = heapq.nlargest(k, zip(sc.tolist(), cand.tolist()))
+            return [(s, self.records[d]) for s, d in top]
+
+        combined = self.dense.scores(query)
+        combined *= alpha
+        acc, _ = self._accumulate(query)
+        if acc is not None:
+            best = float(acc.max())
+            if best > 0:
+                acc *= (1.0 - alpha) / best
+                combined += acc
+
+        n = len(combined)
+        k = min(k, n)
+        if k <= 0:
+            return []
+        top = np.argpartition(combined, n - k)[n - k:]
+        top = top[np.argsort(-combined[top], kind="stable")]
+        return [(float(combined[d]), self.records[d]) for d in top.tolist() if combined[d] > 0]
+
+
+def read_records(path: Path) -> List[Dict[str, Any]]:
+    records: List[Dict[str, Any]] = []
+    with Path(path).open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                continue  # half-written line from a concurrent rebuild
+            if isinstance(rec, dict) and "text" in rec:
+                records.append(rec)
+    return records
+
+
+# --- Embeddings -----------------------------------------------------
+#
+# Offline, dependency-free embeddings via the hashing trick: unigrams and
+# bigrams are hashed (crc32, stable across processes) into a fixed number
+# of signed buckets, log-scaled and L2-normalised. Vectors for the whole
+# corpus live in one float32 .npy that is memory-mapped at load time, and
+# search is a single brute-force matrix-vector product.
+
+class HashingEmbedder:
+    def __init__(self, dim: int = 128, bigrams: bool = True):
+        self.dim = int(dim)
+        self.bigrams = bool(bigrams)
+        self._slots: Dict[str, Tuple[int, float]] = {}
+
+    def config(self) -> Dict[str, Any]:
+        return {"kind": "hashing", "dim": self.dim, "bigrams": self.bigrams}
+
+    @classmethod
+    def from_config(cls, cfg: Dict[str, Any]) -> "HashingEmbedder":
+        if cfg.get("kind") != "hashing":
+            raise ValueError(f"Unknown embedder: {cfg.get('kind')}")
+        return cls(dim=cfg["dim"], bigrams=cfg["bigrams"])
+
+    def _slot(self, feat: str) -> Tuple[int, float]:
+        slot = self._slots.get(feat)
+        if slot is None:
+            h = zlib.crc32(feat.encode("utf-8"))
+            slot = (h % self.dim, 1.0 if h & 0x80000000 else -1.0)
+            if len(self._slots) < 1_000_000:
+                self._slots[feat] = slot
+        return slot
+
+    def embed(self, text: str) -> np.ndarray:
+        toks = tokenize(text)
+        feats = toks + [f"{a} {b}" for a, b in zip(toks, toks[1:])] if self.bigrams else toks
+        vec = np.zeros(self.dim, dtype=np.float32)
+        if not feats:
+            return vec
+        slots = [self._slot(f) for f in feats]
+        idx = np.fromiter((i for i, _ in slots), dtype=np.int64, count=len(slots))
+        sign = np.fromiter((g for _, g in slots), dtype=np.float32, count=len(slots))
+        np.add.at(vec, idx, sign)
+        vec = np.sign(vec) * np.log1p(np.abs(vec))
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, t in enumerate(texts):
+            out[i] = self.embed(t)
+        return out
+
+
+class VectorIndex:
+    """
+    Row-aligned embedding matrix (float32, usually a memmap) for the
+    chunks of an InvertedIndex.
+    """
+
+    def __init__(self, vectors: np.ndarray, embedder: HashingEmbedder):
+        self.vectors = vectors
+        self.embedder = embedder
+
+    def scores(self, query: str) -> np.ndarray:
+        # Rows and query are unit-length, so this is cosine similarity
+        return self.vectors @ self.embedder.embed(query)
+
+
+def vectors_path(index_path: Path, version: Optional[str] = None) -> Path:
+    """
+    index.vec-<version>.npy. Every build writes a new version and the
+    binary companion names the one it goes with, so a build never
+    replaces a file that a reader (or the build itself) has memory-mapped,
+    which Windows refuses. Without a version: the pre-versioning name.
+    """
+    index_path = Path(index_path)
+    if version is None:
+        return index_path.with_suffix(".vec.npy")
+    return index_path.with_name(f"{index_path.stem}.vec-{version}.npy")
+
+
+def save_vectors(vectors: np.ndarray, path: Path) -> Path:
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as f:
+        np.save(f, np.ascontiguousarray(vectors, dtype=np.float32), allow_pickle=False)
+    os.replace(tmp, path)
+    return path
+
+
+def prune_vectors(index_path: Path, keep: str) -> int:
+    """
+    Delete the vector files of earlier builds, all but `keep` (a file
+    name). Files still mapped by a reader on Windows can't be deleted yet
+    and are left for the next build. Returns files removed.
+    """
+    index_path = Path(index_path)
+    removed = 0
+    for p in index_path.parent.glob(f"{index_path.stem}.vec*.npy"):
+        if p.name == keep:
+            continue
+        try:
+            p.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+# --- Binary companion ----------------------------------------------
+#
+# build_index writes index.npz next to index.jsonl: the postings, doc
+# lengths and chunk records packed into flat arrays, plus the jsonl's
+# (mtime_ns, size) it was built from. Loading it skips JSON parsing and
+# re-tokenising; it is ignored whenever it doesn't match the jsonl.
+
+BINARY_VERSION = 1
+
+
+def binary_path(index_path: Path) -> Path:
+    return Path(index_path).with_suffix(".npz")
+
+
+def _pack_strings(items: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> List[str]:
+    raw = blob.tobytes()
+    off = offsets.tolist()
+    return [raw[off[i]:off[i + 1]].decode("utf-8") for i in range(len(off) - 1)]
+
+
+def save_binary(
+    index: InvertedIndex,
+    path: Path,
+    source: Tuple[int, int],
+    vectors: Optional[Dict[str, Any]] = None,
+) -> Path:
+    """
+    Write index to path (atomically) tagged with the source jsonl's
+    (mtime_ns, size). vectors, if given, references the embedding matrix
+    saved alongside: {"file", "rows", "embedder"}.
+    """
+    terms = list(index.postings)
+    lengths = [len(index.postings[t][0]) for t in terms]
+    bounds = np.zeros(len(terms) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=bounds[1:])
+    empty = np.empty(0, dtype=np.int32)
+    doc_ids = np.concatenate([index.postings[t][0] for t in terms]) if terms else empty
+    tfs = np.concatenate([index.postings[t][1] for t in terms]) if terms else empty
+
+    term_blob, term_off = _pack_strings(terms)
+    text_blob, text_off = _pack_strings([r.get("text", "") for r in index.records])
+    path_blob, path_off = _pack_strings([str(r.get("path", "")) for r in index.records])
+    meta = {"version": BINARY_VERSION, "source": list(source), "k1": index.k1, "b": index.b}
+    if vectors is not None:
+        meta["vectors"] = vectors
+
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    with tmp.open("wb") as f:
+        np.savez(
+            f,
+            meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            term_blob=term_blob, term_off=term_off, bounds=bounds,
+            doc_ids=doc_ids.astype(np.int32), tfs=tfs.astype(np.int32),
+            doc_len=index.doc_len.astype(np.int32),
+            text_blob=text_blob, text_off=text_off,
+            path_blob=path_blob, path_off=path_off,
+            chunk_ids=np.asarray([int(r.get("chunk_id", 0)) for r in index.records], dtype=np.int64),
+        )
+    os.replace(tmp, path)
+    return path
+
+
+def load_binary(path: Path, source: Optional[Tuple[int, int]] = None) -> Optional[InvertedIndex]:
+    """
+    Load a binary index, or None if it is missing, unreadable or (when
+    source is given) built from a different jsonl.
+    """
+    try:
+        z = np.load(Path(path), allow_pickle=False)
+        meta = json.loads(z["meta"].tobytes().decode("utf-8"))
+    except (OSError, ValueError, KeyError):
+        return None
+    if meta.get("version") != BINARY_VERSION:
+        return None
+    if source is not None and tuple(meta.get("source", ())) != tuple(source):
+        return None
+
+    terms = _unpack_strings(z["term_blob"], z["term_off"])
+    bounds = z["bounds"].tolist()
+    doc_ids, tfs = z["doc_ids"], z["tfs"]
+    postings = {
+        t: (doc_ids[bounds[i]:bounds[i + 1]], tfs[bounds[i]:bounds[i + 1]])
+        for i, t in enumerate(terms)
+    }
+    texts = _unpack_strings(z["text_blob"], z["text_off"])
+    paths = _unpack_strings(z["path_blob"], z["path_off"])
+    records = [
+        {"path": p, "chunk_id": c, "text": t}
+        for p, c, t in zip(paths, z["chunk_ids"].tolist(), texts)
+    ]
+    index = InvertedIndex(records, postings, z["doc_len"], k1=meta["k1"], b=meta["b"])
+
+    vec = meta.get("vectors")
+    if vec:
+        try:
+            embedder = HashingEmbedder.from_config(vec["embedder"])
+            mat = np.load(Path(path).parent / vec["file"], mmap_mode="r")
+        except (OSError, ValueError, KeyError):
+            mat = None
+        if mat is not None and mat.shape == (len(records), embedder.dim):
+            index.dense = VectorIndex(mat, embedder)
+    return index
+
+
+# --- Hot-reloading handle -------------------------------------------
+
+class RagIndex:
+    """
+    The index for one index.jsonl, loaded once and rebuilt only when the
+    mtime or size of the jsonl or its binary companion changes (checked
+    with a stat of each per query). Loads from the binary companion when
+    it matches the jsonl.
+
+    build_index replaces the jsonl before the companion, so a query in
+    between loads the jsonl alone (no vectors); watching the companion
+    too means the next query picks up the finished build.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._index: Optional[InvertedIndex] = None
+        self._sig: Optional[Tuple[Tuple[int, int], Optional[Tuple[int, int]]]] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.refresh()
+
+    @staticmethod
+    def _stat_of(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _stat(self) -> Optional[Tuple[Tuple[int, int], Optional[Tuple[int, int]]]]:
+        source = self._stat_of(self.path)
+        if source is None:
+            return None
+        return source, self._stat_of(binary_path(self.path))
+
+    def refresh(self) -> Optional[InvertedIndex]:
+        sig = self._stat()
+        if sig == self._sig:
+            return self._index
+        with self._lock:
+            if sig != self._sig:
+                self._index = self._load(sig[0]) if sig else None
+                self._sig = sig
+                self.reloads += 1
+        return self._index
+
+    def _load(self, source: Tuple[int, int]) -> InvertedIndex:
+        index = load_binary(binary_path(self.path), source=source)
+        if index is None:
+            index = InvertedIndex.from_records(read_records(self.path))
+        return index
+
+    def search(self, query: str, k: int = 6, alpha: float = 0.5) -> List[Dict[str, Any]]:
+        index = self.refresh()
+        if index is None:
+            return []
+        return [rec for _, rec in index.search(query, k, alpha)]
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "path": str(self.path),
+            "chunks": len(index) if index is not None else 0,
+            "terms": len(index.postings) if index is not None else 0,
+            "vectors": index.dense.embedder.config() if index is not None and index.dense else None,
+            "reloads": self.reloads,
+        }
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import math
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Mapping, Optional, Tuple
+
+
+INTERACTIVE = "interactive"
+BATCH = "batch"
+LANES = (INTERACTIVE, BATCH)
+
+_GLOBAL = "\0global"   # client slot of the shared per-tool bucket
+
+# Share of each bucket that batch callers can't spend, so interactive
+# users still get through while an agent is hammering the same tool
+DEFAULT_RESERVE = 0.2
+
+_PERIODS = {
+    "s": 1.0, "sec": 1.0, "second": 1.0,
+    "m": 60.0, "min": 60.0, "minute": 60.0,
+    "h": 3600.0, "hr": 3600.0, "hour": 3600.0,
+    "d": 86400.0, "day": 86400.0,
+}
+_RATE_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*/\s*(\d*)\s*([a-z]+?)s?\s*$")
+_KEY_RE = re.compile(r"^(.+?)_per_(second|minute|hour|day)$")
+
+
+def parse_rate(value: Any, period: Optional[str] = None) -> Tuple[float, float]:
+    """
+    "10/hour", "5/min", "100/5m" or a bare count (with `period`, e.g.
+    from a backtest_per_hour key) -> (count, period_seconds).
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if period is None:
+            raise ValueError(f"rate {value!r} needs a period (e.g. '{value}/hour')")
+        return float(value), _PERIODS[period]
+    m = _RATE_RE.match(str(value).lower())
+    if not m or m.group(3) not in _PERIODS:
+        raise ValueError(f"cannot parse rate {value!r} (expected e.g. '10/hour')")
+    count, mult, unit = m.groups()
+    return float(count), _PERIODS[unit] * (int(mult) if mult else 1)
+
+
+@dataclass(frozen=True)
+class RateSpec:
+    """
+    One limit from policy.yaml: `rate` tokens per second refilling a
+    bucket of `burst` tokens per (key, client). The `reserve` fraction of
+    each bucket is held back from the batch lane. With global_rate, all
+    clients together also share one (global_rate, global_burst) bucket.
+    """
+
+    key: str
+    rate: float
+    burst: float
+    reserve: float = 0.0
+    global_rate: Optional[float] = None
+    global_burst: Optional[float] = None
+    text: str = ""
+
+
+def spec_from_policy(key: str, value: Any, burst: Optional[float] = None,
+                     reserve: float = DEFAULT_RESERVE) -> RateSpec:
+    """
+    Accepts both policy schemas:
+
+        rate_limits:
+          backtest.run: 10/hour                 # config/policy.yaml
+          backtest_per_hour: 10                 # aegis_start_work_pack/config
+          backtest.run: {rate: 10/hour, burst: 3, reserve: 0.5, global: 60/hour}
+
+    The tool key of the *_per_<period> form is the part before _per_.
+    """
+    period = None
+    m = _KEY_RE.match(key)
+    if m and not isinstance(value, (str, dict)):
+        key, period = m.group(1), m.group(2)
+
+    opts: Dict[str, Any] = dict(value) if isinstance(value, dict) else {"rate": value}
+    count, seconds = parse_rate(opts["rate"], period)
+    if count <= 0:
+        raise ValueError(f"rate for {key!r} must be > 0")
+    b = max(1.0, float(opts.get("burst", burst if burst is not None else count)))
+    r = min(max(0.0, float(opts.get("reserve", reserve))), 1.0)
+
+    g_rate = g_burst = None
+    if opts.get("global") is not None:
+        g_count, g_seconds = parse_rate(opts["global"])
+        g_rate, g_burst = g_count / g_seconds, max(1.0, g_count)
+    return RateSpec(key=key, rate=count / seconds, burst=b, reserve=r,
+                    global_rate=g_rate, global_burst=g_burst,
+                    text=str(opts["rate"]) if period is None else f"{count:g}/{period}")
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    key: Optional[str] = None
+    client: str = ""
+    lane: str = INTERACTIVE
+    remaining: Optional[float] = None
+    retry_after: float = 0.0
+    limit: str = ""
+
+    def headers(self) -> Dict[str, str]:
+        if self.key is None:
+            return {}
+        out = {
+            "X-RateLimit-Limit": self.limit,
+            "X-RateLimit-Remaining": str(int(self.remaining or 0)),
+        }
+        if not self.allowed:
+            out["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return out
+
+    def detail(self) -> str:
+        return (f"Rate limit for '{self.key}' exceeded ({self.limit}, {self.lane} lane); "
+                f"retry in {max(1, math.ceil(self.retry_after))}s")
+
+
+class RateLimiter:
+    """
+    Token-bucket admission control keyed per (tool, client).
+
+    - A tool's limit is looked up by exact name, then aliases (tools that
+      cost the same as another, e.g. run_and_plot -> backtest.run), then
+      its namespace ("backtest" covers backtest.run). Unlimited tools are
+      always admitted.
+    - Buckets start full (burst tokens) and refill continuously at rate.
+    - Interactive callers may spend the whole bucket; batch callers must
+      leave spec.reserve tokens in it, so a batch storm can't lock a
+      human out of the same tool.
+    - A call may cost several tokens. Denials report retry_after: the time
+      until the caller's lane would have enough tokens, for a 429
+      Retry-After or for a scheduler to sleep on (/multi-run paces its
+      cells that way). A cost above capacity() can never be admitted;
+      callers check that first.
+    - At most max_keys buckets are kept; idle ones that have refilled
+      completely carry no state and are dropped first.
+    """
+
+    def __init__(self, specs: Mapping[str, RateSpec], aliases: Optional[Mapping[str, str]] = None,
+                 clock: Callable[[], float] = time.monotonic, max_keys: int = 10_000):
+        self.specs = dict(specs)
+        self.aliases = dict(aliases or {})
+        self.clock = clock
+        self.max_keys = max(1, int(max_keys))
+        self._buckets: Dict[Tuple[str, str], list] = {}   # (key, client) -> [tokens, updated]
+        self._lock = threading.Lock()
+        self.counters = {"allowed": 0, "denied": 0}
+
+    @classmethod
+    def from_policy(cls, rate_limits: Optional[Mapping[str, Any]], aliases: Optional[Mapping[str, str]] = None,
+                    burst: Optional[float] = None, reserve: float = DEFAULT_RESERVE, **kw: Any) -> "RateLimiter":
+        specs = {}
+        for key, value in (rate_limits or {}).items():
+            spec = spec_from_policy(str(key), value, burst=burst, reserve=reserve)
+            specs[spec.key] = spec
+        return cls(specs, aliases=aliases, **kw)
+
+    def set_specs(self, specs: Mapping[str, RateSpec]) -> None:
+        """
+        Swap in new limits (policy reload). Buckets of limits that didn't
+        change keep their level; the rest start over full.
+        """
+        with self._lock:
+            old, self.specs = self.specs, dict(specs)
+            for bkey in [k for k in self._buckets if old.get(k[0]) != self.specs.get(k[0])]:
+                del self._buckets[bkey]
+
+    def spec_for(self, tool: str) -> Optional[RateSpec]:
+        for name in (tool, self.aliases.get(tool)):
+            if name and name in self.specs:
+                return self.specs[name]
+            if name and "." in name and name.split(".", 1)[0] in self.specs:
+                return self.specs[name.split(".", 1)[0]]
+        return None
+
+    def _level(self, bkey: Tuple[str, str], rate: float, burst: float, now: float) -> list:
+        b = self._buckets.get(bkey)
+        if b is None:
+            if len(self._buckets) >= self.max_keys:
+                self._evict(now)
+            b = self._buckets[bkey] = [burst, now]
+        else:
+            b[0] = min(burst, b[0] + (now - b[1]) * rate)
+            b[1] = now
+        return b
+
+    def _evict(self, now: float) -> None:
+        full = []
+        for (key, client), (tokens, updated) in self._buckets.items():
+            spec = self.specs.get(key)
+            if spec is None:
+                full.append((key, client))
+                continue
+            rate, burst = (spec.global_rate, spec.global_burst) if client == _GLOBAL else (spec.rate, spec.burst)
+            if tokens + (now - updated) * rate >= burst:
+                full.append((key, client))
+        for k in full:
+            del self._buckets[k]
+        while len(self._buckets) >= self.max_keys:
+            # Still full of active callers: drop the stalest
+            del self._buckets[min(self._buckets, key=lambda k: self._buckets[k][1])]
+
+    @staticmethod
+    def _floor(reserve: float, burst: float, lane: str) -> float:
+        # Batch must leave the reserve in the bucket, but can always get
+        # at least one token out of a full one
+        return min(reserve * burst, burst - 1.0) if lane == BATCH else 0.0
+
+    def capacity(self, tool: str, lane: str = INTERACTIVE) -> Optional[float]:
+        """
+        Most tokens one call to `tool` can spend in `lane` (None: unlimited).
+        """
+        spec = self.spec_for(tool)
+        if spec is None:
+            return None
+        cap = spec.burst - self._floor(spec.reserve, spec.burst, lane)
+        if spec.global_rate:
+            cap = min(cap, spec.global_burst - self._floor(spec.reserve, spec.global_burst, lane))
+        return cap
+
+    def acquire(self, tool: str, client: str = "anon", lane: str = INTERACTIVE, cost: float = 1.0) -> Decision:
+        spec = self.spec_for(tool)
+        if spec is None:
+            return Decision(True, client=client, lane=lane)
+        lane = lane if lane in LANES else INTERACTIVE
+        floor = self._floor(spec.reserve, spec.burst, lane)
+        cost = float(cost)
+        now = self.clock()
+
+        with self._lock:
+            b = self._level((spec.key, client), spec.rate, spec.burst, now)
+            wait = max(0.0, (cost + floor - b[0]) / spec.rate)
+            g = None
+            if spec.global_rate:
+                g = self._level((spec.key, _GLOBAL), spec.global_rate, spec.global_burst, now)
+                g_floor = self._floor(spec.reserve, spec.global_burst, lane)
+                wait = max(wait, (cost + g_floor - g[0]) / spec.global_rate)
+
+            if wait <= 0.0:
+                b[0] -= cost
+                if g is not None:
+                    g[0] -= cost
+                self.counters["allowed"] += 1
+            else:
+                self.counters["denied"] += 1
+            return Decision(
+                allowed=wait <= 0.0, key=spec.key, client=client, lane=lane,
+                remaining=max(0.0, b[0] - floor), retry_after=wait, limit=spec.text,
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "limits": {k: {"rate": s.text, "burst": s.burst, "batch_reserve": s.reserve,
+                               "global_per_s": s.global_rate} for k, s in self.specs.items()},
+                "aliases": dict(self.aliases),
+                "buckets": len(self._buckets),
+                **self.counters,
+            }
+
+
+def caller_of(request: Any, default_lane: str = INTERACTIVE) -> Tuple[str, str]:
+    """
+    (client, lane) for a FastAPI/Starlette request: X-Client-Id, else the
+    peer address; X-Priority: interactive|batch, else default_lane.
+    """
+    headers = getattr(request, "headers", None) or {}
+    client = headers.get("x-client-id")
+    if not client:
+        peer = getattr(request, "client", None)
+        client = getattr(peer, "host", None) or "anon"
+    lane = (headers.get("x-priority") or default_lane).strip().lower()
+    return client, lane if lane in LANES else default_lane
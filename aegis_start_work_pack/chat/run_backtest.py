@@ -1,20 +1,33 @@
-import argparse, os, sys
+import argparse, os, sys, uuid
 from datetime import datetime
+from pathlib import Path
 import pandas as pd
 import numpy as np
-try:
-    import yfinance as yf
-except ImportError:
-    print("ERROR: yfinance not installed. Run: python -m pip install yfinance pandas numpy matplotlib")
-    sys.exit(1)
+
+# make sure Python can see the project root (where strategies/ lives)
+ROOT = Path(__file__).resolve().parents[1]   # ...\aegis_start_work_pack
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from strategies.price_store import STORE_SUFFIX, write_frame
+from strategies.market_data import default_store
+
+YF_MISSING = "ERROR: yfinance not installed. Run: python -m pip install yfinance pandas numpy matplotlib"
+
+OUT_DIR = ROOT / "data" / "backtests"
 
 def load_prices(symbol, start, end):
-    df = yf.download(symbol, start=start, end=end, progress=False, auto_adjust=False)
-    if df.empty:
+    # Served from the local market-data store (data/market); only date
+    # ranges it hasn't seen yet are downloaded.
+    store = default_store()
+    if not store.provider.available():
+        raise RuntimeError(YF_MISSING)
+    bars = store.get(symbol, start, end)
+    if bars.empty:
         raise RuntimeError(f"No data returned for {symbol} in {start}..{end}")
-    col = "Adj Close" if "Adj Close" in df.columns else "Close"
-    df = df[[col]].rename(columns={col: "price"})
-    df.index = pd.to_datetime(df.index)
+    col = "adj_close" if "adj_close" in bars.columns else "close"
+    df = bars[[col]].rename(columns={col: "price"}).dropna()
+    df.index.name = None
     return df
 
 def sma_crossover(df, fast, slow):
@@ -42,6 +55,51 @@ def summarize(df):
         "trades": trades
     }
 
+def output_stem(symbol, fast, slow):
+    # Timestamp for humans plus a short random id, so two runs of the
+    # same parameters in the same second (the job pool) never share a path
+    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
+    return f"{symbol}_SMA{fast}-{slow}_{ts}-{uuid.uuid4().hex[:6]}"
+
+def run(symbol, start, end, fast, slow, fmt="npy", outdir=None):
+    """
+    Load prices, run the SMA crossover, save the series and return
+    {"stats": ..., "path": ...}. Shared by the CLI and backtest_server's
+    in-process mode.
+    """
+    if fast >= slow:
+        raise ValueError("fast SMA must be < slow SMA")
+
+    df = load_prices(symbol, start, end)
+    df = sma_crossover(df, fast, slow)
+    stats = summarize(df)
+
+    outdir = Path(outdir) if outdir else OUT_DIR
+    os.makedirs(outdir, exist_ok=True)
+    stem = output_stem(symbol, fast, slow)
+    if fmt == "csv":
+        out_path = os.path.join(outdir, f"{stem}.csv")
+        df.to_csv(out_path, index=True)
+    else:
+        out_path = os.path.join(outdir, f"{stem}{STORE_SUFFIX}")
+        write_frame(df, Path(out_path), meta={
+            "symbol": symbol, "start": start, "end": end,
+            "fast": fast, "slow": slow, "stats": stats,
+        })
+    return {"stats": stats, "path": out_path}
+
+def format_report(symbol, start, end, stats, out_path, fmt="npy"):
+    return "\n".join([
+        f"Backtest complete for {symbol} {start}->{end}",
+        f"Total Return: {stats['total_return_pct']}%",
+        f"Sharpe (daily->annualized): {stats['sharpe']}",
+        f"Max Drawdown: {stats['max_drawdown_pct']}%",
+        f"Trades: {stats['trades']}",
+        f"Saved equity/series ({fmt}): {out_path}",
+        # Marker name kept for existing clients; the path may be a .store dir
+        f"CSV_PATH::{out_path}",
+    ])
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--symbol", required=True)
@@ -49,28 +107,18 @@ def main():
     ap.add_argument("--end", required=True)
     ap.add_argument("--fast", type=int, required=True)
     ap.add_argument("--slow", type=int, required=True)
+    ap.add_argument("--format", choices=("npy", "csv"), default="npy",
+                    help="npy: columnar .store dir (default); csv: legacy text file")
     args = ap.parse_args()
+    if not default_store().provider.available():
+        print(YF_MISSING)
+        sys.exit(1)
     if args.fast >= args.slow:
         print("ERROR: fast SMA must be < slow SMA")
         sys.exit(2)
 
-    df = load_prices(args.symbol, args.start, args.end)
-    df = sma_crossover(df, args.fast, args.slow)
-    stats = summarize(df)
-
-    ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    outdir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data", "backtests"))
-    os.makedirs(outdir, exist_ok=True)
-    out_csv = os.path.join(outdir, f"{args.symbol}_SMA{args.fast}-{args.slow}_{ts}.csv")
-    df.to_csv(out_csv, index=True)
-
-    print(f"Backtest complete for {args.symbol} {args.start}->{args.end}")
-    print(f"Total Return: {stats['total_return_pct']}%")
-    print(f"Sharpe (daily->annualized): {stats['sharpe']}")
-    print(f"Max Drawdown: {stats['max_drawdown_pct']}%")
-    print(f"Trades: {stats['trades']}")
-    print(f"Saved equity/series CSV: {out_csv}")
-    print(f"CSV_PATH::{out_csv}")
+    out = run(args.symbol, args.start, args.end, args.fast, args.slow, fmt=args.format)
+    print(format_report(args.symbol, args.start, args.end, out["stats"], out["path"], args.format))
 
 
 if __name__ == "__main__":
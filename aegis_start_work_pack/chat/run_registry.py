@@ -0,0 +1,403 @@
+from __future__ import annotations
+
+import base64
+import json
+import os
+import socket
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# Same status vocabulary as chat/jobs.py
+QUEUED = "QUEUED"
+RUNNING = "RUNNING"
+COMPLETE = "COMPLETE"
+FAILED = "FAILED"
+INTERRUPTED = "INTERRUPTED"   # its process died before the run finished
+
+FINISHED = (COMPLETE, FAILED, INTERRUPTED)
+
+MAX_PAGE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    status      TEXT NOT NULL,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL,
+    request     TEXT,
+    artifact    TEXT,
+    size_bytes  INTEGER,
+    error       TEXT,
+    total       INTEGER NOT NULL DEFAULT 0,
+    done        INTEGER NOT NULL DEFAULT 0,
+    failed      INTEGER NOT NULL DEFAULT 0,
+    owner       TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_created ON runs (created_at DESC, run_id DESC);
+CREATE INDEX IF NOT EXISTS runs_status_created ON runs (status, created_at DESC, run_id DESC);
+
+CREATE TABLE IF NOT EXISTS cells (
+    run_id       TEXT NOT NULL,
+    idx          INTEGER NOT NULL,
+    strategy     TEXT,
+    symbol       TEXT,
+    status       TEXT NOT NULL,
+    started_at   TEXT,
+    finished_at  TEXT,
+    output       TEXT,
+    error        TEXT,
+    PRIMARY KEY (run_id, idx)
+);
+"""
+
+# Columns added after the first release; _migrate() adds them to older files
+_RUN_COLUMNS_V2 = {
+    "total": "INTEGER NOT NULL DEFAULT 0",
+    "done": "INTEGER NOT NULL DEFAULT 0",
+    "failed": "INTEGER NOT NULL DEFAULT 0",
+    "owner": "TEXT",
+}
+
+_COLUMNS = ("run_id", "status", "created_at", "updated_at", "request", "artifact", "size_bytes", "error",
+            "total", "done", "failed", "owner")
+_UPDATABLE = {"status", "artifact", "size_bytes", "error", "request"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def process_owner() -> str:
+    # Stamped on every run this process creates: host:pid
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        # os.kill(pid, 0) would terminate the process on Windows
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid)   # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        try:
+            code = ctypes.c_ulong()
+            return bool(kernel32.GetExitCodeProcess(handle, ctypes.byref(code))) and code.value == 259  # STILL_ACTIVE
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def owner_alive(owner: Optional[str]) -> bool:
+    """
+    Whether the process that created a run may still be working on it.
+    Runs from another host are assumed alive (their pid can't be checked
+    from here); runs from before owners were recorded are not.
+    """
+    if not owner:
+        return False
+    host, _, pid = owner.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        return _pid_alive(int(pid))
+    except ValueError:
+        return False
+
+
+def encode_cursor(created_at: str, run_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{run_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, run_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    except Exception:
+        raise ValueError("invalid cursor")
+    return created_at, run_id
+
+
+class RunRegistry:
+    """
+    Multi-run registry in SQLite (WAL mode), shared by every uvicorn
+    worker that points at the same file and kept across restarts.
+
+    WAL lets readers (GET /runs) proceed while one writer commits;
+    busy_timeout makes concurrent writers from other workers wait instead
+    of failing. Each thread gets its own connection.
+
+    Listing is keyset-paginated on (created_at, run_id), newest first,
+    so every page is an index range scan no matter how many runs exist.
+
+    Every run records the process that owns it (process_owner()). A run
+    left QUEUED/RUNNING by a process that has since died is finalized as
+    INTERRUPTED by interrupt_orphans(), which the server calls at startup.
+    """
+
+    def __init__(self, path: Path, busy_timeout_ms: int = 5000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = int(busy_timeout_ms)
+        self._local = threading.local()
+        self._migrate(self._conn())
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection) -> None:
+        have = {r[1] for r in conn.execute("PRAGMA table_info(runs)")}
+        if have:
+            for col, decl in _RUN_COLUMNS_V2.items():
+                if col not in have:
+                    conn.execute(f"ALTER TABLE runs ADD COLUMN {col} {decl}")
+        conn.executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(str(self.path), timeout=self.busy_timeout_ms / 1000.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        out = dict(row)
+        out["request"] = json.loads(out["request"]) if out.get("request") else None
+        return out
+
+    # ----- writes -----
+
+    def create(self, run_id: str, request: Dict[str, Any], status: str = QUEUED, created_at: Optional[str] = None) -> Dict[str, Any]:
+        now = created_at or _now()
+        owner = process_owner()
+        self._conn().execute(
+            "INSERT INTO runs (run_id, status, created_at, updated_at, request, owner) VALUES (?, ?, ?, ?, ?, ?)",
+            (run_id, status, now, now, json.dumps(request), owner),
+        )
+        return {"run_id": run_id, "status": status, "created_at": now, "updated_at": now,
+                "request": request, "artifact": None, "size_bytes": None, "error": None,
+                "total": 0, "done": 0, "failed": 0, "owner": owner}
+
+    def update(self, run_id: str, **fields: Any) -> None:
+        bad = set(fields) - _UPDATABLE
+        if bad:
+            raise ValueError(f"Cannot update {sorted(bad)}")
+        if "request" in fields:
+            fields["request"] = json.dumps(fields["request"])
+        fields["updated_at"] = _now()
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        self._conn().execute(f"UPDATE runs SET {cols} WHERE run_id = ?", (*fields.values(), run_id))
+
+    # ----- cells -----
+    #
+    # A run fans out into cells (one strategy x symbol each). Cell rows
+    # and the run's done/failed counters are updated in one transaction,
+    # so GET /multi-run/{id} from any worker sees consistent progress.
+
+    def add_cells(self, run_id: str, cells: List[Dict[str, Any]]) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO cells (run_id, idx, strategy, symbol, status) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, i, c.get("strategy"), c.get("symbol"), QUEUED) for i, c in enumerate(cells)],
+            )
+            conn.execute(
+                "UPDATE runs SET total = ?, done = 0, failed = 0, updated_at = ? WHERE run_id = ?",
+                (len(cells), _now(), run_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def start_cell(self, run_id: str, idx: int) -> None:
+        self._conn().execute(
+            "UPDATE cells SET status = ?, started_at = ? WHERE run_id = ? AND idx = ?",
+            (RUNNING, _now(), run_id, idx),
+        )
+
+    def finish_cell(self, run_id: str, idx: int, output: Any = None, error: Optional[str] = None) -> None:
+        now = _now()
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "UPDATE cells SET status = ?, finished_at = ?, output = ?, error = ? WHERE run_id = ? AND idx = ?",
+                (FAILED if error else COMPLETE, now, None if error else json.dumps(output), error, run_id, idx),
+            )
+            conn.execute(
+                "UPDATE runs SET done = done + 1, failed = failed + ?, updated_at = ? WHERE run_id = ?",
+                (1 if error else 0, now, run_id),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def interrupt_orphans(self, run_id: Optional[str] = None,
+                          reason: str = "interrupted: server stopped before the run finished") -> List[str]:
+        """
+        Mark QUEUED/RUNNING runs whose owner process is gone (all of them,
+        or just run_id) INTERRUPTED, and their unfinished cells FAILED with
+        `reason`, counting them in done/failed so the run's progress adds
+        up. Returns the run_ids changed.
+        """
+        sql = "SELECT run_id, owner FROM runs WHERE status IN (?, ?)"
+        args: List[Any] = [QUEUED, RUNNING]
+        if run_id is not None:
+            sql += " AND run_id = ?"
+            args.append(run_id)
+        orphans = [r["run_id"] for r in self._conn().execute(sql, args) if not owner_alive(r["owner"])]
+
+        now = _now()
+        conn = self._conn()
+        for rid in orphans:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                n = conn.execute(
+                    "UPDATE cells SET status = ?, finished_at = ?, error = ?"
+                    " WHERE run_id = ? AND finished_at IS NULL",
+                    (FAILED, now, reason, rid),
+                ).rowcount
+                conn.execute(
+                    "UPDATE runs SET status = ?, error = ?, done = done + ?, failed = failed + ?, updated_at = ?"
+                    " WHERE run_id = ? AND status IN (?, ?)",
+                    (INTERRUPTED, reason, n, n, now, rid, QUEUED, RUNNING),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return orphans
+
+    def cells(self, run_id: str) -> List[Dict[str, Any]]:
+        rows = self._conn().execute("SELECT * FROM cells WHERE run_id = ? ORDER BY idx", (run_id,)).fetchall()
+        return self._cells(rows)
+
+    def finished_cells(self, run_id: str, since: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Finished cells in completion order, optionally only those that
+        finished at or after `since` (a finished_at value), so a tailer can
+        poll for what's new without re-reading the whole run.
+        """
+        sql = "SELECT * FROM cells WHERE run_id = ? AND finished_at IS NOT NULL"
+        args: List[Any] = [run_id]
+        if since:
+            sql += " AND finished_at >= ?"
+            args.append(since)
+        rows = self._conn().execute(sql + " ORDER BY finished_at, idx", args).fetchall()
+        return self._cells(rows)
+
+    @staticmethod
+    def _cells(rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+        out = []
+        for r in rows:
+            d = dict(r)
+            del d["run_id"]
+            d["output"] = json.loads(d["output"]) if d["output"] else None
+            out.append(d)
+        return out
+
+    # ----- reads -----
+
+    def get(self, run_id: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return self._row(row)
+
+    def list(
+        self,
+        limit: int = 50,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        include_request: bool = False,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        One page of runs, newest first: (items, next_cursor). Pass
+        next_cursor back to get the following page; None means done.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE))
+        cols = ", ".join(c for c in _COLUMNS if include_request or c != "request")
+        where, args = [], []
+        if status:
+            where.append("status = ?")
+            args.append(status)
+        if cursor:
+            c_at, c_id = decode_cursor(cursor)
+            where.append("(created_at, run_id) < (?, ?)")
+            args.extend([c_at, c_id])
+        sql = f"SELECT {cols} FROM runs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY created_at DESC, run_id DESC LIMIT ?"
+        rows = self._conn().execute(sql, (*args, limit + 1)).fetchall()
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        items = [self._row(r) if include_request else dict(r) for r in rows]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["run_id"]) if more and rows else None
+        return items, next_cursor
+
+    def count(self, status: Optional[str] = None) -> int:
+        if status:
+            return self._conn().execute("SELECT COUNT(*) FROM runs WHERE status = ?", (status,)).fetchone()[0]
+        return self._conn().execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._conn().execute("SELECT status, COUNT(*) FROM runs GROUP BY status").fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    # ----- migration -----
+
+    def import_artifacts(self, runs_dir: Path) -> int:
+        """
+        Register run artifacts (<run_id>.json) written before the registry
+        existed. Already known run_ids are skipped; returns rows added.
+        """
+        runs_dir = Path(runs_dir)
+        if not runs_dir.exists():
+            return 0
+        known = {r[0] for r in self._conn().execute("SELECT run_id FROM runs")}
+        rows = []
+        for p in runs_dir.glob("*.json"):
+            if p.stem in known:
+                continue
+            st = p.stat()
+            ts = datetime.fromtimestamp(st.st_mtime, tz=timezone.utc).isoformat()
+            try:
+                payload = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                payload = {}
+            if not isinstance(payload, dict):
+                payload = {}
+            rows.append((
+                p.stem, payload.get("status", COMPLETE), ts, ts,
+                json.dumps(payload.get("request")) if payload.get("request") is not None else None,
+                str(p), st.st_size,
+            ))
+        if rows:
+            conn = self._conn()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR IGNORE INTO runs (run_id, status, created_at, updated_at, request, artifact, size_bytes)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            conn.execute("COMMIT")
+        return len(rows)
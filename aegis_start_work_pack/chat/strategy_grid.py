@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Callable, Dict, Any, List, Optional
 
 # NEW: make sure Python can see the project root (where strategies/ lives)
 import sys
@@ -11,6 +11,9 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from strategies.strategy_engine import run_strategy_on_csv, StrategyResult
+from strategies.strategy_engine import INDEX_JSONL
+from strategies.parallel_grid import run_sma_cross_grid_parallel
+from strategies.result_index import ResultIndex
 
 
 # --- Paths --------------------------------------------------------------
@@ -28,12 +31,44 @@ DEMO_CSV = DATA_DIR / "SPY_SMA50-200_20251119-161716.csv"
 # --- Grid runner --------------------------------------------------------
 
 
-def run_grid(csv_path: Path, strat_name: str, grid: Dict[str, List[int]]) -> None:
+def run_grid(
+    csv_path: Path,
+    strat_name: str,
+    grid: Dict[str, List[int]],
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    progress: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+) -> None:
+    # progress(row, done, total) fires after every combo (see
+    # run_sma_cross_grid_parallel)
     if not csv_path.exists():
         raise FileNotFoundError(f"CSV not found: {csv_path}")
 
     print(f"CSV exists: {csv_path}")
+
+    # sma_cross grids can fan out over a process pool (same output files) and
+    # skip combos already in the result index
+    if workers is not None and strat_name == "sma_cross":
+        rows = run_sma_cross_grid_parallel(
+            csv_path,
+            grid["fast"],
+            grid["slow"],
+            out_dir=MULTI_DIR,
+            summary_path=MULTI_DIR / "sma_cross_summary.json",
+            workers=workers,
+            chunk_size=chunk_size,
+            per_run="row",
+            score="positive",
+            skip_invalid=False,
+            index=ResultIndex(INDEX_JSONL),
+            progress=progress,
+            log=print,
+        )
+        print(f"\n✓ {len(rows)} runs on {workers} workers, summary saved → {MULTI_DIR / 'sma_cross_summary.json'}")
+        return
+
     rows: List[Dict[str, Any]] = []
+    total = len(grid["fast"]) * len(grid["slow"])
 
     for fast in grid["fast"]:
         for slow in grid["slow"]:
@@ -65,6 +100,8 @@ def run_grid(csv_path: Path, strat_name: str, grid: Dict[str, List[int]]) -> Non
             out_path = MULTI_DIR / f"sma_cross_fast{fast}_slow{slow}.json"
             out_path.write_text(json.dumps(row, indent=2))
             print(f"  Saved: {out_path}")
+            if progress is not None:
+                progress(row, len(rows), total)
 
     # Save summary JSON that grid_inspector.py reads
     summary_payload = {"rows": rows}
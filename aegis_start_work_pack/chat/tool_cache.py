@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+
+def canonical_args(args: Dict[str, Any]) -> str:
+    # Sorted keys and no whitespace, so equal args hash equally
+    return json.dumps(args, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def cache_key(tool: str, args: Dict[str, Any]) -> str:
+    return hashlib.sha256(f"{tool}\n{canonical_args(args)}".encode("utf-8")).hexdigest()
+
+
+class ToolResultCache:
+    """
+    Content-addressed cache of tool results, keyed by sha256(tool, args).
+
+    - Memory tier: LRU of up to max_entries results.
+    - Disk tier: one JSON file per key under disk_dir (optional), so
+      results survive restarts; hits are promoted back into memory.
+    - Entries expire ttl seconds after they were computed.
+    - Concurrent calls for the same key share one in-flight computation
+      (single-flight); failures are never cached.
+    - A `valid` check runs on every hit; entries it rejects (a result
+      whose artifact has been deleted) are dropped and recomputed.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_entries: int = 256,
+        disk_dir: Optional[Path] = None,
+        max_disk_entries: int = 2048,
+    ):
+        self.ttl = float(ttl)
+        self.max_entries = max(1, int(max_entries))
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.max_disk_entries = max(1, int(max_disk_entries))
+        self._mem: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()  # key -> (expires_at, value)
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self._disk_writes = 0
+        self.counters = {
+            "hits_memory": 0,
+            "hits_disk": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expired": 0,
+            "stale": 0,
+            "errors": 0,
+        }
+
+    # ----- tiers -----
+
+    def _mem_get(self, key: str) -> Tuple[bool, Any]:
+        item = self._mem.get(key)
+        if item is None:
+            return False, None
+        expires_at, value = item
+        if expires_at <= time.time():
+            del self._mem[key]
+            self.counters["expired"] += 1
+            return False, None
+        self._mem.move_to_end(key)
+        return True, value
+
+    def _mem_put(self, key: str, expires_at: float, value: Any) -> None:
+        self._mem[key] = (expires_at, value)
+        self._mem.move_to_end(key)
+        while len(self._mem) > self.max_entries:
+            self._mem.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key: str) -> Tuple[bool, float, Any]:
+        path = self._disk_path(key)
+        try:
+            rec = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return False, 0.0, None
+        if rec.get("expires_at", 0) <= time.time():
+            path.unlink(missing_ok=True)
+            self.counters["expired"] += 1
+            return False, 0.0, None
+        return True, rec["expires_at"], rec["value"]
+
+    def _disk_put(self, key: str, tool: str, args: Dict[str, Any], expires_at: float, value: Any) -> None:
+        self.disk_dir.mkdir(parents=True, exist_ok=True)
+        path = self._disk_path(key)
+        tmp = path.with_name(f".{key}.{uuid.uuid4().hex[:8]}.tmp")
+        rec = {"tool": tool, "args": args, "created_at": time.time(), "expires_at": expires_at, "value": value}
+        tmp.write_text(json.dumps(rec), encoding="utf-8")
+        os.replace(tmp, path)
+
+        self._disk_writes += 1
+        if self._disk_writes % 64 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        # Drop expired files, then the oldest beyond max_disk_entries
+        now = time.time()
+        files = []
+        for p in self.disk_dir.glob("*.json"):
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if st.st_mtime + self.ttl <= now:
+                p.unlink(missing_ok=True)
+            else:
+                files.append((st.st_mtime, p))
+        files.sort()
+        for _, p in files[: max(0, len(files) - self.max_disk_entries)]:
+            p.unlink(missing_ok=True)
+
+    # ----- public -----
+
+    def _drop(self, key: str) -> None:
+        self._mem.pop(key, None)
+        if self.disk_dir is not None:
+            self._disk_path(key).unlink(missing_ok=True)
+        self.counters["stale"] += 1
+
+    async def lookup(
+        self,
+        tool: str,
+        args: Dict[str, Any],
+        valid: Callable[[Any], bool] = lambda value: True,
+    ) -> Tuple[bool, Any]:
+        """
+        (True, value) when a live result is cached, without computing one.
+        Entries `valid` rejects (e.g. their artifact is gone) are dropped.
+        """
+        key = cache_key(tool, args)
+        hit, value = self._mem_get(key)
+        if hit:
+            if valid(value):
+                self.counters["hits_memory"] += 1
+                return True, value
+            self._drop(key)
+            return False, None
+        if self.disk_dir is None:
+            return False, None
+        hit, expires_at, value = await asyncio.to_thread(self._disk_get, key)
+        if hit:
+            if valid(value):
+                self.counters["hits_disk"] += 1
+                self._mem_put(key, expires_at, value)
+                return True, value
+            await asyncio.to_thread(self._drop, key)
+        return False, None
+
+    async def _fill(self, key: str, tool: str, args: Dict[str, Any], compute: Callable[[], Awaitable[Any]],
+                    cacheable: Callable[[Any], bool], valid: Callable[[Any], bool]) -> Any:
+        hit, value = await self.lookup(tool, args, valid)
+        if hit:
+            return value
+
+        self.counters["misses"] += 1
+        try:
+            value = await compute()
+        except Exception:
+            self.counters["errors"] += 1
+            raise
+        if cacheable(value):
+            expires_at = time.time() + self.ttl
+            self._mem_put(key, expires_at, value)
+            if self.disk_dir is not None:
+                await asyncio.to_thread(self._disk_put, key, tool, args, expires_at, value)
+        return value
+
+    def _settled(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # mark retrieved when every caller had gone
+
+    async def get_or_compute(
+        self,
+        tool: str,
+        args: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        cacheable: Callable[[Any], bool] = lambda value: True,
+        valid: Callable[[Any], bool] = lambda value: True,
+    ) -> Any:
+        key = cache_key(tool, args)
+
+        hit, value = self._mem_get(key)
+        if hit and valid(value):
+            self.counters["hits_memory"] += 1
+            return value
+
+        # The computation runs as its own task and every caller awaits it
+        # through a shield, so a caller that is cancelled (client gone)
+        # doesn't cancel it for the others, and its result still lands
+        # in the cache.
+        pending = self._inflight.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(self._fill(key, tool, args, compute, cacheable, valid))
+            self._inflight[key] = pending
+            pending.add_done_callback(lambda t: self._settled(key, t))
+        else:
+            self.counters["coalesced"] += 1
+        return await asyncio.shield(pending)
+
+    def clear(self) -> None:
+        self._mem.clear()
+        if self.disk_dir is not None and self.disk_dir.exists():
+            for p in self.disk_dir.glob("*.json"):
+                p.unlink(missing_ok=True)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.counters["hits_memory"] + self.counters["hits_disk"] + self.counters["misses"]
+        hits = self.counters["hits_memory"] + self.counters["hits_disk"]
+        return {
+            "entries": len(self._mem),
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl,
+            "disk_dir": str(self.disk_dir) if self.disk_dir else None,
+            "in_flight": len(self._inflight),
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+            **self.counters,
+        }
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def sse(event: str, data: Any, id: Optional[Any] = None) -> str:
+    """
+    One server-sent event frame with a JSON payload. With an id, the
+    browser sends it back as Last-Event-ID when it reconnects.
+    """
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class ToolCallDetector:
+    """
+    Incremental detector for a tool-call JSON object in streamed model
+    output.
+
+    feed() takes each token as it arrives and returns (text, call):
+    text is whatever can be shown to the user straight away; call is the
+    parsed {"tool": ..., "args": ...} dict once a top-level JSON object
+    with a "tool" key closes. Text inside a candidate object is held back
+    until the object closes, then either becomes the call or is released
+    as ordinary text (e.g. JSON the model was merely quoting).
+    """
+
+    def __init__(self) -> None:
+        self._held: List[str] = []   # chars of the candidate object
+        self._depth = 0
+        self._in_str = False
+        self._escape = False
+        self.call: Optional[Dict[str, Any]] = None
+
+    def feed(self, token: str) -> Tuple[str, Optional[Dict[str, Any]]]:
+        if self.call is not None:
+            return "", None
+
+        out: List[str] = []
+        for ch in token:
+            if self._depth == 0:
+                if ch == "{":
+                    self._depth = 1
+                    self._held = [ch]
+                else:
+                    out.append(ch)
+                continue
+
+            self._held.append(ch)
+            if self._in_str:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_str = False
+            elif ch == '"':
+                self._in_str = True
+            elif ch == "{":
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    text = "".join(self._held)
+                    self._held = []
+                    obj = self._parse(text)
+                    if obj is not None:
+                        self.call = obj
+                        return "".join(out), obj
+                    out.append(text)
+        return "".join(out), None
+
+    @staticmethod
+    def _parse(text: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(text)
+        except ValueError:
+            return None
+        return obj if isinstance(obj, dict) and "tool" in obj else None
+
+    def flush(self) -> str:
+        """
+        Release anything still held (an object that never closed).
+        """
+        text = "".join(self._held)
+        self._held = []
+        self._depth = 0
+        self._in_str = self._escape = False
+        return text
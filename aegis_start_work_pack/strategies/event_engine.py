@@ -0,0 +1,343 @@
+from __future__ import annotations
+
+import abc
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+# make sure Python can see the project root (where strategies/ lives)
+ROOT = Path(__file__).resolve().parents[1]   # ...\aegis_start_work_pack
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+# Annualisation per bar size (US equities: 252 sessions x 390 minutes)
+BARS_PER_YEAR = {
+    "1m": 252 * 390,
+    "5m": 252 * 78,
+    "15m": 252 * 26,
+    "1h": 252 * 7,
+    "1d": 252,
+}
+
+
+# --- Incremental indicators -----------------------------------------
+#
+# Each indicator tracks `width` independent series (one per symbol) and
+# takes one new row per update(). State lives in fixed-size ring buffers
+# allocated up front, so an update costs the same on bar 10 as on bar
+# 10 million and never touches history. Running sums are rebuilt from
+# the buffer each time it wraps, which keeps float drift bounded at an
+# amortised O(1) cost.
+
+class RollingMean:
+    def __init__(self, window: int, width: int = 1):
+        if window < 1:
+            raise ValueError(f"window must be >= 1, got {window}")
+        self.window = int(window)
+        self.buf = np.zeros((self.window, width))
+        self.total = np.zeros(width)
+        self.pos = 0
+        self.count = 0
+        self.value = np.full(width, np.nan)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.window
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        slot = self.buf[self.pos]
+        self.total += x
+        self.total -= slot
+        slot[:] = x
+        self.pos += 1
+        if self.pos == self.window:
+            self.pos = 0
+            self.total = self.buf.sum(axis=0)
+        if self.count < self.window:
+            self.count += 1
+            if self.count < self.window:
+                return self.value
+        np.divide(self.total, self.window, out=self.value)
+        return self.value
+
+
+class RollingStd:
+    """
+    Sample std (ddof=1) over the last `window` values, from running
+    sums of x and x^2 kept next to the ring buffer.
+    """
+
+    def __init__(self, window: int, width: int = 1):
+        if window < 2:
+            raise ValueError(f"window must be >= 2, got {window}")
+        self.window = int(window)
+        self.buf = np.zeros((self.window, width))
+        self.s1 = np.zeros(width)
+        self.s2 = np.zeros(width)
+        self.pos = 0
+        self.count = 0
+        self.value = np.full(width, np.nan)
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.window
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        old = self.buf[self.pos]
+        self.s1 += x - old
+        self.s2 += x * x - old * old
+        old[:] = x
+        self.pos += 1
+        if self.pos == self.window:
+            self.pos = 0
+            self.s1 = self.buf.sum(axis=0)
+            self.s2 = (self.buf * self.buf).sum(axis=0)
+        if self.count < self.window:
+            self.count += 1
+            if self.count < self.window:
+                return self.value
+        var = (self.s2 - self.s1 * self.s1 / self.window) / (self.window - 1)
+        np.sqrt(np.maximum(var, 0.0), out=self.value)
+        return self.value
+
+
+class EMA:
+    """
+    alpha = 2 / (span + 1), seeded with the first value
+    (pandas ewm(span, adjust=False)).
+    """
+
+    def __init__(self, span: int, width: int = 1):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = np.full(width, np.nan)
+        self.count = 0
+
+    @property
+    def ready(self) -> bool:
+        return self.count > 0
+
+    def update(self, x: np.ndarray) -> np.ndarray:
+        if self.count == 0:
+            self.value[:] = x
+        else:
+            self.value += self.alpha * (x - self.value)
+        self.count += 1
+        return self.value
+
+
+# --- Strategies -----------------------------------------------------
+
+class EventStrategy(abc.ABC):
+    """
+    Bar-by-bar strategy: on_bar() gets the latest price of every symbol
+    and returns the target weight per symbol (fraction of equity,
+    negative = short). Keep all state incremental; on_bar must not look
+    at history.
+    """
+
+    def __init__(self, width: int = 1):
+        self.width = width
+
+    @abc.abstractmethod
+    def on_bar(self, prices: np.ndarray) -> np.ndarray:
+        """Target weights (length width) after the bar at `prices`."""
+
+
+class SmaCrossEvent(EventStrategy):
+    """
+    sma_cross_strategy's rule, incrementally: +1 / -1 / 0 on fast vs slow
+    SMA, flat until the slow SMA is full, split equally across symbols.
+    """
+
+    def __init__(self, fast: int = 10, slow: int = 200, width: int = 1):
+        if fast >= slow:
+            raise ValueError("fast SMA must be < slow SMA")
+        super().__init__(width)
+        self.fast = RollingMean(fast, width)
+        self.slow = RollingMean(slow, width)
+        self.target = np.zeros(width)
+
+    def on_bar(self, prices: np.ndarray) -> np.ndarray:
+        f = self.fast.update(prices)
+        s = self.slow.update(prices)
+        if self.slow.count >= self.slow.window:
+            np.sign(np.subtract(f, s, out=self.target), out=self.target)
+            if self.width > 1:
+                self.target /= self.width
+        return self.target
+
+
+# --- Engine ---------------------------------------------------------
+
+class EventEngine:
+    """
+    Feeds bars to an EventStrategy and keeps the book in preallocated
+    numpy state: state[0] is cash, state[1:] the position (shares) per
+    symbol. Equity is recorded into a buffer that grows by doubling, so
+    the same engine can run a historical series (run) or take live bars
+    one at a time (on_bar).
+
+    A weight decided on bar t's close is traded at that close, so it
+    earns bar t+1's return: the same one-bar lag as sma_cross_strategy.
+    Trades pay fee_bps on notional; with fee_bps=0 the equity curve
+    matches sma_cross_strategy exactly.
+    """
+
+    def __init__(self, strategy: EventStrategy, capital: float = 1.0, fee_bps: float = 0.0, capacity: int = 4096):
+        self.strategy = strategy
+        self.width = strategy.width
+        self.fee_rate = fee_bps / 1e4
+        self.state = np.zeros(1 + self.width)
+        self.state[0] = capital
+        self.positions = self.state[1:]
+        self.last_px = np.full(self.width, np.nan)
+        self._equity = np.empty(max(1, capacity))
+        self._last_target = np.zeros(self.width)
+        self.bars = 0
+        self.trades = 0   # target changes, per symbol
+        self.costs = 0.0
+
+    @property
+    def cash(self) -> float:
+        return float(self.state[0])
+
+    @property
+    def equity_curve(self) -> np.ndarray:
+        return self._equity[: self.bars]
+
+    def on_bar(self, prices) -> float:
+        """
+        Process one bar (one price per symbol) and return equity after it.
+        """
+        px = np.asarray(prices, dtype=np.float64).reshape(self.width)
+        if np.isnan(px).any():
+            # Missing print: carry the last price forward
+            px = np.where(np.isnan(px), self.last_px, px)
+        self.last_px = px
+        if self.bars == len(self._equity):
+            self._equity = np.concatenate([self._equity, np.empty(len(self._equity))])
+        return self._step(px)
+
+    def _step(self, px: np.ndarray) -> float:
+        positions = self.positions
+        equity = self.state[0] + float(positions @ px)
+        target = self.strategy.on_bar(px)
+
+        if target.any() or positions.any():
+            # Rebalance to the target exposure (a constant short needs
+            # this every bar; long-and-holding is a no-op trade)
+            want = target * (equity / px)
+            delta = want - positions
+            notional = float(np.abs(delta) @ px)
+            if notional:
+                cost = notional * self.fee_rate
+                self.state[0] -= float(delta @ px) + cost
+                positions[:] = want
+                self.costs += cost
+                equity -= cost
+        if not np.array_equal(target, self._last_target):
+            self.trades += int((target != self._last_target).sum())
+            self._last_target[:] = target
+
+        self._equity[self.bars] = equity
+        self.bars += 1
+        return equity
+
+    def run(self, prices) -> np.ndarray:
+        """
+        Feed a (bars x symbols) array, or a 1-D array for one symbol.
+        """
+        x = np.asarray(prices, dtype=np.float64).reshape(-1, self.width)
+        if np.isnan(x).any():
+            x = pd.DataFrame(x).ffill().to_numpy()
+            x = np.where(np.isnan(x), self.last_px, x)
+        need = self.bars + len(x)
+        if need > len(self._equity):
+            self._equity = np.concatenate([self._equity, np.empty(need - len(self._equity))])
+        for row in x:
+            self._step(row)
+        if len(x):
+            self.last_px = x[-1].copy()
+        return self.equity_curve
+
+
+# --- STRATEGIES entry point -----------------------------------------
+
+def sma_cross_event(df: pd.DataFrame, params: Dict[str, Any]):
+    """
+    StrategyResult for sma_cross on the event engine; registered in
+    strategy_engine.STRATEGIES as "sma_cross_event".
+
+    Extra params: fee_bps (default 0), interval (bar size, for
+    annualisation; default "1d").
+    """
+    from strategies.strategy_engine import StrategyResult  # strategy_engine registers us
+
+    fast = int(params.get("fast", 10))
+    slow = int(params.get("slow", 200))
+    fee_bps = float(params.get("fee_bps", 0.0))
+    interval = str(params.get("interval", "1d"))
+    bars_per_year = BARS_PER_YEAR.get(interval, 252)
+
+    prices = df["price"]
+    if not pd.api.types.is_float_dtype(prices):
+        prices = pd.to_numeric(prices, errors="coerce")
+    prices = prices.dropna().astype(float).to_numpy()
+
+    engine = EventEngine(SmaCrossEvent(fast, slow), capital=1.0, fee_bps=fee_bps, capacity=len(prices))
+    equity = engine.run(prices)
+
+    strat_ret = np.zeros(len(equity))
+    if len(equity) > 1:
+        strat_ret[1:] = equity[1:] / equity[:-1] - 1.0
+    total_return = float(equity[-1] - 1.0) if len(equity) else 0.0
+    vol = float(strat_ret.std(ddof=1) * bars_per_year ** 0.5) if len(strat_ret) > 1 else 0.0
+    sharpe = (strat_ret.mean() * bars_per_year) / vol if vol > 0 else 0.0
+
+    return StrategyResult(
+        name="sma_cross_event",
+        params={"fast": fast, "slow": slow, "fee_bps": fee_bps, "interval": interval},
+        equity_curve=list(equity),
+        trades=[],
+        metrics={
+            "total_return": total_return,
+            "vol_annual": vol,
+            "sharpe": float(sharpe),
+            "fast": fast,
+            "slow": slow,
+            "bars": int(engine.bars),
+            "trades": int(engine.trades),
+            "costs": float(engine.costs),
+        },
+    )
+
+
+def main():
+    from strategies.market_data import default_store
+
+    ap = argparse.ArgumentParser(description="Bar-by-bar SMA crossover on intraday bars.")
+    ap.add_argument("--symbol", default="SPY")
+    ap.add_argument("--start", required=True)
+    ap.add_argument("--end", required=True)
+    ap.add_argument("--interval", default="1m")
+    ap.add_argument("--fast", type=int, default=20)
+    ap.add_argument("--slow", type=int, default=390)
+    ap.add_argument("--fee-bps", type=float, default=0.0)
+    args = ap.parse_args()
+
+    bars = default_store().get(args.symbol, args.start, args.end, args.interval)
+    if bars.empty:
+        raise SystemExit(f"No {args.interval} bars for {args.symbol} in {args.start}..{args.end}")
+    df = pd.DataFrame({"price": bars["close"]})
+    res = sma_cross_event(df, {"fast": args.fast, "slow": args.slow, "fee_bps": args.fee_bps, "interval": args.interval})
+    print(json.dumps(res.metrics, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,16 @@
 from __future__ import annotations
 
+import argparse
+import csv
 import json
 import math
 import os
 import re
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Dict, List
+
+import numpy as np
 
 
 # ---------- Paths / config ----------
@@ -20,6 +24,9 @@ MULTI_DIR = ROOT / "data" / "backtests" / "multi"
 # Output ranked CSV
 RANKED_CSV = MULTI_DIR / "sma_cross_ranked.csv"
 
+# Consolidated metrics table written by the grid runners (result_index.py)
+INDEX_JSONL = MULTI_DIR / "sma_cross_index.jsonl"
+
 
 @dataclass
 class RunRow:
@@ -133,54 +140,178 @@ def load_run(file_path: Path) -> RunRow | None:
     )
 
 
-def main() -> None:
-    print(f"AEGIS_HOME    : {ROOT}")
-    print(f"MULTI_DIR     : {MULTI_DIR}")
+# ---------- Consolidated metrics table ----------
+
+COLUMNS = ("fast", "slow", "total_return", "vol_annual", "sharpe", "score")
+
+Table = Dict[str, np.ndarray]
+
+
+def _table(fast, slow, total_return, vol_annual, sharpe) -> Table:
+    t = {
+        "fast": np.asarray(fast, dtype=np.int64),
+        "slow": np.asarray(slow, dtype=np.int64),
+        "total_return": np.asarray(total_return, dtype=np.float64),
+        "vol_annual": np.asarray(vol_annual, dtype=np.float64),
+        "sharpe": np.asarray(sharpe, dtype=np.float64),
+    }
+    # Composite score: Sharpe * |total_return|
+    t["score"] = t["sharpe"] * np.abs(t["total_return"])
+    return t
+
+
+def load_index_table(path: Path, data: str | None = None) -> Table | None:
+    """
+    Read the sma_cross_index.jsonl written by the grid runners into
+    column arrays. Only metrics are stored there, so no equity curves are
+    ever loaded.
+
+    The index can hold runs against several input files; by default the
+    data fingerprint of the most recently written record is used, or the
+    one starting with ``data``.
+    """
+    if not path.exists():
+        return None
+
+    latest: Dict[str, Dict[tuple, dict]] = {}
+    last_data = None
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+                if rec.get("strategy") != "sma_cross":
+                    continue
+                key = (int(rec["params"]["fast"]), int(rec["params"]["slow"]))
+                latest.setdefault(rec["data"], {})[key] = rec["metrics"]
+                last_data = rec["data"]
+            except (ValueError, KeyError, TypeError):
+                continue  # torn / foreign line
+
+    if data is not None:
+        matches = [d for d in latest if d.startswith(data)]
+        if len(matches) != 1:
+            print(f"[!] --data {data!r} matches {len(matches)} inputs in the index.")
+            return None
+        last_data = matches[0]
+    if last_data is None:
+        return None
+    if len(latest) > 1:
+        print(f"Index holds {len(latest)} inputs; showing data={last_data[:12]}")
+
+    runs = latest[last_data]
+    keys = list(runs)
+    return _table(
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+        [runs[k].get("total_return", 0.0) for k in keys],
+        [runs[k].get("vol_annual", 0.0) for k in keys],
+        [runs[k].get("sharpe", 0.0) for k in keys],
+    )
 
-    if not MULTI_DIR.exists():
-        print("[!] MULTI_DIR does not exist. Nothing to inspect.")
-        return
 
-    json_files = sorted(MULTI_DIR.glob("sma_cross_fast*_slow*.json"))
+def load_legacy_table(multi_dir: Path) -> Table | None:
+    """
+    Fallback: one JSON file per run (sma_cross_fast*_slow*.json).
+    """
+    json_files = sorted(multi_dir.glob("sma_cross_fast*_slow*.json"))
     if not json_files:
         print("[!] No sma_cross_fast*_slow*.json files found in MULTI_DIR.")
-        return
+        return None
 
     print(f"Found {len(json_files)} run files. Loading metrics...\n")
 
-    rows: List[RunRow] = []
-    for fp in json_files:
-        row = load_run(fp)
-        if row is not None:
-            rows.append(row)
-
+    rows = [r for r in (load_run(fp) for fp in json_files) if r is not None]
     if not rows:
+        return None
+    return _table(
+        [r.fast for r in rows],
+        [r.slow for r in rows],
+        [r.total_return for r in rows],
+        [r.vol_annual for r in rows],
+        [r.sharpe for r in rows],
+    )
+
+
+def rank(
+    table: Table,
+    top_k: int | None = None,
+    min_sharpe: float | None = None,
+    min_return: float | None = None,
+    max_vol: float | None = None,
+) -> np.ndarray:
+    """
+    Row indices passing the metric thresholds, best score first.
+
+    With top_k, only the k best are selected (argpartition) before sorting,
+    so ranking 10k+ runs for a top-10 view doesn't sort the whole grid.
+    """
+    mask = np.isfinite(table["score"])
+    if min_sharpe is not None:
+        mask &= table["sharpe"] >= min_sharpe
+    if min_return is not None:
+        mask &= table["total_return"] >= min_return
+    if max_vol is not None:
+        mask &= table["vol_annual"] <= max_vol
+
+    idx = np.flatnonzero(mask)
+    neg = -table["score"][idx]
+    if top_k is not None and top_k < len(idx):
+        part = np.argpartition(neg, top_k)[:top_k]
+        idx, neg = idx[part], neg[part]
+    return idx[np.argsort(neg, kind="stable")]
+
+
+def main(argv: List[str] | None = None) -> None:
+    ap = argparse.ArgumentParser(description="Rank SMA crossover grid runs")
+    ap.add_argument("--top", type=int, default=10, help="rows to print")
+    ap.add_argument("--min-sharpe", type=float, default=None)
+    ap.add_argument("--min-return", type=float, default=None)
+    ap.add_argument("--max-vol", type=float, default=None)
+    ap.add_argument("--data", default=None, help="input fingerprint prefix (index only)")
+    ap.add_argument("--legacy", action="store_true", help="read per-run JSON files, ignore the index")
+    args = ap.parse_args(argv)
+
+    print(f"AEGIS_HOME    : {ROOT}")
+    print(f"MULTI_DIR     : {MULTI_DIR}")
+
+    if not MULTI_DIR.exists():
+        print("[!] MULTI_DIR does not exist. Nothing to inspect.")
+        return
+
+    table = None
+    if not args.legacy:
+        table = load_index_table(INDEX_JSONL, data=args.data)
+        if table is not None:
+            print(f"Loaded {len(table['fast'])} runs from {INDEX_JSONL.name}\n")
+    if table is None:
+        table = load_legacy_table(MULTI_DIR)
+
+    if table is None or not len(table["fast"]):
         print("[!] No valid runs loaded (all skipped).")
         return
 
-    # Sort best → worst by score
-    rows.sort(key=lambda r: r.score, reverse=True)
+    filters = dict(min_sharpe=args.min_sharpe, min_return=args.min_return, max_vol=args.max_vol)
 
-    # Print top handful
+    # Print top handful (best → worst by score)
+    top = rank(table, top_k=args.top, **filters)
     print("=== Top SMA crossover parameter sets ===\n")
     print("fast  slow  total_return  vol_annual  sharpe  score")
-    for r in rows[:10]:
+    for i in top:
         print(
-            f"{r.fast:4d}  {r.slow:4d}  "
-            f"{r.total_return:11.4f}  {r.vol_annual:10.4f}  "
-            f"{r.sharpe:6.3f}  {r.score:6.3f}"
+            f"{table['fast'][i]:4d}  {table['slow'][i]:4d}  "
+            f"{table['total_return'][i]:11.4f}  {table['vol_annual'][i]:10.4f}  "
+            f"{table['sharpe'][i]:6.3f}  {table['score'][i]:6.3f}"
         )
 
-    # Write full ranked grid to CSV
-    import csv
-
+    # Write full ranked (filtered) grid to CSV
+    order = rank(table, **filters)
     with RANKED_CSV.open("w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["fast", "slow", "total_return", "vol_annual", "sharpe", "score"])
-        for r in rows:
-            writer.writerow(r.to_list())
+        writer.writerow(list(COLUMNS))
+        for i in order:
+            writer.writerow([table[c][i].item() for c in COLUMNS])
 
-    print(f"\n[+] Full grid exported to {RANKED_CSV}")
+    print(f"\n[+] Full grid exported to {RANKED_CSV} ({len(order)} rows)")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,361 @@
+from __future__ import annotations
+
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from strategies.price_store import STORE_SUFFIX, is_store, read_frame, read_manifest, write_frame
+
+try:
+    import yfinance as yf
+except ImportError:
+    yf = None
+
+
+ROOT = Path(__file__).resolve().parents[1]
+MARKET_DIR = ROOT / "data" / "market"
+
+# Normalised bar columns; providers return whichever of these they have
+BAR_COLUMNS = ["open", "high", "low", "close", "adj_close", "volume"]
+
+Range = Tuple[pd.Timestamp, pd.Timestamp]  # [start, end)
+
+
+# --- Providers ------------------------------------------------------
+#
+# Shared with src/data_pipeline/ingest.py, which bulk-loads the whole
+# universe through fetch_many(); keep one copy of the provider code here.
+
+DEFAULT_BATCH_SIZE = 20
+
+
+def normalize_bars(df: Optional[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Provider output -> DatetimeIndex (tz-naive, sorted, unique) named
+    "date" with lower-case BAR_COLUMNS as float64. Flattens yfinance's
+    (field, ticker) columns.
+    """
+    if df is None or df.empty:
+        return pd.DataFrame(columns=BAR_COLUMNS, index=pd.DatetimeIndex([], name="date"), dtype="float64")
+
+    df = df.copy()
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    df.columns = [str(c).strip().lower().replace(" ", "_") for c in df.columns]
+    df = df[[c for c in BAR_COLUMNS if c in df.columns]]
+
+    idx = pd.to_datetime(df.index)
+    if idx.tz is not None:
+        idx = idx.tz_convert(None)
+    df.index = idx.rename("date")
+    df = df.apply(pd.to_numeric, errors="coerce").astype("float64")
+    df = df[~df.index.duplicated(keep="last")].sort_index()
+    return df
+
+
+class MarketDataProvider:
+    """
+    Source of OHLCV bars. fetch() returns bars in [start, end) for one
+    symbol; an empty frame means the provider has nothing for that range.
+    fetch_many() returns {symbol: bars}, symbols with nothing may be
+    missing; the default fetches one symbol at a time and providers with
+    a bulk API override it (batch_size symbols per call).
+    """
+    name = "base"
+    batch_size = 1
+
+    def available(self) -> bool:
+        return True
+
+    def fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = "1d") -> pd.DataFrame:
+        raise NotImplementedError
+
+    def fetch_many(self, symbols: List[str], start: pd.Timestamp, end: pd.Timestamp,
+                   interval: str = "1d") -> Dict[str, pd.DataFrame]:
+        return {s: self.fetch(s, start, end, interval) for s in symbols}
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    One yf.download call per batch of symbols (yfinance threads the batch
+    internally).
+    """
+    name = "yfinance"
+    batch_size = DEFAULT_BATCH_SIZE
+
+    # yf.download keeps module-global state, so downloads from several
+    # threads must not overlap.
+    _lock = threading.Lock()
+
+    def available(self) -> bool:
+        return yf is not None
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        return self.fetch_many([symbol], start, end, interval).get(symbol, normalize_bars(None))
+
+    def fetch_many(self, symbols, start, end, interval="1d"):
+        if yf is None:
+            raise RuntimeError("yfinance not installed. Run: python -m pip install yfinance")
+        with self._lock:
+            raw = yf.download(
+                symbols,
+                start=start.strftime("%Y-%m-%d"),
+                end=end.strftime("%Y-%m-%d"),
+                interval=interval,
+                group_by="ticker",
+                auto_adjust=False,
+                progress=False,
+                threads=True,
+            )
+        out: Dict[str, pd.DataFrame] = {}
+        if raw is None or raw.empty:
+            return out
+        for s in symbols:
+            if isinstance(raw.columns, pd.MultiIndex):
+                if s not in raw.columns.get_level_values(0):
+                    continue
+                part = raw[s]
+            else:
+                part = raw
+            out[s] = normalize_bars(part.dropna(how="all"))
+        return out
+
+
+class CsvProvider(MarketDataProvider):
+    """
+    File-based provider for tests and offline runs over a directory of
+    per-symbol files: <root>/<SYMBOL>_<interval>.(csv|parquet) or
+    <root>/<SYMBOL>.(csv|parquet), the first CSV column being the date.
+    Each file is parsed once; fetch_calls counts fetches, so tests can
+    assert on them.
+    """
+    name = "csv"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.fetch_calls = 0
+        self._frames: Dict[Tuple[str, str], pd.DataFrame] = {}
+
+    def _path(self, symbol: str, interval: str) -> Optional[Path]:
+        for stem in (f"{symbol}_{interval}", symbol):
+            for ext in (".csv", ".parquet"):
+                p = self.root / f"{stem}{ext}"
+                if p.is_file():
+                    return p
+        return None
+
+    def _load(self, symbol: str, interval: str) -> pd.DataFrame:
+        key = (symbol, interval)
+        if key not in self._frames:
+            path = self._path(symbol, interval)
+            if path is None:
+                df = None
+            elif path.suffix == ".parquet":
+                df = pd.read_parquet(path)
+                if "date" in df.columns:
+                    df = df.set_index("date")
+            else:
+                df = pd.read_csv(path, index_col=0)
+            self._frames[key] = normalize_bars(df)
+        return self._frames[key]
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        self.fetch_calls += 1
+        df = self._load(symbol, interval)
+        return df[(df.index >= start) & (df.index < end)]
+
+
+def provider_from_spec(spec: Optional[str] = None) -> MarketDataProvider:
+    """
+    "yfinance" (default) or "csv:<dir>"; falls back to AEGIS_MARKET_PROVIDER.
+    """
+    spec = spec or os.environ.get("AEGIS_MARKET_PROVIDER", "yfinance")
+    if spec.startswith("csv:"):
+        return CsvProvider(Path(spec[4:]))
+    if spec != "yfinance":
+        raise ValueError(f"Unknown market data provider: {spec}")
+    return YFinanceProvider()
+
+
+def provider_from_env() -> MarketDataProvider:
+    """
+    AEGIS_MARKET_PROVIDER: "yfinance" (default) or "csv:<dir>".
+    """
+    return provider_from_spec()
+
+
+# --- Coverage bookkeeping -------------------------------------------
+
+def _merge_ranges(ranges: List[Range]) -> List[Range]:
+    out: List[Range] = []
+    for s, e in sorted(ranges):
+        if out and s <= out[-1][1]:
+            out[-1] = (out[-1][0], max(out[-1][1], e))
+        else:
+            out.append((s, e))
+    return out
+
+
+def missing_ranges(covered: List[Range], start: pd.Timestamp, end: pd.Timestamp) -> List[Range]:
+    """
+    Parts of [start, end) not inside any covered range.
+    """
+    gaps: List[Range] = []
+    cur = start
+    for s, e in _merge_ranges(covered):
+        if e <= cur:
+            continue
+        if s >= end:
+            break
+        if s > cur:
+            gaps.append((cur, min(s, end)))
+        cur = max(cur, e)
+        if cur >= end:
+            break
+    if cur < end:
+        gaps.append((cur, end))
+    return gaps
+
+
+# An empty answer for a run of at most this many weekdays may be exchange
+# holidays (the longest closures are a few days); longer ones are throttling
+HOLIDAY_MAX_WEEKDAYS = 4
+
+
+def weekdays(start: pd.Timestamp, end: pd.Timestamp) -> int:
+    """
+    Number of weekdays touched by [start, end).
+    """
+    return len(pd.bdate_range(start.normalize(), end - pd.Timedelta(1, "ns")))
+
+
+def has_trading_days(start: pd.Timestamp, end: pd.Timestamp) -> bool:
+    """
+    Whether [start, end) contains a weekday. Exchange holidays aren't
+    known here, so a holiday-only range counts as tradable.
+    """
+    return weekdays(start, end) > 0
+
+
+# --- Store ----------------------------------------------------------
+
+class MarketDataStore:
+    """
+    Local copy of provider bars, one columnar store per (symbol, interval)
+    under root/<interval>/<SYMBOL>.store.
+
+    The manifest meta records which [start, end) ranges have been
+    fetched, so get() only asks the provider for the gaps, merges them in
+    and serves the rest from disk. A range is marked covered when the
+    provider returned bars for it or it has no weekdays at all. An empty
+    answer for a tradable range is what yfinance returns when it is
+    throttled, so it is only trusted for short ranges (at most
+    HOLIDAY_MAX_WEEKDAYS weekdays, i.e. possibly exchange holidays), and
+    only once the provider has shown bars after the range or has come
+    back empty for it twice (meta "empty" remembers the first time).
+    Longer empty ranges stay gaps and are asked for again next time.
+    Ranges reaching today are never marked complete, so the latest bars
+    are refetched until the day is over.
+    """
+
+    def __init__(self, root: Path = MARKET_DIR, provider: Optional[MarketDataProvider] = None):
+        self.root = Path(root)
+        self.provider = provider or provider_from_env()
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        self.fetches = 0
+
+    def path(self, symbol: str, interval: str = "1d") -> Path:
+        return self.root / interval / f"{symbol.upper()}{STORE_SUFFIX}"
+
+    def _lock(self, symbol: str, interval: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault((symbol.upper(), interval), threading.Lock())
+
+    def _read(self, path: Path) -> Tuple[pd.DataFrame, List[Range], List[Range]]:
+        if not is_store(path):
+            return normalize_bars(None), [], []
+        meta = read_manifest(path).get("meta", {})
+        df = read_frame(path)
+        df = df.set_index(df.columns[0])
+        df.index = pd.DatetimeIndex(df.index, name="date")
+        covered = [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in meta.get("coverage", [])]
+        empty = [(pd.Timestamp(s), pd.Timestamp(e)) for s, e in meta.get("empty", [])]
+        return df, covered, empty
+
+    @staticmethod
+    def _holidays(s: pd.Timestamp, e: pd.Timestamp, last_bar: Optional[pd.Timestamp], empty: List[Range]) -> bool:
+        # An empty answer for [s, e) that can be taken as "market closed"
+        if weekdays(s, e) > HOLIDAY_MAX_WEEKDAYS:
+            return False
+        return (last_bar is not None and last_bar >= e) or not missing_ranges(empty, s, e)
+
+    def get(self, symbol: str, start, end, interval: str = "1d") -> pd.DataFrame:
+        """
+        Bars for symbol in [start, end), fetching only what isn't stored.
+        """
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        if end <= start:
+            raise ValueError(f"end {end.date()} must be after start {start.date()}")
+        path = self.path(symbol, interval)
+
+        with self._lock(symbol, interval):
+            df, covered, empty = self._read(path)
+            gaps = missing_ranges(covered, start, end)
+
+            if gaps:
+                today = pd.Timestamp(datetime.now().date())
+                parts = [df]
+                fetched = []
+                for s, e in gaps:
+                    bars = self.provider.fetch(symbol, s, e, interval)
+                    self.fetches += 1
+                    parts.append(bars)
+                    fetched.append((s, e, bars))
+
+                last_bar = max((p.index.max() for p in parts if not p.empty), default=None)
+                marked = 0
+                for s, e, bars in fetched:
+                    if s >= today:
+                        continue
+                    e = min(e, today)
+                    if not bars.empty or not has_trading_days(s, e) or self._holidays(s, e, last_bar, empty):
+                        covered.append((s, e))
+                        marked += 1
+                    elif weekdays(s, e) <= HOLIDAY_MAX_WEEKDAYS:
+                        empty.append((s, e))
+                        marked += 1
+
+                # Nothing new and no range marked: leave the store alone
+                if marked or any(not p.empty for p in parts[1:]):
+                    nonempty = [p for p in parts if not p.empty]
+                    if nonempty:
+                        df = pd.concat(nonempty)
+                        df = df[~df.index.duplicated(keep="last")].sort_index()
+                    covered = _merge_ranges(covered)
+                    empty = [r for r in _merge_ranges(empty) if missing_ranges(covered, *r)]
+                    write_frame(df, path, meta={
+                        "symbol": symbol.upper(),
+                        "interval": interval,
+                        "provider": self.provider.name,
+                        "coverage": [[s.isoformat(), e.isoformat()] for s, e in covered],
+                        "empty": [[s.isoformat(), e.isoformat()] for s, e in empty],
+                    })
+
+        return df[(df.index >= start) & (df.index < end)]
+
+
+_DEFAULT_STORE: Optional[MarketDataStore] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_store() -> MarketDataStore:
+    global _DEFAULT_STORE
+    with _DEFAULT_LOCK:
+        if _DEFAULT_STORE is None:
+            _DEFAULT_STORE = MarketDataStore()
+        return _DEFAULT_STORE
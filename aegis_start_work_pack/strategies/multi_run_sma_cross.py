@@ -1,58 +1,42 @@
-DEMO_CSV = DATA_DIR / "SPY_SMA50-200_20251114-185715.csv"
-``` :contentReference[oaicite:0]{index=0}  
-
-We’ll build a **single, clean multi-run script** that:
-
-- Runs `sma_cross` over a grid of (fast, slow) values  
-- Writes a JSON per combo into `data/backtests/multi/`  
-- Writes `sma_cross_summary.json` with exactly the structure you showed  
-- Adds a `score` field = `sharpe * abs(total_return)` for ranking  
-- Plays nice with `grid_inspector.py`   
-
----
-
-## 1. Create the multi-run script
-
-In VS Code, in the **same folder as `strategy_engine.py`**, create a new file:
-
-> `multi_run_sma_cross.py`
-
-Paste this **entire** code:
-
-```python
 from __future__ import annotations
 
-import json
 from pathlib import Path
 from typing import Iterable, List, Dict, Any
 
-from strategy_engine import (
-    run_strategy_on_csv,
+# make sure Python can see the project root (where strategies/ lives)
+import sys
+ROOT = Path(__file__).resolve().parents[1]   # ...\aegis_start_work_pack
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from strategies.strategy_engine import (
     MULTI_DIR,
     DEMO_CSV,
+    INDEX_JSONL,
 )
+from strategies.parallel_grid import run_sma_cross_grid_parallel
+from strategies.result_index import ResultIndex
 
 
 SUMMARY_JSON = MULTI_DIR / "sma_cross_summary.json"
 
 
-def _as_float(x: Any) -> float:
-    try:
-        return float(x)
-    except Exception:
-        return 0.0
-
-
 def run_sma_cross_grid(
     fast_list: Iterable[int] = (10, 20, 50),
     slow_list: Iterable[int] = (100, 200),
     csv_path: Path | None = None,
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    resume: bool = True,
 ) -> None:
     """
     Run SMA crossover across a parameter grid and save:
 
       - One JSON per run in MULTI_DIR as
             sma_cross_fast{fast}_slow{slow}.json
+        with its equity curve alongside as a float64 array in
+            sma_cross_fast{fast}_slow{slow}.equity.npy
+        (referenced from the JSON's "equity" field)
 
       - One summary file in MULTI_DIR:
             sma_cross_summary.json
@@ -72,6 +56,17 @@ def run_sma_cross_grid(
             ...
           ]
         }
+
+    Finished combos are recorded in sma_cross_index.jsonl keyed by params,
+    output variant and a content hash of the input, so with ``resume``
+    (the default) a rerun only computes combos that are new, whose data
+    changed or whose per-run files have gone, and a sweep killed mid-grid
+    picks up where it stopped. The summary is always
+    rebuilt from the index.
+
+    ``workers`` > 1 runs the grid on a process pool (see
+    parallel_grid.run_sma_cross_grid_parallel); the files written are the
+    same.
     """
 
     if csv_path is None:
@@ -87,64 +82,17 @@ def run_sma_cross_grid(
     print(f"Using price CSV   : {csv_path}")
     print(f"Writing outputs to: {MULTI_DIR}\n")
 
-    rows: List[Dict[str, Any]] = []
-
-    for fast in fast_list:
-        for slow in slow_list:
-            if fast >= slow:
-                # optional: skip nonsensical combos where fast >= slow
-                print(f"Skipping fast={fast}, slow={slow} (fast >= slow)")
-                continue
-
-            params = {"fast": fast, "slow": slow}
-            print(f"Running sma_cross with params: {params}")
-
-            # Run the strategy
-            result = run_strategy_on_csv(csv_path, "sma_cross", params)
-
-            # Metrics from StrategyResult
-            metrics = dict(result.metrics)
-
-            total_return = _as_float(metrics.get("total_return", 0.0))
-            vol_annual = _as_float(metrics.get("vol_annual", 0.0))
-            sharpe = _as_float(metrics.get("sharpe", 0.0))
-
-            # Composite score, same logic as grid_inspector
-            score = sharpe * abs(total_return)
-            metrics["score"] = score
-
-            # ----- Per-run JSON -----
-            out_data = {
-                "name": result.name,
-                "params": result.params,
-                "metrics": metrics,
-                "equity_curve": result.equity_curve,
-                "trades": result.trades,
-            }
-
-            out_path = MULTI_DIR / f"sma_cross_fast{fast}_slow{slow}.json"
-            with out_path.open("w", encoding="utf-8") as f:
-                json.dump(out_data, f, indent=2)
-
-            print(f"  -> wrote {out_path.name}")
-
-            # ----- Summary row -----
-            rows.append(
-                {
-                    "fast": fast,
-                    "slow": slow,
-                    "total_return": total_return,
-                    "vol_annual": vol_annual,
-                    "sharpe": sharpe,
-                    "score": score,
-                }
-            )
-
-    # ----- Summary JSON -----
-    summary = {"rows": rows}
-
-    with SUMMARY_JSON.open("w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2)
+    rows: List[Dict[str, Any]] = run_sma_cross_grid_parallel(
+        csv_path,
+        fast_list,
+        slow_list,
+        out_dir=MULTI_DIR,
+        summary_path=SUMMARY_JSON,
+        workers=workers or 1,
+        chunk_size=chunk_size,
+        index=ResultIndex(INDEX_JSONL) if resume else None,
+        log=print,
+    )
 
     print(f"\n[+] Completed {len(rows)} parameter combos.")
     print(f"[+] Summary written to {SUMMARY_JSON}")
@@ -152,4 +100,19 @@ def run_sma_cross_grid(
 
 
 if __name__ == "__main__":
-    run_sma_cross_grid()
+    import argparse
+
+    ap = argparse.ArgumentParser(description="SMA crossover grid sweep")
+    ap.add_argument("--csv", type=Path, default=None, help="price CSV / .store (default: DEMO_CSV)")
+    ap.add_argument("--fast", type=int, nargs="+", default=[10, 20, 50])
+    ap.add_argument("--slow", type=int, nargs="+", default=[100, 200])
+    ap.add_argument("--workers", type=int, default=None, help="process-pool size (default: serial)")
+    ap.add_argument("--chunk-size", type=int, default=None, help="fast windows per pool task")
+    ap.add_argument("--no-resume", action="store_true", help="ignore the result index and recompute everything")
+    args = ap.parse_args()
+
+    run_sma_cross_grid(
+        args.fast, args.slow, args.csv,
+        workers=args.workers, chunk_size=args.chunk_size, resume=not args.no_resume,
+    )
+
@@ -0,0 +1,335 @@
+from __future__ import annotations
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from strategies.strategy_engine import StrategyResult, sma_cross_sweep
+from strategies.price_cache import load_prices
+from strategies.result_index import ResultIndex, data_fingerprint
+
+
+STRATEGY = "sma_cross"
+
+
+# --- Scoring / per-run records ----------------------------------------
+
+def _score_abs(sharpe: float, total_return: float) -> float:
+    # multi_run_sma_cross / grid_inspector: Sharpe * |total_return|
+    return sharpe * abs(total_return)
+
+
+def _score_positive(sharpe: float, total_return: float) -> float:
+    # chat/strategy_grid: Sharpe * positive total_return
+    return sharpe * max(total_return, 0.0)
+
+
+SCORES = {
+    "abs": _score_abs,
+    "positive": _score_positive,
+}
+
+
+def sma_cross_run_record(
+    result: StrategyResult,
+    score: str = "abs",
+    equity: Optional[Dict[str, Any]] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Build (per-run JSON payload, summary row) for one sma_cross result.
+
+    With ``equity`` (a reference to a binary equity file, see
+    write_equity), the payload carries that reference instead of the
+    inline ``equity_curve`` list.
+
+    Shared by the serial and parallel grid runners so both write
+    byte-identical files.
+    """
+    metrics = dict(result.metrics)
+
+    total_return = _as_float(metrics.get("total_return", 0.0))
+    vol_annual = _as_float(metrics.get("vol_annual", 0.0))
+    sharpe = _as_float(metrics.get("sharpe", 0.0))
+
+    row = summary_row(
+        result.params["fast"],
+        result.params["slow"],
+        {"total_return": total_return, "vol_annual": vol_annual, "sharpe": sharpe},
+        score,
+    )
+    metrics["score"] = row["score"]
+
+    out_data: Dict[str, Any] = {
+        "name": result.name,
+        "params": result.params,
+        "metrics": metrics,
+    }
+    if equity is not None:
+        out_data["equity"] = equity
+    else:
+        out_data["equity_curve"] = result.equity_curve
+    out_data["trades"] = result.trades
+    return out_data, row
+
+
+def summary_row(fast: int, slow: int, metrics: Dict[str, Any], score: str = "abs") -> Dict[str, Any]:
+    """
+    One sma_cross_summary.json row from (already float) metrics.
+    """
+    total_return = metrics["total_return"]
+    sharpe = metrics["sharpe"]
+    return {
+        "fast": fast,
+        "slow": slow,
+        "total_return": total_return,
+        "vol_annual": metrics["vol_annual"],
+        "sharpe": sharpe,
+        "score": SCORES[score](sharpe, total_return),
+    }
+
+
+def _as_float(x: Any) -> float:
+    try:
+        return float(x)
+    except Exception:
+        return 0.0
+
+
+def run_json_path(out_dir: Path, fast: int, slow: int) -> Path:
+    return Path(out_dir) / f"sma_cross_fast{fast}_slow{slow}.json"
+
+
+def equity_path(out_dir: Path, fast: int, slow: int) -> Path:
+    return Path(out_dir) / f"sma_cross_fast{fast}_slow{slow}.equity.npy"
+
+
+def write_equity(path: Path, equity: np.ndarray) -> Dict[str, Any]:
+    """
+    Save an equity curve as a raw float64 .npy next to its run JSON and
+    return the reference stored in the run metadata (file name is
+    relative to the JSON's directory).
+    """
+    equity = np.ascontiguousarray(equity, dtype=np.float64)
+    np.save(path, equity, allow_pickle=False)
+    return {"file": Path(path).name, "dtype": "float64", "length": int(len(equity))}
+
+
+# --- Index records ------------------------------------------------------
+
+def grid_variant(per_run: str, score: str, skip_invalid: bool) -> str:
+    # Part of the result-index key: runners sharing one index and out_dir
+    # but writing different per-run files must not claim each other's combos
+    return f"per_run={per_run};score={score};skip_invalid={int(bool(skip_invalid))}"
+
+
+def _outputs_exist(rec: Dict[str, Any], out_dir: Optional[Path], per_run: str) -> bool:
+    # An index hit only counts if the files it stands for are still there
+    if out_dir is None or per_run == "none":
+        return True
+    run_file = rec.get("run_file")
+    if not run_file or not (Path(out_dir) / run_file).exists():
+        return False
+    if per_run == "full":
+        p = rec["params"]
+        return equity_path(Path(out_dir), p["fast"], p["slow"]).exists()
+    return True
+
+
+# --- Worker side --------------------------------------------------------
+
+# Set per worker process by _attach_prices; the SharedMemory handle is kept
+# alive here so the buffer behind _PRICES isn't released mid-run.
+_SHM: Optional[shared_memory.SharedMemory] = None
+_PRICES: Optional[np.ndarray] = None
+
+
+def _attach_prices(name: str, length: int) -> None:
+    global _SHM, _PRICES
+    _SHM = shared_memory.SharedMemory(name=name)
+    _PRICES = np.ndarray((length,), dtype=np.float64, buffer=_SHM.buf)
+
+
+def _run_chunk(
+    pairs: Sequence[Tuple[int, int]],
+    out_dir: Optional[str],
+    per_run: str,
+    score: str,
+    prices: Optional[np.ndarray] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Sweep one chunk of (fast, slow) pairs and write the chunk's per-run
+    JSONs. Returns summary rows in the order given.
+    """
+    prices = _PRICES if prices is None else prices
+    fasts = sorted({f for f, _ in pairs})
+    slows = sorted({s for _, s in pairs})
+    sweep = sma_cross_sweep(prices, fasts, slows)
+
+    rows: List[Dict[str, Any]] = []
+    for fast, slow in pairs:
+        result = sweep.result(fast, slow, include_equity=False)
+
+        equity = None
+        if out_dir is not None and per_run == "full":
+            equity = write_equity(equity_path(Path(out_dir), fast, slow), sweep.equity_curve(fast, slow))
+        out_data, row = sma_cross_run_record(result, score, equity=equity)
+
+        if out_dir is not None and per_run != "none":
+            payload = out_data if per_run == "full" else row
+            with run_json_path(Path(out_dir), fast, slow).open("w", encoding="utf-8") as f:
+                json.dump(payload, f, indent=2)
+
+        rows.append(row)
+    return rows
+
+
+# --- Driver -------------------------------------------------------------
+
+def run_sma_cross_grid_parallel(
+    csv_path: Path,
+    fast_list: Iterable[int],
+    slow_list: Iterable[int],
+    out_dir: Optional[Path] = None,
+    summary_path: Optional[Path] = None,
+    workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
+    per_run: str = "full",
+    score: str = "abs",
+    skip_invalid: bool = True,
+    index: Optional[ResultIndex] = None,
+    progress: Optional[Callable[[Dict[str, Any], int, int], None]] = None,
+    log: Optional[Callable[[str], None]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run the SMA crossover grid on a process pool.
+
+    The price array is placed in shared memory once and attached by every
+    worker instead of being pickled per task. Work is split into chunks of
+    ``chunk_size`` fast windows (default: ~4 chunks per worker); each worker
+    sweeps its chunk against the slow windows and writes its own per-run
+    JSONs. Rows are returned in the same fast-major order as the serial
+    runners, so the summary JSON is identical.
+
+    With an ``index``, combos already recorded for this strategy, params,
+    input fingerprint and output variant (per_run/score/skip_invalid, see
+    grid_variant) are skipped as long as the per-run files they point at
+    are still on disk; each finished chunk is appended to the index
+    straight away (so a killed sweep resumes where it stopped), and the
+    summary is rebuilt from the index.
+
+    per_run: "full" (name/params/metrics/trades plus a float64
+    ``.equity.npy`` referenced from the JSON, as multi_run_sma_cross
+    writes), "row" (summary row only, as chat/strategy_grid writes) or
+    "none".
+
+    progress(row, done, total) is called in this process for every combo
+    as its chunk comes back; done/total count only the combos that had to
+    run (index hits are not reported). log(line) gets the resume summary
+    line; nothing is printed without it.
+    """
+    if per_run not in ("full", "row", "none"):
+        raise ValueError(f"Unknown per_run mode: {per_run}")
+    if score not in SCORES:
+        raise ValueError(f"Unknown score: {score}")
+
+    csv_path = Path(csv_path)
+    fast_list = [int(f) for f in fast_list]
+    slow_list = [int(s) for s in slow_list]
+    combos = [(f, s) for f in fast_list for s in slow_list if not (skip_invalid and f >= s)]
+
+    # ----- Resume from the index -----
+    data = data_fingerprint(csv_path) if index is not None else None
+    variant = grid_variant(per_run, score, skip_invalid)
+    done: Dict[Tuple[int, int], Dict[str, Any]] = {}
+    stale = 0
+    if index is not None:
+        for fast, slow in combos:
+            rec = index.get(STRATEGY, {"fast": fast, "slow": slow}, data, variant)
+            if rec is None:
+                continue
+            if not _outputs_exist(rec, out_dir, per_run):
+                stale += 1
+                continue
+            done[(fast, slow)] = summary_row(fast, slow, rec["metrics"], score)
+
+    todo = [c for c in combos if c not in done]
+    if index is not None and log is not None:
+        log(f"[grid] {len(combos)} combos: {len(done)} already in index, "
+            f"{stale} with missing outputs, {len(todo)} to run")
+
+    # ----- Chunk remaining work by fast window -----
+    workers = max(1, int(workers or os.cpu_count() or 1))
+    todo_fast = list(dict.fromkeys(f for f, _ in todo))
+    if chunk_size is None:
+        chunk_size = max(1, math.ceil(len(todo_fast) / (workers * 4)))
+    chunks = []
+    for i in range(0, len(todo_fast), chunk_size):
+        fasts = set(todo_fast[i:i + chunk_size])
+        chunks.append([c for c in todo if c[0] in fasts])
+
+    if out_dir is not None:
+        Path(out_dir).mkdir(parents=True, exist_ok=True)
+    out_dir_s = str(out_dir) if out_dir is not None else None
+
+    ran = [0]
+
+    def _collect(rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            done[(row["fast"], row["slow"])] = row
+        if index is not None:
+            index.add_many(
+                {
+                    "strategy": STRATEGY,
+                    "params": {"fast": row["fast"], "slow": row["slow"]},
+                    "data": data,
+                    "variant": variant,
+                    "metrics": {k: row[k] for k in ("total_return", "vol_annual", "sharpe")},
+                    "run_file": run_json_path(Path(out_dir), row["fast"], row["slow"]).name
+                    if out_dir is not None and per_run != "none" else None,
+                }
+                for row in rows
+            )
+        if progress is not None:
+            for row in rows:
+                ran[0] += 1
+                progress(row, ran[0], len(todo))
+
+    prices = load_prices(csv_path) if chunks else None
+
+    if workers == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            _collect(_run_chunk(chunk, out_dir_s, per_run, score, prices))
+    else:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, prices.nbytes))
+        try:
+            np.ndarray(prices.shape, dtype=np.float64, buffer=shm.buf)[:] = prices
+
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)),
+                initializer=_attach_prices,
+                initargs=(shm.name, len(prices)),
+            ) as pool:
+                futures = [
+                    pool.submit(_run_chunk, chunk, out_dir_s, per_run, score)
+                    for chunk in chunks
+                ]
+                # Checkpoint chunks as they finish; ordering is restored below
+                for fut in as_completed(futures):
+                    _collect(fut.result())
+        finally:
+            shm.close()
+            shm.unlink()
+
+    rows = [done[c] for c in combos]
+
+    if summary_path is not None:
+        with Path(summary_path).open("w", encoding="utf-8") as f:
+            json.dump({"rows": rows}, f, indent=2)
+
+    return rows
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# make sure Python can see the project root (where strategies/ lives)
+ROOT = Path(__file__).resolve().parents[1]   # ...\aegis_start_work_pack
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from strategies.market_data import default_store
+
+
+STRATEGY_YAML = ROOT / "brokers" / "E-Trade" / "strategy.yaml"
+BARS_PER_YEAR = 252
+
+
+# --- Config ---------------------------------------------------------
+
+@dataclass
+class PortfolioConfig:
+    """
+    The sizing / risk / cost rules from strategy.yaml, flattened.
+
+    Money amounts (daily_loss_halt) are in account currency; weights and
+    percentages are fractions of equity.
+    """
+    symbols: List[str] = field(default_factory=list)
+    max_positions: int = 10
+    sizing: str = "confidence_linear"
+    min_weight: float = 0.02
+    max_weight: float = 0.10
+    cash_reserve: float = 0.10
+    stop_loss_pct: float = 0.05
+    daily_loss_halt: Optional[float] = None
+    portfolio_heat_limit: float = 1.0
+    cool_down_bars: int = 0
+    fee_bps: float = 0.0
+    commission_per_share: float = 0.0
+    long_only: bool = True
+    min_trade_weight: float = 0.005   # drift band: skip rebalance trades smaller than this
+
+    @classmethod
+    def from_yaml(cls, path: Path = STRATEGY_YAML) -> "PortfolioConfig":
+        with open(path, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f) or {}
+        uni = cfg.get("universe") or {}
+        size = cfg.get("position_sizing") or {}
+        risk = cfg.get("risk") or {}
+        fees = cfg.get("slippage_fees") or {}
+
+        if uni.get("rebalance", "daily") != "daily":
+            raise ValueError(f"Only daily rebalance is supported, got {uni.get('rebalance')!r}")
+        if size.get("method", "confidence_linear") != "confidence_linear":
+            raise ValueError(f"Unknown position_sizing.method {size.get('method')!r}")
+        if fees.get("model", "fixed_bps") != "fixed_bps":
+            raise ValueError(f"Unknown slippage_fees.model {fees.get('model')!r}")
+
+        d = cls()
+        return cls(
+            symbols=[str(s).upper() for s in uni.get("symbols") or []],
+            max_positions=int(uni.get("max_positions", d.max_positions)),
+            sizing="confidence_linear",
+            min_weight=float(size.get("min_weight", d.min_weight)),
+            max_weight=float(size.get("max_weight", d.max_weight)),
+            cash_reserve=float(size.get("cash_reserve", d.cash_reserve)),
+            stop_loss_pct=float(risk.get("stop_loss_pct", d.stop_loss_pct)),
+            daily_loss_halt=(float(risk["daily_loss_halt"]) if risk.get("daily_loss_halt") is not None else None),
+            portfolio_heat_limit=float(risk.get("portfolio_heat_limit", d.portfolio_heat_limit)),
+            cool_down_bars=int(risk.get("cool_down_bars", d.cool_down_bars)),
+            fee_bps=float(fees.get("bps", d.fee_bps)),
+            commission_per_share=float(fees.get("commission_per_share", d.commission_per_share)),
+        )
+
+    @property
+    def gross_cap(self) -> float:
+        # Heat = gross exposure / equity; the cash reserve caps it too
+        return max(0.0, min(1.0 - self.cash_reserve, self.portfolio_heat_limit))
+
+
+# --- Signals --------------------------------------------------------
+
+def sma_confidence(prices: np.ndarray, fast: int = 50, slow: int = 200, scale: float = 0.05) -> np.ndarray:
+    """
+    SMA crossover as a confidence in [-1, 1] for a (bars x symbols) array:
+    the fast/slow spread, saturating at +-scale (5% by default). Bars
+    before the slow SMA is full are 0.
+    """
+    if fast >= slow:
+        raise ValueError("fast SMA must be < slow SMA")
+    x = np.asarray(prices, dtype=np.float64)
+    n = x.shape[0]
+    filled = pd.DataFrame(x).ffill().to_numpy()
+    csum = np.vstack([np.zeros((1, x.shape[1])), np.cumsum(np.nan_to_num(filled), axis=0)])
+
+    def sma(w: int) -> np.ndarray:
+        out = np.full(x.shape, np.nan)
+        if w <= n:
+            out[w - 1:] = (csum[w:] - csum[:-w]) / w
+        return out
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread = sma(fast) / sma(slow) - 1.0
+    # Windows reaching back before a symbol's first price aren't real SMAs
+    seen = np.cumsum(~np.isnan(filled), axis=0)
+    spread[seen < slow] = np.nan
+    return np.nan_to_num(np.clip(spread / scale, -1.0, 1.0), nan=0.0)
+
+
+# --- Sizing ---------------------------------------------------------
+
+def target_weights(conf: np.ndarray, eligible: np.ndarray, cfg: PortfolioConfig) -> np.ndarray:
+    """
+    confidence_linear sizing for one bar across all symbols:
+
+      |w| = min_weight + (max_weight - min_weight) * |confidence|
+
+    for the max_positions most confident eligible symbols, then scaled
+    down together if the gross exceeds the cash-reserve / heat cap.
+    """
+    c = np.where(eligible, conf, 0.0)
+    if cfg.long_only:
+        c = np.maximum(c, 0.0)
+    mag = np.abs(c)
+
+    live = np.flatnonzero(mag > 0)
+    if len(live) > cfg.max_positions:
+        keep = live[np.argpartition(-mag[live], cfg.max_positions - 1)[: cfg.max_positions]]
+        mask = np.zeros(len(c), dtype=bool)
+        mask[keep] = True
+        mag = np.where(mask, mag, 0.0)
+
+    w = np.where(mag > 0, cfg.min_weight + (cfg.max_weight - cfg.min_weight) * mag, 0.0) * np.sign(c)
+    gross = np.abs(w).sum()
+    cap = cfg.gross_cap
+    if gross > cap > 0:
+        w *= cap / gross
+    elif cap <= 0:
+        w[:] = 0.0
+    return w
+
+
+# --- Engine ---------------------------------------------------------
+
+@dataclass
+class PortfolioResult:
+    equity: pd.Series
+    weights: pd.DataFrame
+    trades: List[Dict[str, Any]]
+    metrics: Dict[str, Any]
+    pnl_by_symbol: Dict[str, float]
+
+
+def run_portfolio(
+    prices: pd.DataFrame,
+    confidence: pd.DataFrame,
+    cfg: PortfolioConfig,
+    capital: float = 100_000.0,
+    blackout: Optional[pd.DataFrame] = None,
+) -> PortfolioResult:
+    """
+    Simulate the whole universe bar by bar; every step is vectorized across
+    symbols.
+
+    prices / confidence / blackout are (dates x symbols) frames on the
+    same axes. The confidence known at bar t-1's close is traded at bar
+    t's close (same one-bar lag as sma_cross_strategy). Per bar:
+
+      1. mark to market; held positions that moved stop_loss_pct against
+         their entry are closed and the symbol sits out cool_down_bars;
+      2. if the previous bar lost more than daily_loss_halt, no new
+         risk is added this bar (stops and exits still run);
+      3. otherwise rebalance to confidence_linear target weights,
+         paying fee_bps on traded notional plus commission_per_share.
+
+    Symbols without a price on a bar (not listed yet, halted) can't
+    trade and are valued at their last price.
+    """
+    syms = list(prices.columns)
+    if list(confidence.columns) != syms or not confidence.index.equals(prices.index):
+        confidence = confidence.reindex(index=prices.index, columns=syms)
+    raw = prices.to_numpy(dtype=np.float64)
+    px_all = prices.ffill().to_numpy(dtype=np.float64)
+    conf_all = np.nan_to_num(confidence.to_numpy(dtype=np.float64), nan=0.0)
+    black_all = (
+        blackout.reindex(index=prices.index, columns=syms).fillna(False).to_numpy(dtype=bool)
+        if blackout is not None else None
+    )
+
+    t_n, n = raw.shape
+    shares = np.zeros(n)
+    entry = np.full(n, np.nan)
+    cooldown = np.zeros(n, dtype=np.int64)
+    cash = float(capital)
+    prev_equity = float(capital)
+    halt = False
+
+    equity_out = np.full(t_n, np.nan)
+    weights_out = np.zeros((t_n, n))
+    pnl_sym = np.zeros(n)
+    trades: List[Dict[str, Any]] = []
+    total_costs = 0.0
+    traded_notional = 0.0
+    n_stops = 0
+    halted_bars = 0
+    fee_rate = cfg.fee_bps / 1e4
+
+    for t in range(t_n):
+        px = px_all[t]
+        tradable = ~np.isnan(raw[t])
+        val_px = np.nan_to_num(px)
+        if t > 0:
+            pnl_sym += shares * (val_px - np.nan_to_num(px_all[t - 1]))
+        equity = cash + float(shares @ val_px)
+
+        # 1. stops
+        with np.errstate(invalid="ignore"):
+            stopped = tradable & (
+                ((shares > 0) & (px <= entry * (1.0 - cfg.stop_loss_pct)))
+                | ((shares < 0) & (px >= entry * (1.0 + cfg.stop_loss_pct)))
+            )
+
+        # 2. daily loss halt (from the previous bar's P&L)
+        if halt:
+            halted_bars += 1
+
+        # 3. targets
+        cur_w = shares * val_px / equity if equity > 0 else np.zeros(n)
+        if t == 0 or equity <= 0:
+            target = np.zeros(n) if equity <= 0 else cur_w.copy()
+        else:
+            eligible = tradable & (cooldown == 0) & ~stopped
+            if black_all is not None:
+                eligible &= ~black_all[t]
+            target = target_weights(conf_all[t - 1], eligible, cfg)
+            if halt:
+                # Only reduce: keep each position at the smaller of current / target
+                same = np.sign(target) == np.sign(cur_w)
+                target = np.where(same & (np.abs(target) < np.abs(cur_w)), target, np.where(same, cur_w, 0.0))
+        target[stopped] = 0.0
+        target[~tradable] = cur_w[~tradable]
+
+        delta_w = target - cur_w
+        do = tradable & ((np.abs(delta_w) >= cfg.min_trade_weight) | stopped | ((target == 0) & (shares != 0)))
+        if np.abs(np.where(do, target, cur_w)).sum() > cfg.gross_cap + 1e-9:
+            # Drift inside the band pushed heat over the limit: also make every
+            # reducing trade, which brings gross back under sum(|target|)
+            do |= tradable & (np.abs(target) < np.abs(cur_w))
+        if do.any():
+            new_shares = np.where(do, np.where(target == 0, 0.0, target * equity / np.where(do, px, 1.0)), shares)
+            d_sh = new_shares - shares
+            notional = np.abs(d_sh) * val_px
+            costs = notional * fee_rate + np.abs(d_sh) * cfg.commission_per_share
+            cash -= float(d_sh @ val_px) + float(costs.sum())
+            pnl_sym -= costs
+            total_costs += float(costs.sum())
+            traded_notional += float(notional.sum())
+
+            opened = do & (((shares == 0) & (new_shares != 0)) | (np.sign(shares) * np.sign(new_shares) < 0))
+            added = do & ~opened & (np.abs(new_shares) > np.abs(shares))
+            with np.errstate(invalid="ignore", divide="ignore"):
+                avg = (entry * np.abs(shares) + px * np.abs(d_sh)) / np.abs(new_shares)
+            entry = np.where(opened, px, np.where(added, avg, entry))
+            entry[new_shares == 0] = np.nan
+
+            for j in np.flatnonzero(d_sh):
+                trades.append({
+                    "date": prices.index[t].isoformat(),
+                    "symbol": syms[j],
+                    "shares": float(d_sh[j]),
+                    "price": float(px[j]),
+                    "cost": float(costs[j]),
+                    "reason": "stop" if stopped[j] else ("halt" if halt else "rebalance"),
+                })
+            shares = new_shares
+            equity = cash + float(shares @ val_px)
+
+        n_stops += int(stopped.sum())
+        cooldown = np.maximum(cooldown - 1, 0)
+        cooldown[stopped] = cfg.cool_down_bars
+
+        halt = cfg.daily_loss_halt is not None and t > 0 and (equity - prev_equity) <= cfg.daily_loss_halt
+        prev_equity = equity
+        equity_out[t] = equity
+        weights_out[t] = shares * val_px / equity if equity > 0 else 0.0
+
+    equity_s = pd.Series(equity_out, index=prices.index, name="equity")
+    weights = pd.DataFrame(weights_out, index=prices.index, columns=syms)
+    metrics = portfolio_metrics(equity_s, weights)
+    metrics.update({
+        "capital": float(capital),
+        "trades": len(trades),
+        "stops": n_stops,
+        "halted_bars": halted_bars,
+        "costs": round(total_costs, 2),
+        "turnover": round(traded_notional / max(float(np.nanmean(equity_out)), 1e-12), 3) if t_n else 0.0,
+    })
+    return PortfolioResult(
+        equity=equity_s,
+        weights=weights,
+        trades=trades,
+        metrics=metrics,
+        pnl_by_symbol={s: round(float(p), 2) for s, p in zip(syms, pnl_sym)},
+    )
+
+
+def portfolio_metrics(equity: pd.Series, weights: pd.DataFrame) -> Dict[str, Any]:
+    eq = equity.to_numpy(dtype=np.float64)
+    if len(eq) < 2:
+        return {"total_return": 0.0, "vol_annual": 0.0, "sharpe": 0.0, "max_drawdown": 0.0}
+    ret = eq[1:] / eq[:-1] - 1.0
+    vol = float(ret.std(ddof=1) * BARS_PER_YEAR ** 0.5) if len(ret) > 1 else 0.0
+    years = len(ret) / BARS_PER_YEAR
+    total = float(eq[-1] / eq[0] - 1.0)
+    gross = weights.abs().sum(axis=1)
+    return {
+        "total_return": total,
+        "cagr": float((eq[-1] / eq[0]) ** (1.0 / years) - 1.0) if years > 0 and eq[-1] > 0 else 0.0,
+        "vol_annual": vol,
+        "sharpe": float(ret.mean() * BARS_PER_YEAR / vol) if vol > 0 else 0.0,
+        "max_drawdown": float((eq / np.maximum.accumulate(eq) - 1.0).min()),
+        "avg_gross": float(gross.mean()),
+        "max_gross": float(gross.max()),
+        "avg_positions": float((weights != 0).sum(axis=1).mean()),
+    }
+
+
+# --- Data / CLI -----------------------------------------------------
+
+def load_universe_prices(symbols: Sequence[str], start: str, end: str) -> pd.DataFrame:
+    """
+    (dates x symbols) adjusted closes from the local market-data store.
+    """
+    store = default_store()
+    cols = {}
+    for s in symbols:
+        bars = store.get(s, start, end)
+        col = "adj_close" if "adj_close" in bars.columns else "close"
+        cols[s] = bars[col] if col in bars.columns else pd.Series(dtype="float64")
+    return pd.DataFrame(cols).sort_index()
+
+
+def run_sma_portfolio(
+    start: str,
+    end: str,
+    fast: int = 50,
+    slow: int = 200,
+    cfg: Optional[PortfolioConfig] = None,
+    capital: float = 100_000.0,
+) -> PortfolioResult:
+    cfg = cfg or PortfolioConfig.from_yaml()
+    prices = load_universe_prices(cfg.symbols, start, end)
+    conf = pd.DataFrame(sma_confidence(prices.to_numpy(), fast, slow), index=prices.index, columns=prices.columns)
+    return run_portfolio(prices, conf, cfg, capital)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Portfolio backtest of the strategy.yaml universe (SMA confidence).")
+    ap.add_argument("--start", default="2018-01-01")
+    ap.add_argument("--end", default=pd.Timestamp.today().strftime("%Y-%m-%d"))
+    ap.add_argument("--fast", type=int, default=50)
+    ap.add_argument("--slow", type=int, default=200)
+    ap.add_argument("--capital", type=float, default=100_000.0)
+    ap.add_argument("--config", default=str(STRATEGY_YAML))
+    args = ap.parse_args()
+
+    cfg = PortfolioConfig.from_yaml(Path(args.config))
+    res = run_sma_portfolio(args.start, args.end, args.fast, args.slow, cfg, args.capital)
+    print(json.dumps({"config": asdict(cfg), "metrics": res.metrics, "pnl_by_symbol": res.pnl_by_symbol}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+
+from strategies.price_store import is_store, manifest_path, open_columns
+
+
+# --- Config ---------------------------------------------------------
+
+# Byte budget for cached price arrays (override with AEGIS_PRICE_CACHE_MB)
+DEFAULT_BUDGET_BYTES = int(os.environ.get("AEGIS_PRICE_CACHE_MB", "256")) * 1024 * 1024
+
+
+# --- Loader ---------------------------------------------------------
+
+def read_price_csv(csv_path: Path) -> np.ndarray:
+    """
+    Parse a backtest CSV into a clean float64 price array.
+
+    Non-numeric rows (e.g. the 'Ticker,SPY' header row yfinance leaves
+    behind) are dropped, same as sma_cross_strategy does.
+    """
+    df = pd.read_csv(csv_path)
+
+    if "price" not in df.columns:
+        raise ValueError(f"CSV missing 'price' column: {csv_path}")
+
+    prices = pd.to_numeric(df["price"], errors="coerce").dropna()
+    return prices.to_numpy(dtype=np.float64)
+
+
+def read_price_array(path: Path) -> np.ndarray:
+    """
+    Clean float64 prices from either a columnar store or a legacy CSV.
+    """
+    if not is_store(path):
+        return read_price_csv(path)
+
+    try:
+        prices = open_columns(path, ["price"])["price"]
+    except KeyError:
+        raise ValueError(f"Store missing 'price' column: {path}")
+    prices = np.asarray(prices, dtype=np.float64)
+    return prices[~np.isnan(prices)]
+
+
+# --- Cache ----------------------------------------------------------
+
+@dataclass
+class _Entry:
+    mtime_ns: int
+    size: int
+    prices: np.ndarray
+
+
+class PriceSeriesCache:
+    """
+    Process-wide LRU cache of cleaned price arrays, keyed by file path.
+
+    An entry is only reused while the file's mtime and size are unchanged;
+    otherwise it is re-parsed and replaced. Arrays are returned read-only
+    since every caller shares the same buffer.
+    """
+
+    def __init__(self, budget_bytes: int = DEFAULT_BUDGET_BYTES):
+        self.budget_bytes = int(budget_bytes)
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(path: Path) -> Tuple[str, int, int]:
+        path = Path(path).resolve()
+        # Stores are replaced atomically, so their manifest stands in for the dir
+        target = manifest_path(path) if is_store(path) else path
+        st = target.stat()  # FileNotFoundError propagates to callers
+        return str(path), st.st_mtime_ns, st.st_size
+
+    def get(self, path: Path) -> np.ndarray:
+        key, mtime_ns, size = self._key(path)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.mtime_ns == mtime_ns and entry.size == size:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.prices
+            self.misses += 1
+
+        # Parse outside the lock so one slow file doesn't block other readers
+        prices = read_price_array(Path(key))
+        prices.setflags(write=False)
+
+        with self._lock:
+            self._drop(key)
+            if prices.nbytes <= self.budget_bytes:
+                self._entries[key] = _Entry(mtime_ns, size, prices)
+                self._bytes += prices.nbytes
+                while self._bytes > self.budget_bytes:
+                    oldest = next(iter(self._entries))
+                    self._drop(oldest)
+                    self.evictions += 1
+        return prices
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.prices.nbytes
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+PRICE_CACHE = PriceSeriesCache()
+
+
+def load_prices(csv_path: Path) -> np.ndarray:
+    """
+    Cleaned float64 prices for csv_path (CSV or columnar store), parsed at
+    most once per file version.
+    """
+    return PRICE_CACHE.get(Path(csv_path))
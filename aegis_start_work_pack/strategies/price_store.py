@@ -0,0 +1,231 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+# --- Layout ---------------------------------------------------------
+#
+# A store is a directory holding one .npy file per column plus a small
+# JSON manifest:
+#
+#   SPY_SMA50-200_20251114-185715.store/
+#       manifest.json     {"format": ..., "rows": N, "dir": "v-...", "index": {...}, "columns": [...]}
+#       v-1a2b3c4d/
+#           index.npy     datetime64[ns] (or whatever the frame index was)
+#           c0.npy, ...   one array per column, in frame order
+#
+# Each write goes to a fresh version directory and then replaces the
+# manifest (a single file rename), so the manifest always names a
+# complete version. Stores written before versioning keep their arrays
+# next to the manifest (no "dir").
+#
+# Columns are memory-mapped on read, so a consumer that only needs
+# 'price' or 'equity' never touches the rest of the file.
+
+STORE_SUFFIX = ".store"
+MANIFEST_NAME = "manifest.json"
+FORMAT_NAME = "aegis-npy"
+FORMAT_VERSION = 1
+
+# Superseded versions younger than this are left for readers that
+# loaded the old manifest (and for writers racing on the same store)
+PRUNE_GRACE_S = 60.0
+
+
+def manifest_path(path: Path) -> Path:
+    return Path(path) / MANIFEST_NAME
+
+
+def is_store(path: Path) -> bool:
+    path = Path(path)
+    return path.is_dir() and manifest_path(path).is_file()
+
+
+def data_dir(path: Path, manifest: Dict[str, Any]) -> Path:
+    """
+    Directory holding the arrays of the version `manifest` describes.
+    """
+    return Path(path) / manifest["dir"] if manifest.get("dir") else Path(path)
+
+
+def _column_name(col: Any) -> str:
+    """
+    Flatten yfinance-style MultiIndex columns, e.g. ('price', 'SPY') -> 'price'.
+    """
+    if isinstance(col, tuple):
+        parts = [str(c) for c in col if str(c)]
+        return parts[0] if parts else ""
+    return str(col)
+
+
+def _to_array(values: Any) -> np.ndarray:
+    arr = np.asarray(values)
+    if arr.dtype == object:
+        # Mixed / string columns: store as fixed-width unicode, never pickles
+        arr = arr.astype(str)
+    return arr
+
+
+# --- Writer ---------------------------------------------------------
+
+def write_frame(df: pd.DataFrame, path: Path, meta: Optional[Dict[str, Any]] = None) -> Path:
+    """
+    Write df (index + columns) as a columnar store at path.
+
+    The arrays go to a new version directory inside the store; the
+    manifest pointing at it is then swapped in with one file rename. A
+    reader sees either the previous version or the new one, never a
+    missing or half-written store. Old versions are pruned on later
+    writes once they are PRUNE_GRACE_S old.
+    """
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    prev = read_manifest(path) if is_store(path) else None
+
+    version = f"v-{uuid.uuid4().hex[:8]}"
+    tmp = path / f".{version}.tmp"
+    tmp.mkdir()
+    try:
+        columns: List[Dict[str, Any]] = []
+        seen: Dict[str, int] = {}
+        for i, col in enumerate(df.columns):
+            name = _column_name(col)
+            if name in seen:
+                seen[name] += 1
+                name = f"{name}_{seen[name]}"
+            else:
+                seen[name] = 0
+
+            arr = _to_array(df.iloc[:, i].to_numpy())
+            fname = f"c{i}.npy"
+            np.save(tmp / fname, arr, allow_pickle=False)
+            columns.append({"name": name, "file": fname, "dtype": str(arr.dtype)})
+
+        index = _to_array(df.index.to_numpy())
+        np.save(tmp / "index.npy", index, allow_pickle=False)
+        os.replace(tmp, path / version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    manifest = {
+        "format": FORMAT_NAME,
+        "version": FORMAT_VERSION,
+        "rows": int(len(df)),
+        "dir": version,
+        "index": {"name": df.index.name or "index", "file": "index.npy", "dtype": str(index.dtype)},
+        "columns": columns,
+        "meta": meta or {},
+    }
+    tmp_manifest = path / f".{MANIFEST_NAME}.{version}.tmp"
+    tmp_manifest.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+    _replace_file(tmp_manifest, manifest_path(path))
+
+    # Arrays of a pre-versioning store count as the previous version:
+    # keep them for one more write
+    _prune(path, keep={version, (prev or {}).get("dir")}, legacy=bool(prev and prev.get("dir")))
+    return path
+
+
+def _replace_file(src: Path, dst: Path, attempts: int = 20) -> None:
+    # Windows refuses to replace a file another process has open for
+    # reading; readers only hold the manifest for a moment, so retry
+    for i in range(attempts):
+        try:
+            os.replace(src, dst)
+            return
+        except PermissionError:
+            if i == attempts - 1:
+                raise
+            time.sleep(0.05)
+
+
+def _prune(path: Path, keep: set, legacy: bool) -> None:
+    """
+    Best-effort removal of superseded versions; failures (e.g. a file
+    still mapped on Windows) are retried on the next write.
+    """
+    cutoff = time.time() - PRUNE_GRACE_S
+    for child in path.iterdir():
+        try:
+            if child.name in keep or child.stat().st_mtime > cutoff:
+                continue
+            if child.is_dir() and child.name.startswith(("v-", ".v-")):
+                shutil.rmtree(child, ignore_errors=True)
+            elif legacy and child.suffix == ".npy":
+                child.unlink()
+        except OSError:
+            pass
+
+
+# --- Readers --------------------------------------------------------
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    with manifest_path(path).open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != FORMAT_NAME:
+        raise ValueError(f"Not a {FORMAT_NAME} store: {path}")
+    return manifest
+
+
+def list_columns(path: Path) -> List[str]:
+    return [c["name"] for c in read_manifest(path)["columns"]]
+
+
+def open_columns(path: Path, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    Memory-mapped, read-only arrays for the requested columns (all if None).
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    by_name = {c["name"]: c for c in manifest["columns"]}
+
+    wanted = list(by_name) if columns is None else list(columns)
+    missing = [c for c in wanted if c not in by_name]
+    if missing:
+        raise KeyError(f"Columns not in store {path.name}: {missing}")
+
+    base = data_dir(path, manifest)
+    return {c: np.load(base / by_name[c]["file"], mmap_mode="r") for c in wanted}
+
+
+def read_frame(path: Path, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Load a store as a DataFrame shaped like ``pd.read_csv`` of the legacy
+    CSV: the saved index comes back as a leading column over a RangeIndex.
+    """
+    path = Path(path)
+    manifest = read_manifest(path)
+    idx = manifest["index"]
+
+    by_name = {c["name"]: c for c in manifest["columns"]}
+    wanted = list(by_name) if columns is None else list(columns)
+    missing = [c for c in wanted if c not in by_name]
+    if missing:
+        raise KeyError(f"Columns not in store {path.name}: {missing}")
+
+    # One manifest read for index and columns, so both come from the same version
+    base = data_dir(path, manifest)
+    data: Dict[str, Any] = {idx["name"]: np.load(base / idx["file"], mmap_mode="r")}
+    data.update({c: np.load(base / by_name[c]["file"], mmap_mode="r") for c in wanted})
+    return pd.DataFrame(data)
+
+
+def load_frame(path: Path, columns: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """
+    Read a backtest series from either a columnar store or a legacy CSV.
+    """
+    path = Path(path)
+    if is_store(path):
+        return read_frame(path, columns)
+    df = pd.read_csv(path)
+    return df if columns is None else df[list(columns)]
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from strategies.price_store import data_dir, is_store, manifest_path, read_manifest
+
+
+# --- Input fingerprint ----------------------------------------------
+
+# (resolved path, mtime_ns, size) -> sha256, so a sweep hashes its input once
+_FINGERPRINTS: Dict[Tuple[str, int, int], str] = {}
+_FP_LOCK = threading.Lock()
+
+
+def _hash_files(paths: Iterable[Path], head: bytes = b"") -> str:
+    h = hashlib.sha256(head)
+    for p in paths:
+        with p.open("rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+    return h.hexdigest()
+
+
+def data_fingerprint(path: Path) -> str:
+    """
+    Content hash of a price input (CSV file or columnar .store dir).
+
+    Keyed on content rather than mtime, so re-downloading identical data
+    doesn't invalidate earlier results.
+    """
+    path = Path(path).resolve()
+    stat_target = manifest_path(path) if is_store(path) else path
+    st = stat_target.stat()
+    key = (str(path), st.st_mtime_ns, st.st_size)
+
+    with _FP_LOCK:
+        if key in _FINGERPRINTS:
+            return _FINGERPRINTS[key]
+
+    if is_store(path):
+        manifest = read_manifest(path)
+        columns = [data_dir(path, manifest) / c["file"] for c in manifest["columns"]]
+        if manifest.get("dir"):
+            # The version dir name changes on every write; hash only content
+            head = json.dumps({k: v for k, v in manifest.items() if k != "dir"}, sort_keys=True).encode("utf-8")
+            fp = _hash_files(columns, head)
+        else:
+            fp = _hash_files([manifest_path(path)] + columns)
+    else:
+        fp = _hash_files([path])
+
+    with _FP_LOCK:
+        _FINGERPRINTS[key] = fp
+    return fp
+
+
+# --- Result index ---------------------------------------------------
+
+def params_key(params: Dict[str, Any]) -> str:
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class ResultIndex:
+    """
+    Append-only JSONL index of finished runs, keyed by
+    (strategy, params, data fingerprint, variant). The variant names how
+    the run's outputs were written (e.g. per-run file mode and score), so
+    callers sharing an index file but writing different artifacts don't
+    claim each other's runs; records without one have variant "".
+
+    Every record is flushed and fsync'd as it is written, so a sweep that
+    is killed mid-grid loses at most the combos still in flight; a torn
+    last line from a crash is skipped on load. Later records for the same
+    key win.
+
+    Record shape:
+
+        {"strategy": "sma_cross", "params": {"fast": 10, "slow": 100},
+         "data": "<sha256>", "variant": "...", "metrics": {...},
+         "run_file": "...", "created_at": "..."}
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._records: Dict[Tuple[str, str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._torn_tail = False
+        self._load()
+
+    def _load(self) -> None:
+        if not self.path.exists():
+            return
+        with self.path.open("rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell():
+                f.seek(-1, os.SEEK_END)
+                # Crash mid-write: start the next append on a fresh line
+                self._torn_tail = f.read(1) != b"\n"
+        with self.path.open("r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                    key = self._key(rec)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self._records[key] = rec
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    @staticmethod
+    def _key(rec: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        return rec["strategy"], params_key(rec["params"]), rec["data"], rec.get("variant") or ""
+
+    def get(self, strategy: str, params: Dict[str, Any], data: str, variant: str = "") -> Optional[Dict[str, Any]]:
+        return self._records.get((strategy, params_key(params), data, variant))
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> None:
+        """
+        Append finished runs; each needs strategy, params, data and metrics.
+        """
+        now = datetime.now(timezone.utc).isoformat()
+        lines: List[str] = []
+        with self._lock:
+            for rec in records:
+                rec = dict(rec)
+                rec.setdefault("created_at", now)
+                self._records[self._key(rec)] = rec
+                lines.append(json.dumps(rec, separators=(",", ":")))
+
+            if not lines:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a", encoding="utf-8") as f:
+                if self._torn_tail:
+                    f.write("\n")
+                    self._torn_tail = False
+                f.write("\n".join(lines) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def records(self, strategy: Optional[str] = None, data: Optional[str] = None) -> List[Dict[str, Any]]:
+        return [
+            r for (s, _, d, _v), r in self._records.items()
+            if (strategy is None or s == strategy) and (data is None or d == data)
+        ]
@@ -1,13 +1,15 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Callable, Dict, Any, List
+from typing import Callable, Dict, Any, Iterable, List
 
 import json
 import pandas as pd
 import numpy as np
 
+from strategies.price_cache import load_prices
+
 
 # --- Paths ----------------------------------------------------------
 
@@ -16,6 +18,9 @@ DATA_DIR = ROOT / "data" / "backtests"
 MULTI_DIR = DATA_DIR / "multi"
 MULTI_DIR.mkdir(parents=True, exist_ok=True)
 
+# Append-only index of finished grid runs (see result_index.ResultIndex)
+INDEX_JSONL = MULTI_DIR / "sma_cross_index.jsonl"
+
 # Pick one of your existing CSVs as the demo series
 DEMO_CSV = DATA_DIR / "SPY_SMA50-200_20251114-185715.csv"
 
@@ -64,17 +69,16 @@ def sma_cross_strategy(df: pd.DataFrame, params: Dict[str, Any]) -> StrategyResu
     slow = int(params.get("slow", 200))
 
     # --- Clean up the input frame ---------------------------------
-    # Work on a copy so we don't mutate callers
-    df = df.copy()
+    # Only the price column is touched, so callers' frames are never mutated
+    prices = df["price"]
 
-    # Coerce 'price' to numeric; anything non-numeric (e.g. "SPY") becomes NaN
-    df["price"] = pd.to_numeric(df["price"], errors="coerce")
+    # Coerce 'price' to numeric; anything non-numeric (e.g. "SPY") becomes NaN.
+    # Frames built from the price cache are already float64, so skip the parse.
+    if not pd.api.types.is_float_dtype(prices):
+        prices = pd.to_numeric(prices, errors="coerce")
 
     # Drop rows where price is missing / non-numeric (this kills the Ticker,SPY row)
-    df = df.dropna(subset=["price"])
-
-    # Now we are guaranteed price is float-compatible
-    prices = df["price"].astype(float)
+    prices = prices.dropna().astype(float)
 
     # --- SMA computation ------------------------------------------
     fast_ma = prices.rolling(window=fast, min_periods=fast).mean()
@@ -114,13 +118,173 @@ def sma_cross_strategy(df: pd.DataFrame, params: Dict[str, Any]) -> StrategyResu
     )
 
 
+# --- Batched SMA sweep ------------------------------------------------
+
+# Upper bound on the (combos x bars) float64 block evaluated at once.
+SWEEP_BLOCK_BYTES = 64 * 1024 * 1024
 
 
+def _moving_averages(prices: np.ndarray, windows: Iterable[int]) -> Dict[int, np.ndarray]:
+    """
+    Simple moving average for every distinct window, all taken from one
+    shared cumulative-sum array.
+
+    Bars before a window is full are NaN, same as
+    ``rolling(window, min_periods=window).mean()``.
+    """
+    n = len(prices)
+    csum = np.concatenate(([0.0], np.cumsum(prices)))
+    out: Dict[int, np.ndarray] = {}
+    for w in sorted(set(int(w) for w in windows)):
+        if w < 1:
+            raise ValueError(f"SMA window must be >= 1, got {w}")
+        ma = np.full(n, np.nan)
+        if w <= n:
+            ma[w - 1:] = (csum[w:] - csum[:-w]) / w
+        out[w] = ma
+    return out
+
+
+def _cross_returns(fast_ma: np.ndarray, slow_ma: np.ndarray, ret: np.ndarray) -> np.ndarray:
+    """
+    Strategy returns for one or many crossover pairs (last axis = bars).
+
+    Same rules as ``sma_cross_strategy``: +1 / -1 / 0 on fast vs slow,
+    entered at the next bar. NaN comparisons are False, so the warm-up
+    period is flat.
+    """
+    raw = (fast_ma > slow_ma).astype(np.int8) - (fast_ma < slow_ma).astype(np.int8)
+    signal = np.zeros(raw.shape, dtype=np.float64)
+    signal[..., 1:] = raw[..., :-1]
+    return signal * ret
+
+
+@dataclass
+class SweepResult:
+    """
+    Metrics for a whole fast x slow grid, as 2-D arrays indexed
+    ``[i_fast, j_slow]``. The moving averages are kept so a single
+    equity curve can be rebuilt in O(bars) without re-running anything.
+    """
+
+    fast: np.ndarray
+    slow: np.ndarray
+    total_return: np.ndarray
+    vol_annual: np.ndarray
+    sharpe: np.ndarray
+    prices: np.ndarray = field(repr=False)
+    moving_averages: Dict[int, np.ndarray] = field(repr=False)
+
+    def _index(self, fast: int, slow: int) -> tuple[int, int]:
+        i = np.flatnonzero(self.fast == fast)
+        j = np.flatnonzero(self.slow == slow)
+        if not len(i) or not len(j):
+            raise KeyError(f"(fast={fast}, slow={slow}) not in sweep grid")
+        return int(i[0]), int(j[0])
+
+    def equity_curve(self, fast: int, slow: int) -> np.ndarray:
+        ret = np.zeros(len(self.prices))
+        ret[1:] = self.prices[1:] / self.prices[:-1] - 1.0
+        strat_ret = _cross_returns(
+            self.moving_averages[int(fast)], self.moving_averages[int(slow)], ret
+        )
+        return np.cumprod(1.0 + strat_ret)
+
+    def result(self, fast: int, slow: int, include_equity: bool = True) -> StrategyResult:
+        """
+        The StrategyResult ``sma_cross_strategy`` would have returned
+        for this pair. With include_equity=False the (comparatively large)
+        equity_curve list is left empty; use equity_curve() for the array.
+        """
+        i, j = self._index(fast, slow)
+        fast, slow = int(fast), int(slow)
+        metrics = {
+            "total_return": float(self.total_return[i, j]),
+            "vol_annual": float(self.vol_annual[i, j]),
+            "sharpe": float(self.sharpe[i, j]),
+            "fast": fast,
+            "slow": slow,
+        }
+        return StrategyResult(
+            name="sma_cross",
+            params={"fast": fast, "slow": slow},
+            equity_curve=self.equity_curve(fast, slow).tolist() if include_equity else [],
+            trades=[],
+            metrics=metrics,
+        )
+
+
+def sma_cross_sweep(
+    prices: np.ndarray,
+    fast_list: Iterable[int],
+    slow_list: Iterable[int],
+    block_bytes: int = SWEEP_BLOCK_BYTES,
+) -> SweepResult:
+    """
+    Evaluate SMA crossover for every (fast, slow) pair in one batched pass.
+
+    Each distinct window's moving average is computed once; the grid is
+    then evaluated as a (combos x bars) matrix of signals and returns,
+    in blocks of at most ``block_bytes`` so large grids stay bounded in
+    memory. Metrics match ``sma_cross_strategy`` for the same pair.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    fast_arr = np.asarray([int(f) for f in fast_list], dtype=np.int64)
+    slow_arr = np.asarray([int(s) for s in slow_list], dtype=np.int64)
+    n_fast, n_slow, n = len(fast_arr), len(slow_arr), len(prices)
+
+    mas = _moving_averages(prices, np.concatenate([fast_arr, slow_arr]))
+    windows = sorted(mas)
+    ma_matrix = np.vstack([mas[w] for w in windows]) if windows else np.empty((0, n))
+    row_of = {w: k for k, w in enumerate(windows)}
+
+    ret = np.zeros(n)
+    if n > 1:
+        ret[1:] = prices[1:] / prices[:-1] - 1.0
+
+    # Flattened combo list, fast-major like the nested loops it replaces
+    fi = np.repeat(np.arange(n_fast), n_slow)
+    si = np.tile(np.arange(n_slow), n_fast)
+    fast_rows = np.asarray([row_of[int(w)] for w in fast_arr], dtype=np.int64)[fi]
+    slow_rows = np.asarray([row_of[int(w)] for w in slow_arr], dtype=np.int64)[si]
+
+    n_combos = len(fi)
+    total_return = np.zeros(n_combos)
+    vol_annual = np.zeros(n_combos)
+    sharpe = np.zeros(n_combos)
+
+    block = max(1, int(block_bytes // max(1, n * 8)))
+    for lo in range(0, n_combos, block):
+        hi = min(lo + block, n_combos)
+        strat_ret = _cross_returns(ma_matrix[fast_rows[lo:hi]], ma_matrix[slow_rows[lo:hi]], ret)
+
+        total_return[lo:hi] = np.prod(1.0 + strat_ret, axis=1) - 1.0 if n else 0.0
+        if n > 1:
+            vol = strat_ret.std(axis=1, ddof=1) * (252 ** 0.5)
+            mean = strat_ret.mean(axis=1)
+            vol_annual[lo:hi] = vol
+            with np.errstate(divide="ignore", invalid="ignore"):
+                sharpe[lo:hi] = np.where(vol > 0, (mean * 252) / vol, 0.0)
+
+    shape = (n_fast, n_slow)
+    return SweepResult(
+        fast=fast_arr,
+        slow=slow_arr,
+        total_return=total_return.reshape(shape),
+        vol_annual=vol_annual.reshape(shape),
+        sharpe=sharpe.reshape(shape),
+        prices=prices,
+        moving_averages=mas,
+    )
+
 
 # --- Strategy registry ---
 
+from strategies.event_engine import sma_cross_event  # bar-by-bar; also for intraday / live
+
 STRATEGIES = {
     "sma_cross": sma_cross_strategy,
+    "sma_cross_event": sma_cross_event,
 }
 
 # --- Run a strategy on a CSV file ---
@@ -128,14 +292,24 @@ STRATEGIES = {
 def run_strategy_on_csv(csv_path: Path, strat_name: str, params: Dict[str, Any]) -> StrategyResult:
     """
     Load a CSV (with 'price' column), run the chosen strategy, and return StrategyResult.
-    """
-    df = pd.read_csv(csv_path)
-
-    if "price" not in df.columns:
-        raise ValueError(f"CSV missing 'price' column: {csv_path}")
 
+    Prices come from the process-wide cache, so repeated runs on the same
+    file skip CSV parsing entirely.
+    """
     strat_fn = STRATEGIES.get(strat_name)
     if strat_fn is None:
         raise ValueError(f"Unknown strategy: {strat_name}")
 
+    df = pd.DataFrame({"price": load_prices(csv_path)})
     return strat_fn(df, params)
+
+
+def run_sma_sweep_on_csv(
+    csv_path: Path,
+    fast_list: Iterable[int],
+    slow_list: Iterable[int],
+) -> SweepResult:
+    """
+    Load a CSV (with 'price' column) once and sweep the whole fast x slow grid.
+    """
+    return sma_cross_sweep(load_prices(csv_path), fast_list, slow_list)
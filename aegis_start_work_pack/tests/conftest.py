@@ -0,0 +1,14 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Same bootstrap the scripts use: the pack root is the import root
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+# The servers open their run registry at import; keep it out of the tree
+_RUNS = tempfile.mkdtemp(prefix="aegis-test-runs-")
+os.environ.setdefault("AEGIS_RUNS_DIR", _RUNS)
+os.environ.setdefault("AEGIS_RUNS_DB", str(Path(_RUNS) / "registry.db"))
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi.testclient import TestClient
+
+import chat.backtest_server as server
+import chat.run_backtest as rb
+from strategies.market_data import CsvProvider, MarketDataStore
+from strategies.price_store import is_store, read_frame
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    dates = pd.bdate_range("2023-01-02", "2023-12-29")
+    rng = np.random.default_rng(11)
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, len(dates))))
+    pd.DataFrame({"Close": close}, index=dates).to_csv(tmp_path / "SPY.csv")
+    store = MarketDataStore(tmp_path / "market", CsvProvider(tmp_path))
+    monkeypatch.setattr(rb, "default_store", lambda: store)
+    monkeypatch.setattr(server, "load_cfg", lambda: {"execution": "inprocess", "logs_dir": str(tmp_path / "logs")})
+    return TestClient(server.app)
+
+
+BODY = {"symbol": "SPY", "start": "2023-01-01", "end": "2024-01-01", "fast": 5, "slow": 20}
+
+
+def test_run_backtest_inprocess_writes_a_store(client, tmp_path):
+    out = client.post("/run_backtest", json=BODY).json()
+    assert out["exit_code"] == 0 and out["execution"] == "inprocess"
+    assert f"CSV_PATH::{out['csv_path']}" in out["stdout"]
+    assert is_store(out["csv_path"]) and str(tmp_path / "logs") in out["csv_path"]
+
+    # Same numbers as running the script's steps by hand
+    df = rb.sma_crossover(rb.load_prices("SPY", BODY["start"], BODY["end"]), 5, 20)
+    assert out["stats"] == rb.summarize(df)
+    assert np.allclose(read_frame(out["csv_path"])["equity"], df["equity"])
+
+
+def test_identical_runs_get_distinct_outputs(client):
+    paths = {client.post("/run_backtest", json=BODY).json()["csv_path"] for _ in range(3)}
+    assert len(paths) == 3
+
+
+def test_bad_windows_are_a_client_error(client):
+    out = client.post("/run_backtest", json={**BODY, "fast": 20, "slow": 5}).json()
+    assert out["exit_code"] == 2 and out["csv_path"] is None
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+import chat.orchestrator_stub as stub
+from chat import fake_ollama
+from chat.tool_cache import ToolResultCache
+from chat.tool_stream import ToolCallDetector
+
+
+TOOL_JSON = json.dumps({"tool": "backtest.run", "args": {"symbol": "SPY", "start": "2020-01-01", "end": "2024-01-01"}})
+
+
+def _events(body):
+    out = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+        out.append((lines["event"], json.loads(lines["data"])))
+    return out
+
+
+@pytest.fixture
+def ollama(tmp_path, monkeypatch):
+    servers = []
+
+    def start(reply, path="/api/chat", **kw):
+        server = fake_ollama.serve(port=0, reply=reply, delay=0, background=True, **kw)
+        servers.append(server)
+        monkeypatch.setattr(stub, "OLLAMA_URL", f"http://127.0.0.1:{server.server_address[1]}{path}")
+
+    async def fake_backtest(args):
+        return {"symbol": args.symbol, "total_return": 0.1}
+
+    monkeypatch.setattr(stub, "tool_backtest", fake_backtest)
+    monkeypatch.setattr(stub, "TOOL_CACHE", ToolResultCache(disk_dir=tmp_path / "tool_cache"))
+    monkeypatch.setattr(stub, "search_chunks", lambda query, k=6: [])
+    yield start
+    for server in servers:
+        server.shutdown()
+
+
+def _stream(message="how did SPY do?"):
+    with TestClient(stub.app) as client:
+        r = client.post("/chat", json={"message": message, "stream": True}, headers={"X-Client-Id": "stream-test"})
+        assert r.status_code == 200
+        return _events(r.text)
+
+
+def test_detector_holds_back_a_tool_call_split_across_tokens():
+    det = ToolCallDetector()
+    pieces = ["Sure. ", '{"to', 'ol": "backtest.run", "args": {"note": "a } b"', ", \"fast\": 5}", "} trailing"]
+    shown, call = [], None
+    for p in pieces:
+        text, call = det.feed(p)
+        shown.append(text)
+        if call is not None:
+            break
+    assert "".join(shown) == "Sure. "
+    assert call == {"tool": "backtest.run", "args": {"note": "a } b", "fast": 5}}
+
+
+def test_detector_releases_json_that_is_not_a_tool_call():
+    det = ToolCallDetector()
+    text, call = det.feed('quoting {"a": 1} here')
+    assert (text, call) == ('quoting {"a": 1} here', None)
+
+
+def test_stream_dispatches_tool_call_split_across_chunks(ollama):
+    ollama("Running it now. " + TOOL_JSON + " and then more text")
+    events = _stream()
+    kinds = [k for k, _ in events]
+    assert kinds[-3:] == ["tool_call", "tool_result", "done"]
+    assert "".join(d["text"] for k, d in events if k == "token") == "Running it now. "
+    assert events[-3][1]["tool"] == "backtest.run"
+    assert events[-2][1]["result"]["symbol"] == "SPY"
+
+
+def test_stream_plain_text(ollama):
+    ollama(fake_ollama.DEFAULT_REPLY)
+    events = _stream()
+    assert [k for k, _ in events].count("token") > 3
+    assert events[-1] == ("done", {"answer": fake_ollama.DEFAULT_REPLY})
+
+
+def test_stream_upstream_http_error(ollama):
+    ollama("unused", path="/api/missing")
+    events = _stream()
+    assert events[-1][0] == "error" and events[-1][1]["status"] == 404
+
+
+def test_stream_truncated_ndjson_line_is_an_error_event(ollama):
+    ollama(fake_ollama.DEFAULT_REPLY, truncate=3)
+    events = _stream()
+    assert [k for k, _ in events] == ["token", "token", "token", "error"]
+    assert events[-1][1]["status"] == 502 and "bad chunk" in events[-1][1]["detail"]
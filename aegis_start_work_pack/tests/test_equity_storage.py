@@ -0,0 +1,48 @@
+import json
+
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+
+import chat.backtest_server as server
+from strategies.parallel_grid import equity_path, run_json_path, run_sma_cross_grid_parallel
+from strategies.price_store import write_frame
+
+
+def test_run_json_references_a_binary_equity_curve(tmp_path):
+    rng = np.random.default_rng(2)
+    csv = tmp_path / "SPY.csv"
+    pd.DataFrame({"price": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 200)))}).to_csv(csv, index=False)
+    run_sma_cross_grid_parallel(csv, [5], [20], out_dir=tmp_path, workers=1)
+
+    meta = json.loads(run_json_path(tmp_path, 5, 20).read_text())
+    assert "equity_curve" not in meta
+    assert meta["equity"] == {"file": equity_path(tmp_path, 5, 20).name, "dtype": "float64", "length": 200}
+    curve = server._open_equity(run_json_path(tmp_path, 5, 20))
+    assert isinstance(curve, np.memmap) and len(curve) == 200
+    assert np.array_equal(curve, np.load(equity_path(tmp_path, 5, 20)))
+
+
+def test_open_equity_reads_every_source(tmp_path):
+    values = np.linspace(1.0, 2.0, 7)
+    (tmp_path / "legacy.json").write_text(json.dumps({"equity_curve": values.tolist()}))
+    write_frame(pd.DataFrame({"price": values, "equity": values}), tmp_path / "run.store")
+    pd.DataFrame({"equity": values}).to_csv(tmp_path / "run.csv", index=False)
+    np.save(tmp_path / "run.equity.npy", values)
+
+    for name in ("legacy.json", "run.store", "run.csv", "run.equity.npy"):
+        assert np.allclose(server._open_equity(tmp_path / name), values), name
+
+
+def test_downsample_keeps_first_and_last_bar():
+    values = np.arange(1000.0)
+    out = server._downsample(values, 10)
+    assert len(out) == 10 and out[0] == 0.0 and out[-1] == 999.0
+    assert server._downsample(values, None) is values
+    assert server._downsample(values, 1).tolist() == [999.0]
+
+
+def test_equity_endpoint_stays_under_data_backtests(tmp_path):
+    np.save(tmp_path / "run.equity.npy", np.ones(3))
+    r = TestClient(server.app).get("/equity", params={"path": str(tmp_path / "run.equity.npy")})
+    assert r.status_code == 404
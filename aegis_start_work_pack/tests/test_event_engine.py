@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies.event_engine import EventEngine, EventStrategy, SmaCrossEvent, sma_cross_event
+from strategies.strategy_engine import sma_cross_strategy
+
+
+def _prices(n=600, seed=7):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"price": 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))})
+
+
+def test_event_strategy_must_implement_on_bar():
+    class NoRule(EventStrategy):
+        pass
+
+    with pytest.raises(TypeError):
+        NoRule()
+
+
+def test_event_engine_matches_sma_cross_strategy():
+    df = _prices()
+    params = {"fast": 10, "slow": 50}
+    ref = np.asarray(sma_cross_strategy(df, params).equity_curve)
+    res = sma_cross_event(df, params)
+    assert np.allclose(res.equity_curve, ref, rtol=0, atol=1e-13)
+    assert res.metrics["total_return"] == pytest.approx(ref[-1] - 1.0, abs=1e-12)
+
+
+def test_bar_by_bar_equals_batch_run():
+    px = _prices(300).price.to_numpy()
+    batch = EventEngine(SmaCrossEvent(5, 20)).run(px)
+    live = EventEngine(SmaCrossEvent(5, 20), capacity=1)
+    curve = [live.on_bar(p) for p in px]
+    assert np.array_equal(curve, batch)
@@ -0,0 +1,101 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+SRC = Path(__file__).resolve().parents[2] / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+import features.build_features as bf  # noqa: E402
+from data_pipeline.ingest import write_partitions  # noqa: E402
+
+
+def _panel(nan="any", t=300, n=4, seed=9):
+    rng = np.random.default_rng(seed)
+    x = 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, (t, n)), axis=0))
+    x[:40, 1] = np.nan                  # late listing
+    if nan == "any":
+        x[100:103, 2] = np.nan          # missing bars mid-series
+    return pd.DataFrame(x, index=pd.bdate_range("2020-01-01", periods=t), columns=list("ABCD")[:n])
+
+
+def _close(got, want):
+    want = want.to_numpy()
+    assert np.array_equal(np.isnan(got), np.isnan(want))
+    assert np.allclose(got[~np.isnan(got)], want[~np.isnan(want)], rtol=1e-9, atol=1e-10)
+
+
+@pytest.mark.parametrize("nan", [None, "lead", "any"])
+@pytest.mark.parametrize("w", [1, 5, 20])
+def test_kernels_match_pandas(nan, w):
+    df = _panel(nan)
+    if nan is None:
+        df = df.fillna(100.0)
+    x = df.to_numpy()
+    ret1 = df / df.shift(1) - 1.0
+
+    _close(bf.rolling_mean(x, w), df.rolling(w, min_periods=w).mean())
+    _close(bf.ewma(x, w), df.ewm(span=w, adjust=False, ignore_na=True).mean().where(df.notna()))
+    _close(bf.pct_return(x, w), df / df.shift(w) - 1.0)
+    _close(bf.log_return(x, w), np.log(df / df.shift(w)))
+    if w > 1:
+        std = df.rolling(w, min_periods=w).std()
+        _close(bf.rolling_std(x, w), std)
+        _close(bf.rolling_vol(x, w), ret1.rolling(w, min_periods=w).std())
+        z = (df - df.rolling(w, min_periods=w).mean()) / std
+        _close(bf.zscore(x, w), z.where(np.isfinite(z)))
+
+
+def test_specs_are_parsed_and_deduplicated():
+    specs = bf.parse_specs(["sma:20", bf.FeatureSpec("sma", 20), "EMA:12"])
+    assert [s.name for s in specs] == ["sma_20", "ema_12"]
+    for bad in ("sma", "nope:3", "sma:0"):
+        with pytest.raises(ValueError):
+            bf.parse_spec(bad)
+
+
+def _ingest(root, panel):
+    for sym in panel.columns:
+        close = panel[sym].dropna()
+        bars = pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "adj_close": close,
+                             "volume": 1.0})
+        write_partitions(sym, bars, "1d", root)
+
+
+def test_prekey_hit_skips_reading_bars(tmp_path, monkeypatch):
+    bars, cache = tmp_path / "bars", tmp_path / "features"
+    panel = _panel("lead")
+    _ingest(bars, panel)
+    specs = ["sma:5", "zscore:20"]
+
+    first = bf.build_features(["A", "B"], features=specs, bars_root=bars, cache_dir=cache)
+    assert not first.cached
+    _close(first.values["sma_5"], panel[["A", "B"]].rolling(5, min_periods=5).mean())
+
+    def no_reads(*a, **kw):
+        raise AssertionError("pre-key hit must not load the panel")
+
+    monkeypatch.setattr(bf, "load_panel", no_reads)
+    assert bf.build_features(["A", "B"], features=specs, bars_root=bars, cache_dir=cache) is first
+
+    # A new bar rewrites a partition: the pre-key misses and the panel is read again
+    monkeypatch.undo()
+    extra = panel.iloc[-1:].copy()
+    extra.index = extra.index + pd.offsets.BDay(1)
+    _ingest(bars, extra[["A"]])
+    again = bf.build_features(["A", "B"], features=specs, bars_root=bars, cache_dir=cache)
+    assert again.key != first.key and len(again.index) == len(first.index) + 1
+
+
+def test_disk_cache_is_memory_mapped_on_reload(tmp_path, monkeypatch):
+    panel = _panel(None).fillna(50.0)
+    fs = bf.features_for_panel(panel, ["ret:1", "sma:10"], cache_dir=tmp_path)
+    monkeypatch.setattr(bf, "_MEM", {})
+    hit = bf.features_for_panel(panel, ["ret:1", "sma:10"], cache_dir=tmp_path)
+    assert hit.cached and hit.key == fs.key
+    assert isinstance(hit.values["sma_10"], np.memmap)
+    assert np.allclose(hit.panel("sma_10").to_numpy(), fs.values["sma_10"], equal_nan=True)
+    assert list(hit.frame("B").columns) == ["ret_1", "sma_10"]
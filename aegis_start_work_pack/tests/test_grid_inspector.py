@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from strategies.grid_inspector import load_index_table, load_legacy_table, rank
+from strategies.parallel_grid import run_sma_cross_grid_parallel
+from strategies.result_index import ResultIndex
+
+
+def _sweep(tmp_path, seed=1, name="SPY.csv"):
+    rng = np.random.default_rng(seed)
+    csv = tmp_path / name
+    pd.DataFrame({"price": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 300)))}).to_csv(csv, index=False)
+    run_sma_cross_grid_parallel(csv, [3, 5, 8, 13], [21, 34, 55], out_dir=tmp_path / "multi", workers=1,
+                                index=ResultIndex(tmp_path / "multi" / "index.jsonl"))
+
+
+def _by_pair(table):
+    return {(int(f), int(s)): (table["sharpe"][i], table["score"][i])
+            for i, (f, s) in enumerate(zip(table["fast"], table["slow"]))}
+
+
+def test_index_table_matches_per_run_files(tmp_path):
+    _sweep(tmp_path)
+    index = load_index_table(tmp_path / "multi" / "index.jsonl")
+    legacy = load_legacy_table(tmp_path / "multi")
+    assert len(index["fast"]) == 12
+    a, b = _by_pair(index), _by_pair(legacy)
+    assert a.keys() == b.keys()
+    for k in a:
+        assert np.allclose(a[k], b[k])
+
+
+def test_index_table_defaults_to_the_latest_input(tmp_path):
+    _sweep(tmp_path, seed=1, name="a.csv")
+    first = load_index_table(tmp_path / "multi" / "index.jsonl")
+    _sweep(tmp_path, seed=2, name="b.csv")
+    latest = load_index_table(tmp_path / "multi" / "index.jsonl")
+    assert not np.allclose(np.sort(first["sharpe"]), np.sort(latest["sharpe"]))
+    assert load_index_table(tmp_path / "multi" / "index.jsonl", data="zz") is None
+
+
+def test_rank_top_k_agrees_with_a_full_sort(tmp_path):
+    rng = np.random.default_rng(0)
+    n = 1000
+    table = {
+        "fast": np.arange(n), "slow": np.arange(n) + n,
+        "total_return": rng.normal(0, 0.2, n), "vol_annual": rng.uniform(0.05, 0.4, n),
+        "sharpe": rng.normal(0, 1, n),
+    }
+    table["score"] = table["sharpe"] * np.abs(table["total_return"])
+    table["score"][7] = np.nan
+
+    full = rank(table)
+    assert 7 not in full and len(full) == n - 1
+    assert np.all(np.diff(table["score"][full]) <= 0)
+    assert list(rank(table, top_k=10)) == list(full[:10])
+
+    picked = rank(table, min_sharpe=0.5, max_vol=0.2)
+    assert np.all(table["sharpe"][picked] >= 0.5) and np.all(table["vol_annual"][picked] <= 0.2)
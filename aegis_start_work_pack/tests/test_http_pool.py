@@ -0,0 +1,82 @@
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+import pytest
+
+from chat.http_pool import Upstream, UpstreamPool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive
+    peers = set()
+
+    def do_GET(self):
+        self.peers.add(self.client_address)
+        body = b"fail" if self.path == "/fail" else b"ok"
+        self.send_response(500 if self.path == "/fail" else 200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def upstream():
+    _Handler.peers = set()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_requests_share_keepalive_connections(upstream):
+    pool = UpstreamPool({"bt": Upstream("bt", base_url=upstream, max_connections=4, max_keepalive=4)})
+
+    async def main():
+        await pool.start()
+        client = pool.client("bt")
+        try:
+            for _ in range(10):
+                assert (await pool.get("bt", "/x")).text == "ok"
+            await asyncio.gather(*(pool.get("bt", "/x") for _ in range(20)))
+            assert pool.client("bt") is client
+            assert (await pool.get("bt", "/fail")).status_code == 500
+        finally:
+            await pool.close()
+        assert client.is_closed
+
+    asyncio.run(main())
+    st = pool.stats()["bt"]
+    assert st["requests"] == 31 and st["errors"] == 0 and st["in_flight"] == 0
+    assert 1 <= st["peak_in_flight"] <= 20
+    # 31 requests over at most max_connections sockets
+    assert len(_Handler.peers) <= 4
+
+
+def test_transport_errors_are_counted():
+    pool = UpstreamPool({"down": Upstream("down", base_url="http://127.0.0.1:9", connect_timeout=1)})
+
+    async def main():
+        with pytest.raises(httpx.HTTPError):
+            await pool.get("down", "/x")
+        await pool.close()
+
+    asyncio.run(main())
+    st = pool.stats()["down"]
+    assert st["errors"] == 1 and st["last_error"] and st["in_flight"] == 0
+
+
+def test_client_is_created_lazily_outside_the_lifespan(upstream):
+    pool = UpstreamPool({"bt": Upstream("bt", base_url=upstream)})
+
+    async def main():
+        r = await pool.post("bt", "/x")
+        await pool.close()
+        return r.status_code
+
+    assert asyncio.run(main()) == 501   # BaseHTTPRequestHandler has no do_POST
@@ -0,0 +1,93 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# src/ stages import each other as top-level packages (data_pipeline, features)
+SRC = Path(__file__).resolve().parents[2] / "src"
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from data_pipeline.ingest import last_bar_date, read_bars, run_ingest, symbol_dir, validate_bars  # noqa: E402
+from strategies.market_data import CsvProvider  # noqa: E402
+
+
+def _bars(dates, base=100.0):
+    close = base + np.arange(len(dates), dtype=float)
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1, "Close": close,
+                         "Volume": 1000.0}, index=pd.DatetimeIndex(dates, name="date"))
+
+
+class RecordingProvider(CsvProvider):
+    def __init__(self, root):
+        super().__init__(root)
+        self.starts = []
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        self.starts.append((symbol, start))
+        return super().fetch(symbol, start, end, interval)
+
+
+def _provider(tmp_path, end="2024-03-29"):
+    src = tmp_path / "bars"
+    src.mkdir(exist_ok=True)
+    dates = pd.bdate_range("2023-11-01", end)
+    _bars(dates).to_csv(src / "AAA.csv")
+    bad = _bars(dates, 50.0)
+    bad.iloc[3, bad.columns.get_loc("High")] = 10.0     # high below low
+    bad.to_csv(src / "BBB.csv")
+    return RecordingProvider(src)
+
+
+def test_ingest_partitions_by_year_and_validates(tmp_path):
+    out = tmp_path / "lake"
+    report = run_ingest(["aaa", "BBB", "ZZZ"], "2023-11-01", "2024-02-01", provider=_provider(tmp_path),
+                        out_dir=out, workers=2)
+
+    assert report.ok and [r.symbol for r in report.symbols] == ["AAA", "BBB", "ZZZ"]
+    aaa, bbb, zzz = report.symbols
+    assert aaa.partitions == 2 and aaa.rows == len(pd.bdate_range("2023-11-01", "2024-01-31"))
+    assert bbb.rows == aaa.rows - 1 and bbb.dropped == {"high_below_low": 1}
+    assert zzz.rows == 0 and zzz.partitions == 0
+    parts = sorted(p.parent.name for p in symbol_dir("AAA", "1d", out).glob("*/part.parquet"))
+    assert parts == ["year=2023", "year=2024"]
+
+    # Only the 2024 partition overlaps; bounds are [start, end)
+    jan = read_bars("AAA", "2024-01-02", "2024-01-05", root=out)
+    assert list(jan.index.strftime("%d")) == ["02", "03", "04"]
+
+
+def test_ingest_resumes_from_the_last_stored_bar(tmp_path):
+    out = tmp_path / "lake"
+    provider = _provider(tmp_path)
+    run_ingest(["AAA"], "2023-11-01", "2024-01-10", provider=provider, out_dir=out)
+    assert last_bar_date("AAA", root=out) == pd.Timestamp("2024-01-09")
+
+    provider.starts.clear()
+    report = run_ingest(["AAA"], None, "2024-02-01", provider=provider, out_dir=out)
+    assert provider.starts == [("AAA", pd.Timestamp("2024-01-09"))]
+    assert report.symbols[0].rows == len(pd.bdate_range("2024-01-09", "2024-01-31"))
+
+    stored = read_bars("AAA", root=out)
+    assert not stored.index.duplicated().any()
+    assert len(stored) == len(pd.bdate_range("2023-11-01", "2024-01-31"))
+
+
+def test_intraday_bars_are_partitioned_by_day(tmp_path):
+    src = tmp_path / "bars"
+    src.mkdir()
+    idx = pd.date_range("2024-01-02 09:30", periods=4, freq="5min").append(
+        pd.date_range("2024-01-03 09:30", periods=4, freq="5min"))
+    _bars(idx).to_csv(src / "AAA_5m.csv")
+    out = tmp_path / "lake"
+    report = run_ingest(["AAA"], "2024-01-01", "2024-01-04", interval="5m", provider=CsvProvider(src), out_dir=out)
+    assert report.symbols[0].partitions == 2
+    assert len(read_bars("AAA", "2024-01-03", "2024-01-04", interval="5m", root=out)) == 4
+
+
+def test_validate_rejects_frames_without_ohlc():
+    df = pd.DataFrame({"close": [1.0]}, index=pd.DatetimeIndex(["2024-01-02"]))
+    with pytest.raises(ValueError, match="missing columns"):
+        validate_bars(df)
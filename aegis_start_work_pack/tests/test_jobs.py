@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import chat.backtest_server as server
+from chat.jobs import CANCELLED, COMPLETE, FAILED, QUEUED, JobQueue, QueueFull
+
+
+def _wait(job, timeout=5.0):
+    if not job.future.cancelled():
+        job.future.result(timeout=timeout)
+    return job
+
+
+def test_queue_full_cancel_and_results():
+    gate = threading.Event()
+    started = threading.Event()
+
+    def slow(x):
+        started.set()
+        gate.wait(5)
+        return x * 2
+
+    q = JobQueue(max_workers=1, max_queue=1)
+    try:
+        running = q.submit("slow", slow, {"x": 1})
+        assert started.wait(5)
+        queued = q.submit("slow", slow, {"x": 2})
+        assert queued.status == QUEUED
+        with pytest.raises(QueueFull):
+            q.submit("slow", slow, {"x": 3})
+
+        # Queued: cancelled outright, which frees its slot
+        assert q.cancel(queued.job_id).status == CANCELLED
+        ok = q.submit("slow", slow, {"x": 4})
+        # Running: flagged, result discarded when it returns
+        assert q.cancel(running.job_id).cancel_requested
+        gate.set()
+        assert _wait(running).status == CANCELLED and running.result is None
+        assert _wait(ok).status == COMPLETE and ok.result == 8
+        assert [e for _, e, _ in ok.feed.since(0)[0]] == ["status", "status", "done"]
+    finally:
+        gate.set()
+        q.shutdown()
+
+
+def test_failures_are_recorded():
+    q = JobQueue(max_workers=1)
+    try:
+        job = _wait(q.submit("boom", lambda: 1 / 0, {}))
+        assert job.status == FAILED and "ZeroDivisionError" in job.error
+    finally:
+        q.shutdown()
+
+
+def test_jobs_endpoint_answers_429_when_full(monkeypatch):
+    gate, started = threading.Event(), threading.Event()
+
+    def fake_run(**kw):
+        started.set()
+        gate.wait(5)
+        return kw["symbol"]
+
+    q = JobQueue(max_workers=1, max_queue=1)
+    monkeypatch.setattr(server, "_JOBS", q)
+    monkeypatch.setitem(server.JOB_KINDS, "run_backtest", fake_run)
+    body = {"request": {"symbol": "SPY", "start": "2020-01-01", "end": "2021-01-01", "fast": 5, "slow": 20}}
+    client = TestClient(server.app)
+    try:
+        first = client.post("/jobs", json=body)
+        assert first.status_code == 202 and started.wait(5)
+        job_id = first.json()["job_id"]
+        assert client.post("/jobs", json=body).status_code == 202
+
+        r = client.post("/jobs", json=body)
+        assert r.status_code == 429 and r.headers["Retry-After"] == "5"
+        assert client.get(f"/jobs/{job_id}/result").status_code == 409
+
+        gate.set()
+        _wait(q.get(job_id))
+        assert client.get(f"/jobs/{job_id}/result").json()["result"] == "SPY"
+        assert client.delete("/jobs/nope").status_code == 404
+    finally:
+        gate.set()
+        q.shutdown()
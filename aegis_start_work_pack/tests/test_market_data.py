@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from strategies.market_data import CsvProvider, MarketDataStore, normalize_bars
+
+
+class FlakyProvider(CsvProvider):
+    """CsvProvider that answers with an empty frame while throttled."""
+
+    throttled = False
+
+    def fetch(self, symbol, start, end, interval="1d"):
+        if self.throttled:
+            self.fetch_calls += 1
+            return normalize_bars(None)
+        return super().fetch(symbol, start, end, interval)
+
+
+def _provider(tmp_path):
+    dates = pd.bdate_range("2024-01-01", "2024-03-29")
+    pd.DataFrame({"Close": np.linspace(100, 110, len(dates))}, index=dates).to_csv(tmp_path / "SPY.csv")
+    return FlakyProvider(tmp_path)
+
+
+def test_empty_fetch_does_not_mark_range_covered(tmp_path):
+    provider = _provider(tmp_path)
+    store = MarketDataStore(tmp_path / "market", provider)
+
+    provider.throttled = True
+    assert store.get("SPY", "2024-01-01", "2024-02-01").empty
+    assert store.get("SPY", "2024-01-01", "2024-02-01").empty
+    assert provider.fetch_calls == 2
+
+    provider.throttled = False
+    assert len(store.get("SPY", "2024-01-01", "2024-02-01")) == 23
+    assert provider.fetch_calls == 3
+
+    # Now covered: served from disk
+    assert len(store.get("SPY", "2024-01-01", "2024-02-01")) == 23
+    assert provider.fetch_calls == 3
+
+
+def test_range_without_weekdays_is_marked_covered(tmp_path):
+    provider = _provider(tmp_path)
+    store = MarketDataStore(tmp_path / "market", provider)
+    provider.throttled = True
+
+    # Saturday and Sunday
+    assert store.get("SPY", "2024-01-06", "2024-01-08").empty
+    assert store.get("SPY", "2024-01-06", "2024-01-08").empty
+    assert provider.fetch_calls == 1
+
+
+def _holiday_provider(tmp_path):
+    # Martin Luther King Jr. Day 2024 (a Monday) has no bars
+    dates = pd.bdate_range("2024-01-01", "2024-03-29").drop(pd.Timestamp("2024-01-15"))
+    pd.DataFrame({"Close": np.linspace(100, 110, len(dates))}, index=dates).to_csv(tmp_path / "SPY.csv")
+    return FlakyProvider(tmp_path)
+
+
+def test_holiday_gap_before_known_bars_is_marked_covered(tmp_path):
+    store = MarketDataStore(tmp_path / "market", _holiday_provider(tmp_path))
+    assert len(store.get("SPY", "2024-01-16", "2024-02-01")) == 12
+    assert store.get("SPY", "2024-01-15", "2024-01-16").empty
+    assert store.get("SPY", "2024-01-15", "2024-01-16").empty
+    assert store.fetches == 2
+
+
+def test_isolated_holiday_is_covered_on_second_empty_answer(tmp_path):
+    store = MarketDataStore(tmp_path / "market", _holiday_provider(tmp_path))
+    for _ in range(3):
+        assert store.get("SPY", "2024-01-15", "2024-01-16").empty
+    assert store.fetches == 2
+    assert len(store.get("SPY", "2024-01-12", "2024-01-17")) == 2
+    assert store.fetches == 4
@@ -0,0 +1,52 @@
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import chat.orchestrator_app as app_mod
+from chat.rate_limit import RateLimiter, spec_from_policy
+from chat.run_registry import RunRegistry
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_mod, "RUNS", RunRegistry(tmp_path / "registry.db"))
+    monkeypatch.setattr(app_mod, "RUNS_DIR", tmp_path)
+    monkeypatch.setattr(app_mod, "backtest_run", lambda strategy, symbols, params=None: {"sharpe": 1.0})
+    return app_mod
+
+
+def _limit(value):
+    return RateLimiter({"backtest.run": spec_from_policy("backtest.run", value, reserve=0.0)})
+
+
+def _wait(app, run_id, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        run = app.RUNS.get(run_id)
+        if run["status"] in ("COMPLETE", "FAILED"):
+            return run
+        time.sleep(0.05)
+    raise AssertionError(f"run {run_id} did not finish: {app.RUNS.get(run_id)}")
+
+
+def test_matrix_bigger_than_the_bucket_is_paced_not_refused(app, monkeypatch):
+    monkeypatch.setattr(app, "RATES", _limit({"rate": "20/second", "burst": 2}))
+    body = {"name": "grid", "symbols": ["SPY", "QQQ", "IWM"], "strategies": ["sma", "ema"], "timeframe": "1d"}
+    with TestClient(app.app) as client:
+        r = client.post("/multi-run", json=body)
+        assert r.status_code == 200
+        run = _wait(app, r.json()["run_id"])
+    assert run["status"] == "COMPLETE" and (run["total"], run["done"]) == (6, 6)
+    assert app.RATES.counters["allowed"] == 6
+
+
+def test_caller_out_of_tokens_gets_429_with_retry_after(app, monkeypatch):
+    monkeypatch.setattr(app, "RATES", _limit("1/hour"))
+    body = {"name": "one", "symbols": ["SPY"], "strategies": ["sma"], "timeframe": "1d"}
+    with TestClient(app.app) as client:
+        first = client.post("/multi-run", json=body)
+        assert first.status_code == 200
+        _wait(app, first.json()["run_id"])
+        r = client.post("/multi-run", json=body)
+    assert r.status_code == 429 and int(r.headers["Retry-After"]) > 3000
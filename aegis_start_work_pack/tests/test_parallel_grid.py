@@ -0,0 +1,47 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies.parallel_grid import equity_path, run_json_path, run_sma_cross_grid_parallel
+from strategies.strategy_engine import sma_cross_strategy
+
+
+FAST, SLOW = [5, 10, 20, 40], [20, 30, 60]
+
+
+def _csv(tmp_path):
+    rng = np.random.default_rng(5)
+    path = tmp_path / "SPY.csv"
+    pd.DataFrame({"price": 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))}).to_csv(path, index=False)
+    return path
+
+
+def test_process_pool_matches_serial_run(tmp_path):
+    csv = _csv(tmp_path)
+    seen = []
+    serial = run_sma_cross_grid_parallel(csv, FAST, SLOW, out_dir=tmp_path / "serial", workers=1)
+    pooled = run_sma_cross_grid_parallel(
+        csv, FAST, SLOW, out_dir=tmp_path / "pooled", workers=2, chunk_size=1,
+        progress=lambda row, done, total: seen.append((done, total)),
+    )
+
+    assert pooled == serial
+    assert [(r["fast"], r["slow"]) for r in serial] == [(f, s) for f in FAST for s in SLOW if f < s]
+    assert seen == [(i, len(serial)) for i in range(1, len(serial) + 1)]
+    for r in serial:
+        a = json.loads(run_json_path(tmp_path / "serial", r["fast"], r["slow"]).read_text())
+        b = json.loads(run_json_path(tmp_path / "pooled", r["fast"], r["slow"]).read_text())
+        assert a["metrics"] == b["metrics"]
+        assert np.array_equal(np.load(equity_path(tmp_path / "serial", r["fast"], r["slow"])),
+                              np.load(equity_path(tmp_path / "pooled", r["fast"], r["slow"])))
+
+
+def test_rows_match_sma_cross_strategy(tmp_path):
+    csv = _csv(tmp_path)
+    df = pd.read_csv(csv)
+    for row in run_sma_cross_grid_parallel(csv, FAST, SLOW, workers=1, per_run="none"):
+        ref = sma_cross_strategy(df, {"fast": row["fast"], "slow": row["slow"]}).metrics
+        assert row["sharpe"] == pytest.approx(ref["sharpe"], rel=1e-9, abs=1e-12)
+        assert row["total_return"] == pytest.approx(ref["total_return"], rel=1e-9, abs=1e-12)
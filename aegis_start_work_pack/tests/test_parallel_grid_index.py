@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from strategies.parallel_grid import equity_path, run_json_path, run_sma_cross_grid_parallel
+from strategies.result_index import ResultIndex, data_fingerprint
+
+
+def _csv(tmp_path):
+    rng = np.random.default_rng(0)
+    path = tmp_path / "SPY.csv"
+    pd.DataFrame({"price": 100 + np.cumsum(rng.normal(0, 1, 300))}).to_csv(path, index=False)
+    return path
+
+
+def _grid(csv, out_dir, index, per_run, score, skip_invalid, lines):
+    return run_sma_cross_grid_parallel(
+        csv, [5, 10], [20, 30], out_dir=out_dir, workers=1,
+        per_run=per_run, score=score, skip_invalid=skip_invalid,
+        index=index, log=lines.append,
+    )
+
+
+def test_row_and_full_runners_do_not_share_index_hits(tmp_path):
+    csv, out_dir = _csv(tmp_path), tmp_path / "multi"
+    index = ResultIndex(tmp_path / "index.jsonl")
+
+    lines = []
+    _grid(csv, out_dir, index, "row", "positive", False, lines)
+    assert lines[-1].endswith("0 already in index, 0 with missing outputs, 4 to run")
+    assert not equity_path(out_dir, 5, 20).exists()
+
+    # Same index and out_dir, full per-run files: nothing may be skipped
+    _grid(csv, out_dir, index, "full", "abs", True, lines)
+    assert lines[-1].endswith("0 already in index, 0 with missing outputs, 4 to run")
+    assert equity_path(out_dir, 5, 20).exists()
+
+    _grid(csv, out_dir, ResultIndex(tmp_path / "index.jsonl"), "full", "abs", True, lines)
+    assert lines[-1].endswith("4 already in index, 0 with missing outputs, 0 to run")
+
+
+def test_missing_run_files_are_recomputed(tmp_path):
+    csv, out_dir = _csv(tmp_path), tmp_path / "multi"
+    index = ResultIndex(tmp_path / "index.jsonl")
+    lines = []
+    first = _grid(csv, out_dir, index, "full", "abs", True, lines)
+
+    run_json_path(out_dir, 5, 20).unlink()
+    equity_path(out_dir, 10, 30).unlink()
+    again = _grid(csv, out_dir, index, "full", "abs", True, lines)
+
+    assert lines[-1].endswith("2 already in index, 2 with missing outputs, 2 to run")
+    assert run_json_path(out_dir, 5, 20).exists() and equity_path(out_dir, 10, 30).exists()
+    assert again == first
+
+
+def _rec(fast, slow, sharpe, data="d1"):
+    return {"strategy": "sma_cross", "params": {"fast": fast, "slow": slow}, "data": data,
+            "metrics": {"sharpe": sharpe}}
+
+
+def test_torn_tail_is_skipped_and_next_append_starts_a_fresh_line(tmp_path):
+    path = tmp_path / "index.jsonl"
+    ResultIndex(path).add_many([_rec(5, 20, 1.0), _rec(10, 20, 2.0)])
+    # Crash mid-write: half a record, no newline
+    with path.open("a", encoding="utf-8") as f:
+        f.write('{"strategy": "sma_cross", "params": {"fa')
+
+    index = ResultIndex(path)
+    assert len(index) == 2
+    index.add_many([_rec(10, 20, 3.0), _rec(5, 30, 4.0)])
+
+    reloaded = ResultIndex(path)
+    assert len(reloaded) == 3
+    assert reloaded.get("sma_cross", {"slow": 20, "fast": 10}, "d1")["metrics"] == {"sharpe": 3.0}
+    assert reloaded.get("sma_cross", {"fast": 5, "slow": 30}, "d1")["metrics"] == {"sharpe": 4.0}
+    assert reloaded.get("sma_cross", {"fast": 5, "slow": 20}, "d2") is None
+    assert len(path.read_text().splitlines()) == 5
+
+
+def test_input_fingerprint_follows_content_not_mtime(tmp_path):
+    csv = _csv(tmp_path)
+    fp = data_fingerprint(csv)
+    st = csv.stat()
+    os.utime(csv, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    assert data_fingerprint(csv) == fp
+    csv.write_text(csv.read_text() + "1.0\n")
+    assert data_fingerprint(csv) != fp
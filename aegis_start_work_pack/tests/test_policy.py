@@ -0,0 +1,61 @@
+import pytest
+
+from chat.policy import PolicyError, PolicyStore, compile_policy, load_policy
+
+
+def test_missing_allow_list_allows_nothing():
+    for raw in ({"mode": "paper"}, {"mode": "paper", "tools": {"deny": []}},
+                {"allowed_tools": []}, {"tools": {"allow": None}}):
+        policy = compile_policy(raw)
+        assert policy.allow == frozenset()
+        assert not policy.allows("backtest.run")
+        assert "allow_all" not in policy.to_dict()
+
+
+def test_listed_tools_are_allowed_unless_denied():
+    policy = compile_policy({"tools": {"allow": ["backtest.run", "plot.equity"], "deny": ["plot.equity"]}})
+    assert policy.allows("backtest.run")
+    assert not policy.allows("plot.equity")
+    assert not policy.allows("strategy.run")
+
+
+@pytest.mark.parametrize("text", ["", "\n", "# truncated\n", "{}\n"])
+def test_empty_file_is_rejected(tmp_path, text):
+    path = tmp_path / "policy.yaml"
+    path.write_text(text)
+    with pytest.raises(PolicyError):
+        load_policy(path)
+
+
+def test_missing_file_allows_nothing(tmp_path):
+    assert not load_policy(tmp_path / "nope.yaml").allows("backtest.run")
+
+
+def test_store_keeps_previous_version_when_file_is_emptied(tmp_path):
+    path = tmp_path / "policy.yaml"
+    path.write_text("allowed_tools: [backtest.run]\n")
+    store = PolicyStore(path, check_every=0)
+    assert store.current().allows("backtest.run")
+
+    path.write_text("")
+    policy = store.refresh()
+    assert policy.version == 1 and policy.allows("backtest.run")
+    assert store.last_error
+
+    path.write_text("mode: paper\n")
+    policy = store.refresh()
+    assert policy.version == 2 and not policy.allows("backtest.run")
+
+
+def test_non_utf8_file_is_a_policy_error(tmp_path, caplog):
+    path = tmp_path / "policy.yaml"
+    path.write_text("allowed_tools: [backtest.run]\n")
+    store = PolicyStore(path, check_every=0)
+
+    path.write_bytes(b"allowed_tools: [\xff\xfe]\n")
+    with pytest.raises(PolicyError):
+        load_policy(path)
+    with caplog.at_level("WARNING", logger="chat.policy"):
+        assert store.refresh().allows("backtest.run")
+    assert "utf-8" in store.stats()["last_error"]
+    assert "keeping policy version 1" in caplog.text
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies.portfolio_engine import PortfolioConfig, run_portfolio, sma_confidence, target_weights
+
+
+def _cfg(**kw):
+    base = dict(symbols=["A", "B", "C"], max_positions=3, min_weight=0.02, max_weight=0.10,
+                cash_reserve=0.10, stop_loss_pct=0.05, cool_down_bars=3)
+    base.update(kw)
+    return PortfolioConfig(**base)
+
+
+def test_from_yaml_reads_strategy_rules():
+    cfg = PortfolioConfig.from_yaml()
+    assert len(cfg.symbols) == 10 and cfg.max_positions == 10
+    assert (cfg.min_weight, cfg.max_weight, cfg.cash_reserve) == (0.02, 0.10, 0.10)
+    assert cfg.daily_loss_halt == -2000 and cfg.cool_down_bars == 5
+    # Heat limit (0.60) is tighter than 1 - cash_reserve
+    assert cfg.gross_cap == pytest.approx(0.60)
+
+
+def test_target_weights_confidence_linear_top_n_and_cap():
+    conf = np.array([1.0, 0.5, 0.0, -1.0, 0.25])
+    eligible = np.array([True, True, True, True, False])
+
+    w = target_weights(conf, eligible, _cfg(max_positions=5))
+    # Long only: the short and the ineligible symbol get nothing
+    np.testing.assert_allclose(w, [0.10, 0.06, 0.0, 0.0, 0.0])
+
+    w = target_weights(conf, eligible, _cfg(max_positions=1))
+    np.testing.assert_allclose(w, [0.10, 0.0, 0.0, 0.0, 0.0])
+
+    w = target_weights(np.ones(20), np.ones(20, dtype=bool), _cfg(max_positions=20, portfolio_heat_limit=0.5))
+    assert w.sum() == pytest.approx(0.5) and np.allclose(w, w[0])
+
+
+def test_sma_confidence_ignores_windows_before_first_price():
+    x = np.full((30, 2), np.nan)
+    x[:, 0] = np.linspace(100, 130, 30)
+    x[10:, 1] = np.linspace(100, 130, 20)
+    conf = sma_confidence(x, fast=2, slow=5)
+    assert (conf[:4, 0] == 0).all() and (conf[4:, 0] > 0).all()
+    assert (conf[:14, 1] == 0).all() and (conf[14:, 1] > 0).all()
+
+
+def _universe():
+    idx = pd.bdate_range("2024-01-01", periods=12)
+    a = np.linspace(100, 111, 12)
+    b = np.r_[[100.0] * 4, [90.0] * 8]          # gaps through the stop on bar 4
+    c = np.r_[[np.nan] * 3, np.linspace(50, 54, 9)]  # lists on bar 3
+    prices = pd.DataFrame({"A": a, "B": b, "C": c}, index=idx)
+    return prices, pd.DataFrame(1.0, index=idx, columns=prices.columns)
+
+
+def test_stop_cool_down_and_late_listing():
+    prices, conf = _universe()
+    res = run_portfolio(prices, conf, _cfg(), capital=100_000.0)
+
+    b = [t for t in res.trades if t["symbol"] == "B"]
+    assert [(t["date"][:10], t["reason"]) for t in b] == [
+        ("2024-01-02", "rebalance"),
+        ("2024-01-05", "stop"),
+        # Sits out bars 5-7, back in on bar 8
+        ("2024-01-11", "rebalance"),
+    ]
+    assert res.metrics["stops"] == 1
+    assert res.weights["C"].iloc[:3].eq(0).all() and res.weights["C"].iloc[3] > 0
+    assert (res.weights.abs().sum(axis=1) <= _cfg().gross_cap + 1e-9).all()
+
+
+def test_pnl_by_symbol_adds_up_to_equity_with_costs():
+    prices, conf = _universe()
+    res = run_portfolio(prices, conf, _cfg(fee_bps=10.0, commission_per_share=0.01), capital=100_000.0)
+    assert res.metrics["costs"] > 0
+    assert res.equity.iloc[-1] - 100_000.0 == pytest.approx(sum(res.pnl_by_symbol.values()), abs=0.05)
+
+
+def test_daily_loss_halt_blocks_new_risk_for_one_bar():
+    idx = pd.bdate_range("2024-01-01", periods=6)
+    prices = pd.DataFrame({"A": [100.0, 100, 97, 97, 97, 97], "B": [100.0] * 6}, index=idx)
+    conf = pd.DataFrame({"A": 1.0, "B": [0.0, 0.0, 1.0, 1.0, 1.0, 1.0]}, index=idx)
+    res = run_portfolio(prices, conf, _cfg(symbols=["A", "B"], stop_loss_pct=0.5, daily_loss_halt=-100.0))
+
+    # Bar 2 loses ~300 on A, so bar 3 may not open B; bar 4 does
+    assert res.metrics["halted_bars"] == 1
+    assert res.weights["B"].iloc[3] == 0 and res.weights["B"].iloc[4] > 0
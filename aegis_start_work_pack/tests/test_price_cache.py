@@ -0,0 +1,68 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies.price_cache import PriceSeriesCache
+from strategies.price_store import write_frame
+
+
+def _csv(path, prices):
+    pd.DataFrame({"price": prices}).to_csv(path, index=False)
+    return path
+
+
+def test_lru_evicts_least_recently_used(tmp_path):
+    a, b, c = (_csv(tmp_path / f"{n}.csv", np.arange(10.0) + i) for i, n in enumerate("abc"))
+    cache = PriceSeriesCache(budget_bytes=2 * 10 * 8)
+
+    cache.get(a)
+    cache.get(b)
+    cache.get(a)          # a is now most recent
+    cache.get(c)          # evicts b
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+
+    hits = cache.hits
+    cache.get(a)
+    cache.get(c)
+    assert cache.hits == hits + 2
+    cache.get(b)
+    assert cache.misses == 4
+
+
+def test_entries_are_read_only_and_oversized_arrays_are_not_kept(tmp_path):
+    path = _csv(tmp_path / "a.csv", np.arange(10.0))
+    cache = PriceSeriesCache(budget_bytes=8)
+    prices = cache.get(path)
+    with pytest.raises(ValueError):
+        prices[0] = 1.0
+    assert cache.stats()["entries"] == 0
+
+
+def test_rewritten_file_is_reparsed(tmp_path):
+    path = _csv(tmp_path / "a.csv", [1.0, 2.0, 3.0])
+    cache = PriceSeriesCache()
+    assert cache.get(path).tolist() == [1.0, 2.0, 3.0]
+
+    # Same size, new mtime
+    _csv(path, [4.0, 5.0, 6.0])
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    assert cache.get(path).tolist() == [4.0, 5.0, 6.0]
+
+    # New size
+    _csv(path, [7.0, 8.0, 9.0, 10.0, "SPY"])
+    assert cache.get(path).tolist() == [7.0, 8.0, 9.0, 10.0]
+    assert cache.misses == 3 and cache.hits == 0
+
+
+def test_rewritten_store_is_reparsed(tmp_path):
+    path = tmp_path / "run.store"
+    write_frame(pd.DataFrame({"price": [1.0, np.nan, 3.0]}), path)
+    cache = PriceSeriesCache()
+    assert cache.get(path).tolist() == [1.0, 3.0]
+    assert cache.get(path).tolist() == [1.0, 3.0] and cache.hits == 1
+
+    write_frame(pd.DataFrame({"price": [5.0, 6.0, 7.0, 8.0]}), path)
+    assert cache.get(path).tolist() == [5.0, 6.0, 7.0, 8.0]
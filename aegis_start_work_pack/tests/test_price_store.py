@@ -0,0 +1,82 @@
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import strategies.price_store as ps
+
+
+def _frame(n=5, start=100.0):
+    idx = pd.date_range("2024-01-01", periods=n, freq="D", name="date")
+    return pd.DataFrame({"price": np.arange(n) + start, "equity": np.linspace(1, 2, n), "tag": list("abcde")[:n]},
+                        index=idx)
+
+
+def _age(path, seconds):
+    t = time.time() - seconds
+    os.utime(path, (t, t))
+
+
+def test_write_read_round_trip(tmp_path):
+    path = tmp_path / "SPY.store"
+    df = _frame()
+    ps.write_frame(df, path, meta={"symbol": "SPY"})
+
+    assert ps.is_store(path) and ps.list_columns(path) == ["price", "equity", "tag"]
+    assert ps.read_manifest(path)["meta"] == {"symbol": "SPY"}
+    back = ps.read_frame(path)
+    assert list(back.columns) == ["date", "price", "equity", "tag"]
+    assert (pd.DatetimeIndex(back["date"]) == df.index).all()
+    assert np.array_equal(back["price"], df["price"]) and list(back["tag"]) == list(df["tag"])
+
+    cols = ps.open_columns(path, ["equity"])
+    assert not cols["equity"].flags.writeable and np.allclose(cols["equity"], df["equity"])
+    assert list(ps.load_frame(path, ["price"]).columns) == ["date", "price"]
+    with pytest.raises(KeyError):
+        ps.open_columns(path, ["nope"])
+
+
+def test_rewrite_prunes_old_versions_after_grace(tmp_path):
+    path = tmp_path / "SPY.store"
+    ps.write_frame(_frame(), path)
+    first = ps.read_manifest(path)["dir"]
+    ps.write_frame(_frame(start=200.0), path)
+    second = ps.read_manifest(path)["dir"]
+    # Still inside the grace period: the old version stays for readers
+    assert (path / first).is_dir()
+
+    _age(path / first, ps.PRUNE_GRACE_S + 5)
+    ps.write_frame(_frame(start=300.0), path)
+    versions = sorted(p.name for p in path.iterdir() if p.is_dir())
+    assert first not in versions and second in versions and len(versions) == 2
+    assert ps.read_frame(path)["price"].iloc[0] == 300.0
+
+
+def test_legacy_store_arrays_are_pruned_one_write_later(tmp_path):
+    # Pre-versioning layout: arrays next to the manifest, no "dir"
+    path = tmp_path / "old.store"
+    ps.write_frame(_frame(), path)
+    m = ps.read_manifest(path)
+    for f in (path / m["dir"]).iterdir():
+        os.replace(f, path / f.name)
+    (path / m["dir"]).rmdir()
+    del m["dir"]
+    ps.manifest_path(path).write_text(json.dumps(m))
+    assert ps.read_frame(path)["price"].iloc[0] == 100.0
+
+    ps.write_frame(_frame(start=200.0), path)
+    for f in path.glob("*.npy"):
+        _age(f, ps.PRUNE_GRACE_S + 5)
+    ps.write_frame(_frame(start=300.0), path)
+    assert list(path.glob("*.npy")) == []
+    assert ps.read_frame(path)["price"].iloc[0] == 300.0
+
+
+def test_load_frame_reads_legacy_csv(tmp_path):
+    path = tmp_path / "run.csv"
+    _frame().to_csv(path)
+    assert list(ps.load_frame(path, ["price"]).columns) == ["price"]
+    assert not ps.is_store(path)
@@ -0,0 +1,107 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+import chat.backtest_server as server
+import chat.orchestrator_app as app_mod
+from chat.jobs import JobQueue
+from chat.progress import ProgressFeed, Throughput
+from chat.run_registry import RunRegistry
+
+
+def _frames(body):
+    out = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines() if not line.startswith(":"))
+        if lines:
+            out.append((lines.get("id"), lines["event"], json.loads(lines["data"])))
+    return out
+
+
+def test_throughput_rate_and_eta():
+    meter = Throughput(total=10, started=100.0)
+    assert meter.snapshot(now=105.0)["runs_per_sec"] is None
+    meter.update(4, failed=1)
+    snap = meter.snapshot(now=102.0)
+    assert (snap["pct"], snap["runs_per_sec"], snap["eta_s"], snap["failed"]) == (40.0, 2.0, 3.0, 1)
+    meter.update(10)
+    assert meter.snapshot(now=105.0)["eta_s"] == 0.0
+
+
+def test_feed_replays_history_and_wakes_waiters():
+    feed = ProgressFeed(keep=3)
+    for i in range(5):
+        feed.publish("item", {"i": i})
+    events, closed = feed.since(0)
+    # Only the last `keep` are retained; ids keep counting
+    assert [s for s, _, _ in events] == [3, 4, 5] and not closed
+    assert [d["i"] for _, _, d in feed.since(4)[0]] == [4]
+
+    threading.Timer(0.05, feed.publish, ("item", {"i": 5})).start()
+    t0 = time.monotonic()
+    events, _ = feed.since(5, timeout=5.0)
+    assert [s for s, _, _ in events] == [6] and time.monotonic() - t0 < 2.0
+
+    feed.close()
+    assert feed.since(6) == ([], True)
+
+
+def test_grid_job_streams_item_events_and_resumes(monkeypatch):
+    def fake_grid(csv_path, fast, slow, workers=None, score="abs", progress=None):
+        combos = [(f, s) for f in fast for s in slow]
+        for done, (f, s) in enumerate(combos, 1):
+            progress({"fast": f, "slow": s}, done, len(combos))
+        return {"runs": len(combos)}
+
+    q = JobQueue(max_workers=1)
+    monkeypatch.setattr(server, "_JOBS", q)
+    monkeypatch.setattr(server, "SSE_POLL_S", 0.01)
+    monkeypatch.setitem(server.PROGRESS_JOB_KINDS, "sma_cross_grid", fake_grid)
+    client = TestClient(server.app)
+    try:
+        r = client.post("/jobs/grid", json={"csv_path": "x.csv", "fast": [5, 10], "slow": [20, 50]})
+        assert r.status_code == 202
+        events_url = r.json()["events"]
+
+        frames = _frames(client.get(events_url).text)
+        kinds = [k for _, k, _ in frames]
+        assert kinds == ["status", "status", "item", "item", "item", "item", "done"]
+        items = [d for _, k, d in frames if k == "item"]
+        assert [(d["done"], d["total"]) for d in items] == [(1, 4), (2, 4), (3, 4), (4, 4)]
+        assert items[-1]["eta_s"] == 0.0
+        assert frames[-1][2]["status"] == "COMPLETE"
+
+        resumed = _frames(client.get(events_url, headers={"Last-Event-ID": frames[3][0]}).text)
+        assert [k for _, k, _ in resumed] == ["item", "item", "done"]
+        assert client.get("/jobs/nope/events").status_code == 404
+    finally:
+        q.shutdown()
+
+
+@pytest.fixture
+def orchestrator(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_mod, "RUNS", RunRegistry(tmp_path / "registry.db"))
+    monkeypatch.setattr(app_mod, "RUNS_DIR", tmp_path)
+    monkeypatch.setattr(app_mod, "EVENTS_POLL_S", 0.01)
+    monkeypatch.setattr(app_mod, "backtest_run", lambda strategy, symbols, params=None: {"sharpe": 1.0})
+    return app_mod
+
+
+def test_multi_run_events_snapshot_cells_done(orchestrator):
+    body = {"name": "grid", "symbols": ["SPY", "QQQ"], "strategies": ["sma", "ema"], "timeframe": "1d"}
+    with TestClient(orchestrator.app) as client:
+        run_id = client.post("/multi-run", json=body).json()["run_id"]
+        frames = _frames(client.get(f"/multi-run/{run_id}/events").text)
+        kinds = [k for _, k, _ in frames]
+        assert kinds[0] == "snapshot" and kinds[-1] == "done"
+        cells = [(i, d) for i, k, d in frames if k == "cell"]
+        assert [i for i, _ in cells] == ["1", "2", "3", "4"]
+        assert sorted(d["idx"] for _, d in cells) == [0, 1, 2, 3]
+        assert cells[-1][1]["done"] == 4 and frames[-1][2]["status"] == "COMPLETE"
+
+        resumed = _frames(client.get(f"/multi-run/{run_id}/events", headers={"Last-Event-ID": "3"}).text)
+        assert [(i, k) for i, k, _ in resumed[1:]] == [("4", "cell"), (None, "done")]
+        assert client.get("/multi-run/nope/events").status_code == 404
@@ -0,0 +1,58 @@
+import json
+from pathlib import Path
+
+from chat.rag_index import (
+    HashingEmbedder, InvertedIndex, RagIndex, binary_path, prune_vectors, save_binary, save_vectors,
+    vectors_path,
+)
+
+
+RECORDS = [
+    {"path": "docs/a.md", "chunk_id": 0, "text": "moving average crossover on daily bars"},
+    {"path": "docs/b.md", "chunk_id": 0, "text": "position sizing and risk limits"},
+]
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def _write_companion(path, records, version="v1"):
+    embedder = HashingEmbedder(16)
+    st = path.stat()
+    vec_file = save_vectors(embedder.embed_many([r["text"] for r in records]), vectors_path(path, version))
+    save_binary(
+        InvertedIndex.from_records(records), binary_path(path), (st.st_mtime_ns, st.st_size),
+        vectors={"file": vec_file.name, "rows": len(records), "embedder": embedder.config()},
+    )
+
+
+def test_reloads_when_companion_lands_after_jsonl(tmp_path):
+    path = tmp_path / "index.jsonl"
+    _write_jsonl(path, RECORDS)
+    rag = RagIndex(path)
+    assert rag.stats()["chunks"] == 2 and rag.stats()["vectors"] is None
+
+    # build_index's order: companion written after the jsonl
+    _write_companion(path, RECORDS)
+    assert rag.search("risk limits", k=1)[0]["path"] == "docs/b.md"
+    assert rag.stats()["vectors"]["dim"] == 16
+    assert rag.reloads == 2
+
+
+def test_rebuild_writes_new_vector_file_next_to_mapped_one(tmp_path):
+    path = tmp_path / "index.jsonl"
+    _write_jsonl(path, RECORDS)
+    _write_companion(path, RECORDS, "v1")
+    rag = RagIndex(path)
+    mapped = rag.refresh().dense.vectors
+    assert Path(mapped.filename).name == "index.vec-v1.npy"
+
+    _write_jsonl(path, RECORDS[:1])
+    _write_companion(path, RECORDS[:1], "v2")
+    vectors_path(path).write_bytes(b"pre-versioning file")
+    assert prune_vectors(path, keep="index.vec-v2.npy") == 2
+    assert sorted(p.name for p in tmp_path.glob("*.npy")) == ["index.vec-v2.npy"]
+
+    assert rag.refresh().dense.vectors.shape == (1, 16)
+    assert rag.stats()["chunks"] == 1
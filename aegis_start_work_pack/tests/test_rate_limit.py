@@ -0,0 +1,55 @@
+from chat.rate_limit import BATCH, INTERACTIVE, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+
+def _limiter(rate_limits, **kw):
+    clock = Clock()
+    return RateLimiter.from_policy(rate_limits, clock=clock, **kw), clock
+
+
+def test_bucket_refills_at_rate():
+    rates, clock = _limiter({"backtest.run": "10/hour"})
+    for _ in range(10):
+        assert rates.acquire("backtest.run", "a").allowed
+    d = rates.acquire("backtest.run", "a")
+    assert not d.allowed and d.headers()["Retry-After"] == "360"
+    assert rates.acquire("backtest.run", "b").allowed   # per client
+
+    clock.t = 360.0
+    assert rates.acquire("backtest.run", "a").allowed
+
+
+def test_batch_lane_leaves_reserve_for_interactive():
+    rates, _ = _limiter({"backtest.run": "10/hour"})
+    assert rates.capacity("backtest.run", BATCH) == 8.0
+    while rates.acquire("backtest.run", "a", BATCH).allowed:
+        pass
+    assert rates.acquire("backtest.run", "a", INTERACTIVE).allowed
+    assert rates.acquire("backtest.run", "a", INTERACTIVE).allowed
+    assert not rates.acquire("backtest.run", "a", INTERACTIVE).allowed
+
+
+def test_cost_charges_several_tokens():
+    rates, clock = _limiter({"backtest_per_hour": 10})
+    assert rates.acquire("backtest.run", "a", BATCH, cost=6).allowed
+    d = rates.acquire("backtest.run", "a", BATCH, cost=6)
+    assert not d.allowed and round(d.retry_after) == 4 * 360
+    assert rates.acquire("backtest.run", "a", BATCH, cost=2).allowed
+
+    clock.t = 4 * 360.0
+    assert rates.acquire("backtest.run", "a", BATCH, cost=4).allowed
+
+
+def test_aliases_and_unlimited_tools():
+    rates, _ = _limiter({"backtest.run": "1/hour"}, aliases={"run_and_plot": "backtest.run"})
+    assert rates.capacity("plot.equity") is None
+    assert rates.acquire("run_and_plot", "a").allowed
+    assert not rates.acquire("backtest.run", "a").allowed
+    assert all(rates.acquire("plot.equity", "a").allowed for _ in range(50))
@@ -0,0 +1,55 @@
+import socket
+
+from chat.run_registry import COMPLETE, INTERRUPTED, QUEUED, RUNNING, RunRegistry, process_owner
+
+
+def _dead_run(runs, run_id, owner=f"{socket.gethostname()}:999999999"):
+    runs.create(run_id, {"name": run_id})
+    runs.add_cells(run_id, [{"strategy": "sma", "symbol": s} for s in ("SPY", "QQQ", "IWM")])
+    runs.update(run_id, status=RUNNING)
+    runs.start_cell(run_id, 0)
+    runs.finish_cell(run_id, 0, output={"ok": True})
+    runs.start_cell(run_id, 1)
+    runs._conn().execute("UPDATE runs SET owner = ? WHERE run_id = ?", (owner, run_id))
+
+
+def test_orphaned_runs_are_interrupted(tmp_path):
+    runs = RunRegistry(tmp_path / "registry.db")
+    _dead_run(runs, "dead")
+    _dead_run(runs, "legacy", owner=None)
+    _dead_run(runs, "remote", owner="some-other-host:1")
+    runs.create("live", {"name": "live"})
+    runs.create("finished", {"name": "finished"}, status=COMPLETE)
+    assert runs.get("live")["owner"] == process_owner()
+
+    # Reopening the file is what a restarted server does
+    runs = RunRegistry(tmp_path / "registry.db")
+    assert sorted(runs.interrupt_orphans()) == ["dead", "legacy"]
+
+    run = runs.get("dead")
+    assert run["status"] == INTERRUPTED and run["error"]
+    assert (run["total"], run["done"], run["failed"]) == (3, 3, 2)
+    cells = runs.cells("dead")
+    assert [c["status"] for c in cells] == ["COMPLETE", "FAILED", "FAILED"]
+    assert all(c["finished_at"] for c in cells)
+
+    assert runs.get("remote")["status"] == RUNNING
+    assert runs.get("live")["status"] == QUEUED
+    assert runs.get("finished")["status"] == COMPLETE
+    assert runs.interrupt_orphans() == []
+
+
+def test_events_stream_ends_for_interrupted_run(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    import chat.orchestrator_app as app_mod
+
+    runs = RunRegistry(tmp_path / "registry.db")
+    _dead_run(runs, "dead")
+    runs.interrupt_orphans()
+    monkeypatch.setattr(app_mod, "RUNS", runs)
+
+    with TestClient(app_mod.app) as client:
+        body = client.get("/multi-run/dead/events").text
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    assert events == ["snapshot", "cell", "cell", "cell", "done"]
+    assert '"status": "INTERRUPTED"' in body.split("event: done", 1)[1]
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from strategies.strategy_engine import sma_cross_strategy, sma_cross_sweep
+
+
+def _prices(n=500, seed=3):
+    rng = np.random.default_rng(seed)
+    return 100.0 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+
+
+@pytest.mark.parametrize("block_bytes", [64 * 1024 * 1024, 1])
+def test_sweep_matches_sma_cross_strategy(block_bytes):
+    prices = _prices()
+    fasts, slows = [5, 10, 20], [30, 50, 600]
+    sweep = sma_cross_sweep(prices, fasts, slows, block_bytes=block_bytes)
+    df = pd.DataFrame({"price": prices})
+
+    for f in fasts:
+        for s in slows:
+            ref = sma_cross_strategy(df, {"fast": f, "slow": s})
+            got = sweep.result(f, s)
+            for k in ("total_return", "vol_annual", "sharpe"):
+                assert got.metrics[k] == pytest.approx(ref.metrics[k], rel=1e-9, abs=1e-12), (f, s, k)
+            assert np.allclose(got.equity_curve, ref.equity_curve, rtol=0, atol=1e-12)
+
+
+def test_sweep_rejects_unknown_pair_and_bad_window():
+    sweep = sma_cross_sweep(_prices(50), [5], [20])
+    with pytest.raises(KeyError):
+        sweep.result(6, 20)
+    with pytest.raises(ValueError):
+        sma_cross_sweep(_prices(50), [0], [20])
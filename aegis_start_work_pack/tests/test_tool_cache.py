@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import chat.orchestrator_stub as stub
+from chat.rate_limit import RateLimiter, spec_from_policy
+from chat.tool_cache import ToolResultCache
+
+
+ARGS = {"symbol": "SPY", "start": "2020-01-01", "end": "2021-01-01"}
+
+
+def test_cancelled_leader_does_not_cancel_coalesced_callers(tmp_path):
+    cache = ToolResultCache(disk_dir=tmp_path)
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    async def main():
+        leader = asyncio.ensure_future(cache.get_or_compute("t", ARGS, compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.ensure_future(cache.get_or_compute("t", ARGS, compute))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert await waiter == {"ok": True}
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        # The result landed in the cache despite the cancel
+        assert await cache.get_or_compute("t", ARGS, compute) == {"ok": True}
+
+    asyncio.run(main())
+    assert len(calls) == 1
+    assert cache.counters["coalesced"] == 1 and cache.stats()["in_flight"] == 0
+
+
+def test_invalid_hits_are_dropped_and_recomputed(tmp_path):
+    artifact = tmp_path / "run.store"
+    artifact.mkdir()
+    cache = ToolResultCache(disk_dir=tmp_path / "cache")
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        return {"csv_path": str(artifact)}
+
+    def valid(out):
+        return artifact.exists()
+
+    async def main():
+        await cache.get_or_compute("t", ARGS, compute, valid=valid)
+        await cache.get_or_compute("t", ARGS, compute, valid=valid)
+        assert len(calls) == 1
+        artifact.rmdir()
+        assert await cache.lookup("t", ARGS, valid) == (False, None)
+        assert not any((tmp_path / "cache").glob("*.json"))
+        await cache.get_or_compute("t", ARGS, compute, valid=valid)
+
+    asyncio.run(main())
+    assert len(calls) == 2 and cache.counters["stale"] == 1
+
+
+class _Resp:
+    def __init__(self, body):
+        self.body = body
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.body
+
+
+class _Http:
+    def __init__(self, csv_path):
+        self.csv_path, self.calls = csv_path, 0
+
+    async def post(self, upstream, path, **kw):
+        self.calls += 1
+        return _Resp({"exit_code": 0, "csv_path": str(self.csv_path)})
+
+
+def test_dispatch_checks_the_cache_before_charging_a_token(tmp_path, monkeypatch):
+    artifact = tmp_path / "SPY.store"
+    artifact.mkdir()
+    http = _Http(artifact)
+    monkeypatch.setattr(stub, "HTTP", http)
+    monkeypatch.setattr(stub, "TOOL_CACHE", ToolResultCache(disk_dir=tmp_path / "cache"))
+    monkeypatch.setattr(stub, "RATES", RateLimiter({"backtest.run": spec_from_policy("backtest.run", "1/hour")}))
+    call = {"tool": "backtest.run", "args": ARGS}
+
+    async def main():
+        for _ in range(3):
+            out = await stub.dispatch_tool(call, "alice")
+            assert out["result"]["csv_path"] == str(artifact)
+        # The artifact went away: the next call is a miss and needs a token
+        artifact.rmdir()
+        with pytest.raises(HTTPException) as e:
+            await stub.dispatch_tool(call, "alice")
+        assert e.value.status_code == 429
+
+    asyncio.run(main())
+    assert http.calls == 1
+    assert stub.RATES.counters == {"allowed": 1, "denied": 1}
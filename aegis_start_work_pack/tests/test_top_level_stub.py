@@ -0,0 +1,76 @@
+import importlib.util
+import json
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from chat import fake_ollama
+from chat.rate_limit import spec_from_policy
+
+
+STUB = Path(__file__).resolve().parents[2] / "chat" / "orchestrator_stub.py"
+
+
+def _tool_reply(tool):
+    return json.dumps({"tool": tool, "args": {"symbol": "SPY", "start": "2020-01-01", "end": "2021-01-01"}})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    # The repo-root stub is also chat.orchestrator_stub; load it under its own
+    # name and undo its sys.path bootstrap so the pack's modules keep winning
+    saved = list(sys.path)
+    spec = importlib.util.spec_from_file_location("top_level_orchestrator_stub", STUB)
+    mod = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(mod)
+    finally:
+        sys.path[:] = saved
+
+    async def fake_backtest(args):
+        return {"symbol": args.symbol}
+
+    monkeypatch.setattr(mod, "tool_backtest", fake_backtest)
+    mod.RATES.set_specs({"backtest.run": spec_from_policy("backtest.run", "2/hour")})
+    return mod
+
+
+def _ollama(monkeypatch, stub, reply):
+    server = fake_ollama.serve(port=0, reply=reply, delay=0, background=True)
+    monkeypatch.setattr(stub, "OLLAMA_URL", f"http://127.0.0.1:{server.server_address[1]}/api/chat")
+    return server
+
+
+def test_chat_tool_calls_hit_the_rate_limit(stub, monkeypatch):
+    server = _ollama(monkeypatch, stub, _tool_reply("backtest.run"))
+    try:
+        client = TestClient(stub.app)
+        headers = {"X-Client-Id": "tester"}
+        for _ in range(2):
+            r = client.post("/chat", json={"message": "run SPY"}, headers=headers)
+            assert r.status_code == 200 and r.json()["result"] == {"symbol": "SPY"}
+        r = client.post("/chat", json={"message": "run SPY"}, headers=headers)
+        assert r.status_code == 429
+        assert "Retry-After" in r.headers
+    finally:
+        server.shutdown()
+
+
+def test_chat_tool_calls_are_checked_against_policy(stub, monkeypatch):
+    server = _ollama(monkeypatch, stub, _tool_reply("broker.place_order"))
+    try:
+        r = TestClient(stub.app).post("/chat", json={"message": "buy"})
+        assert r.status_code == 403
+    finally:
+        server.shutdown()
+
+
+def test_tool_run_hits_the_rate_limit(stub):
+    client = TestClient(stub.app)
+    body = {"tool": "run_and_plot", "args": {}}
+    stub.RATES.set_specs({"backtest.run": spec_from_policy("backtest.run", "1/hour")})
+    assert client.post("/tool/run", json={"tool": "backtest.run", "args": {
+        "symbol": "SPY", "start": "2020-01-01", "end": "2021-01-01"}}).status_code == 200
+    assert client.post("/tool/run", json=body).status_code == 429
@@ -1,3 +1,34 @@
-def data_fetch(symbols=None, range_days=5):
-    symbols = symbols or ["AAPL","MSFT"]
-    return {"symbols": symbols, "range_days": range_days, "rows": 390*range_days}
+from datetime import date, timedelta
+
+from strategies.market_data import default_store
+
+
+def data_fetch(symbols=None, range_days=5, interval="1d"):
+    # Read-only: bars come from the local market-data store, which only
+    # asks the provider for ranges it hasn't cached yet.
+    symbols = symbols or ["AAPL", "MSFT"]
+    end = date.today() + timedelta(days=1)
+    start = end - timedelta(days=range_days)
+    store = default_store()
+
+    out = {}
+    for symbol in symbols:
+        try:
+            bars = store.get(symbol, start, end, interval)
+        except Exception as e:
+            out[symbol] = {"rows": 0, "error": str(e)}
+            continue
+        out[symbol] = {
+            "rows": len(bars),
+            "first": bars.index.min().isoformat() if len(bars) else None,
+            "last": bars.index.max().isoformat() if len(bars) else None,
+            "last_close": float(bars["close"].iloc[-1]) if len(bars) and "close" in bars else None,
+        }
+    return {
+        "symbols": symbols,
+        "range_days": range_days,
+        "interval": interval,
+        "provider": store.provider.name,
+        "rows": sum(v["rows"] for v in out.values()),
+        "per_symbol": out,
+    }
@@ -1,10 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from pydantic import BaseModel
 from pathlib import Path
 import json, re, base64, httpx
 from fastapi import Body
+import sys
 
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+# chat/ is a namespace package: rag_index, policy and rate_limit have one
+# copy, in the pack's chat/ (which may also sit at the repo root)
+PACK = ROOT / "aegis_start_work_pack"
+if PACK.is_dir() and str(PACK) not in sys.path:
+    sys.path.append(str(PACK))
+
+from chat.rag_index import RagIndex
+from chat.policy import PolicyStore
+from chat.rate_limit import RateLimiter, caller_of, INTERACTIVE, BATCH
+
 INDEX_PATH = ROOT/'rag'/'index.jsonl'
 POLICY_PATH = ROOT/'config'/'policy.yaml'
 BACKTEST_URL = 'http://127.0.0.1:8001'           # your existing API
@@ -12,33 +25,27 @@ OLLAMA_URL   = 'http://127.0.0.1:11434/api/chat' # local model
 
 app = FastAPI(title="Aegis Orchestrator", version="0.1.0")
 
-# --- tiny YAML reader (no dependency) ---
-def read_policy():
-    mode = "paper"; allowed = []; rates = {}
-    if not POLICY_PATH.exists(): return {"mode":mode, "allowed_tools":allowed, "rate_limits":rates}
-    for line in POLICY_PATH.read_text(encoding='utf-8').splitlines():
-        s = line.strip()
-        if s.startswith('mode:'):
-            mode = s.split(':',1)[1].strip()
-        elif s.startswith('- '):
-            allowed.append(s[2:].strip())
-    return {"mode": mode, "allowed_tools": allowed, "rate_limits": rates}
-
-POLICY = read_policy()
-
-# --- minimal RAG (keyword overlap) ---
+# --- policy (compiled, reloaded when policy.yaml changes) ---
+POLICY = PolicyStore(POLICY_PATH)
+
+# --- rate limits (policy.yaml rate_limits, token bucket per tool and client) ---
+# Clients identify with X-Client-Id (else their address) and may send
+# X-Priority: batch|interactive; /tool/run defaults to batch, /chat to
+# interactive. The combined tools run a backtest, so they share its bucket.
+TOOL_RATE_ALIASES = {"run_and_plot": "backtest.run", "run_and_plot_save": "backtest.run"}
+RATES = RateLimiter(POLICY.current().rate_limits, aliases=TOOL_RATE_ALIASES)
+POLICY.subscribe(lambda p: RATES.set_specs(p.rate_limits))
+
+def check_rate(tool: str, client: str = "anon", lane: str = INTERACTIVE):
+    d = RATES.acquire(tool, client, lane)
+    if not d.allowed:
+        raise HTTPException(status_code=429, detail=d.detail(), headers=d.headers())
+
+# --- RAG (BM25 over index.jsonl, reloaded when the file changes) ---
+RAG = RagIndex(INDEX_PATH)
+
 def search_chunks(query, k=6):
-    if not INDEX_PATH.exists(): return []
-    q = set(re.findall(r'\w+', query.lower()))
-    scored = []
-    with INDEX_PATH.open('r', encoding='utf-8') as f:
-        for line in f:
-            rec = json.loads(line)
-            t = set(re.findall(r'\w+', rec["text"].lower()))
-            score = len(q & t)
-            if score: scored.append((score, rec))
-    scored.sort(key=lambda x: x[0], reverse=True)
-    return [r for _, r in scored[:k]]
+    return RAG.search(query, k)
 
 # --- models ---
 class ChatRequest(BaseModel):
@@ -64,7 +71,7 @@ class RunPlotArgs(BaseModel):
     slow: int = 200
 
 def tool_allowed(name: str) -> bool:
-    return name in POLICY.get("allowed_tools", [])
+    return POLICY.current().allows(name)
 
 # --- tools calling your running API ---
 async def tool_backtest(args: ToolBacktest):
@@ -92,11 +99,12 @@ async def tool_run_and_plot_save(args: RunPlotArgs):
         return r.json()
 
 @app.post("/tool/run")
-async def tool_run(payload: dict = Body(...)):
+async def tool_run(request: Request, payload: dict = Body(...)):
     name = payload.get("tool","")
     args = payload.get("args", {})
     if not tool_allowed(name):
         raise HTTPException(status_code=403, detail=f"Tool '{name}' not allowed by policy.")
+    check_rate(name, *caller_of(request, BATCH))
 
     if name == "backtest.run":
         return {"tool": name, "result": await tool_backtest(ToolBacktest(**args))}
@@ -116,12 +124,12 @@ async def tool_run(payload: dict = Body(...)):
     raise HTTPException(status_code=400, detail=f"Unknown tool '{name}'")
     
 @app.post("/chat")
-async def chat(req: ChatRequest):
+async def chat(req: ChatRequest, request: Request):
     ctx = search_chunks(req.message, k=6)
     context = "\n\n---\n".join([c["text"] for c in ctx]) if ctx else "No RAG context."
     system = req.system or (
         "You are Aegis, a single-mind trading model. "
-        f"Policy mode: {POLICY['mode']}. Use tools only if needed; "
+        f"Policy mode: {POLICY.current().mode}. Use tools only if needed; "
         "When using tools, answer ONLY with a JSON object like "
         '{"tool":"backtest.run","args":{"symbol":"SPY","start":"2020-01-01","end":"2025-11-01","fast":50,"slow":200}}'
     )
@@ -151,6 +159,7 @@ async def chat(req: ChatRequest):
             args = call.get("args", {})
             if not tool_allowed(tool):
                 raise HTTPException(status_code=403, detail=f"Tool '{tool}' not allowed by policy.")
+            check_rate(tool, *caller_of(request, INTERACTIVE))
             if tool == "backtest.run":
                 out = await tool_backtest(ToolBacktest(**args))
                 return {"tool": tool, "result": out}
@@ -165,7 +174,10 @@ async def chat(req: ChatRequest):
                 return {"tool": tool, "result": out}
 
             raise HTTPException(status_code=400, detail=f"Unknown tool '{tool}'")
-            
+
+        except HTTPException:
+            # policy (403), rate limit (429) and unknown tool (400) reach the client
+            raise
         except Exception:
             # fall back to plain text
             pass
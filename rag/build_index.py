@@ -1,9 +1,28 @@
 from pathlib import Path
-import json, re
+from concurrent.futures import ProcessPoolExecutor
+import argparse, hashlib, json, os, re, sys, uuid
 
 ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+# chat/ is a namespace package: rag_index, policy and rate_limit have one
+# copy, in the pack's chat/ (which may also sit at the repo root)
+PACK = ROOT / "aegis_start_work_pack"
+if PACK.is_dir() and str(PACK) not in sys.path:
+    sys.path.append(str(PACK))
+
+import numpy as np
+from chat.rag_index import (
+    HashingEmbedder, InvertedIndex, binary_path, load_binary,
+    prune_vectors, save_binary, save_vectors, vectors_path,
+)
+
 CORPUS_DIRS = [ROOT/'docs', ROOT/'research']
 INDEX_PATH = ROOT/'rag'/'index.jsonl'
+# path -> {sha256, mtime_ns, size, chunks} for every file in the last build
+MANIFEST_PATH = ROOT/'rag'/'index.manifest.json'
+SUFFIXES = ('.txt', '.md')
+EMBED_DIM = 128
 
 def chunk(text, size=900, overlap=150):
     out, i = [], 0
@@ -14,20 +33,120 @@ def chunk(text, size=900, overlap=150):
 
 def clean(s): return re.sub(r'\s+', ' ', s).strip()
 
-def main():
+def file_sha256(p):
+    h = hashlib.sha256()
+    with open(p, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+def chunk_file(path, dim=EMBED_DIM):
+    # Runs in worker processes: read, chunk and embed one source file
+    txt = Path(path).read_text('utf-8', errors='ignore')
+    recs = [{"path": path, "chunk_id": i, "text": clean(piece)} for i, piece in enumerate(chunk(txt))]
+    return recs, HashingEmbedder(dim).embed_many([r["text"] for r in recs])
+
+def scan():
+    files = []
+    for d in CORPUS_DIRS:
+        if not d.exists(): continue
+        files.extend(p for p in d.rglob('*') if p.is_file() and p.suffix.lower() in SUFFIXES)
+    return sorted(files)
+
+def load_manifest():
+    if not MANIFEST_PATH.exists() or not INDEX_PATH.exists():
+        return {}
+    try:
+        return json.loads(MANIFEST_PATH.read_text(encoding='utf-8')).get('files', {})
+    except ValueError:
+        return {}
+
+def write_atomic(path, write):
+    tmp = path.with_name(f'.{path.name}.tmp')
+    with tmp.open('w', encoding='utf-8') as f:
+        write(f)
+    os.replace(tmp, path)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Incrementally (re)build the RAG index.")
+    ap.add_argument('--full', action='store_true', help="ignore the manifest and re-chunk everything")
+    ap.add_argument('--workers', type=int, default=None, help="chunking processes (default: CPU count)")
+    args = ap.parse_args(argv)
+
     INDEX_PATH.parent.mkdir(parents=True, exist_ok=True)
-    n = 0
-    with INDEX_PATH.open('w', encoding='utf-8') as w:
-        for d in CORPUS_DIRS:
-            if not d.exists(): continue
-            for p in d.rglob('*'):
-                if p.suffix.lower() not in ('.txt', '.md'): continue
-                txt = p.read_text('utf-8', errors='ignore')
-                for i, piece in enumerate(chunk(txt)):
-                    rec = {"path": str(p), "chunk_id": i, "text": clean(piece)}
-                    w.write(json.dumps(rec) + '\n')
-                    n += 1
-    print(f'Indexed {n} chunks -> {INDEX_PATH}')
+    manifest = {} if args.full else load_manifest()
+
+    # Chunks (and their embedding rows) from the last build, reused for
+    # files whose content is unchanged
+    embedder = HashingEmbedder(EMBED_DIM)
+    old, old_rows, old_vecs = {}, {}, None
+    if manifest:
+        st = INDEX_PATH.stat()
+        prev_index = load_binary(binary_path(INDEX_PATH), source=(st.st_mtime_ns, st.st_size))
+        old_vecs = prev_index.dense if prev_index is not None else None
+        if old_vecs is None or old_vecs.embedder.config() != embedder.config():
+            manifest = {}  # no usable vectors from the last build: re-chunk everything
+        else:
+            for row, rec in enumerate(prev_index.records):
+                old.setdefault(rec["path"], []).append(rec)
+                old_rows.setdefault(rec["path"], []).append(row)
+
+    files, keep, changed = {}, [], []
+    for p in scan():
+        key, st = str(p), p.stat()
+        prev = manifest.get(key)
+        entry = {"mtime_ns": st.st_mtime_ns, "size": st.st_size}
+        indexed = prev is not None and (key in old or prev.get("chunks") == 0)
+        if indexed and (prev["mtime_ns"], prev["size"]) == (st.st_mtime_ns, st.st_size):
+            entry["sha256"] = prev["sha256"]          # untouched: skip hashing
+        else:
+            entry["sha256"] = file_sha256(p)
+        if indexed and prev["sha256"] == entry["sha256"]:
+            keep.append(key)
+        else:
+            changed.append(key)
+        files[key] = entry
+    deleted = [k for k in manifest if k not in files]
+
+    # A non-empty manifest at this point means the last build's vectors loaded
+    if not changed and not deleted and manifest:
+        print(f'Index up to date ({len(files)} files) -> {INDEX_PATH}')
+        return
+
+    # Re-chunk only what changed, across processes when there's enough of it
+    by_path = {k: (old.get(k, []), old_vecs.vectors[old_rows.get(k, [])]) for k in keep}
+    workers = max(1, args.workers or os.cpu_count() or 1)
+    if workers > 1 and len(changed) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(changed))) as pool:
+            for key, out in zip(changed, pool.map(chunk_file, changed, chunksize=8)):
+                by_path[key] = out
+    else:
+        for key in changed:
+            by_path[key] = chunk_file(key)
+
+    order = sorted(by_path)
+    records = [rec for key in order for rec in by_path[key][0]]
+    vectors = np.concatenate([by_path[key][1] for key in order] + [np.zeros((0, EMBED_DIM), np.float32)])
+    for key, (recs, _) in by_path.items():
+        files[key]["chunks"] = len(recs)
+
+    # The companion is tagged with the jsonl's (mtime_ns, size), so the jsonl
+    # goes first; RagIndex also watches the companion and reloads once it lands
+    write_atomic(INDEX_PATH, lambda w: w.writelines(json.dumps(rec) + '\n' for rec in records))
+    st = INDEX_PATH.stat()
+    # New file per build: the previous one may be memory-mapped (old_vecs here,
+    # or a running server), and mapped files can't be replaced on Windows
+    vec_file = save_vectors(vectors, vectors_path(INDEX_PATH, uuid.uuid4().hex[:8]))
+    save_binary(
+        InvertedIndex.from_records(records), binary_path(INDEX_PATH), (st.st_mtime_ns, st.st_size),
+        vectors={"file": vec_file.name, "rows": len(records), "embedder": embedder.config()},
+    )
+    old_vecs = prev_index = None
+    prune_vectors(INDEX_PATH, keep=vec_file.name)
+    write_atomic(MANIFEST_PATH, lambda w: json.dump({"files": files}, w, indent=2))
+
+    print(f'Indexed {len(records)} chunks from {len(files)} files '
+          f'({len(changed)} changed, {len(keep)} unchanged, {len(deleted)} removed) -> {INDEX_PATH}')
 
 if __name__ == '__main__':
     main()
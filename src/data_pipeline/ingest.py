@@ -1 +1,348 @@
-print('ingest placeholder')
+"""
+Bulk bar ingest: universe -> provider -> validate/normalise -> partitioned
+parquet.
+
+    python src/data_pipeline/ingest.py                       # strategy.yaml universe, yfinance
+    python src/data_pipeline/ingest.py --provider csv:fixtures/bars --start 2020-01-01
+    AEGIS_MARKET_PROVIDER=csv:fixtures/bars python src/orchestration/prefect_flows.py
+
+Layout (hive-style, so pandas/pyarrow/duckdb can prune by symbol and date):
+
+    data/bars/interval=1d/symbol=AAPL/year=2024/part.parquet
+    data/bars/interval=5m/symbol=AAPL/date=2024-01-02/part.parquet
+
+Daily bars are partitioned by year, intraday bars by day. Re-ingesting a
+range merges into the existing partitions (newest row wins), so the
+daily flow can simply refetch from the last stored bar.
+
+Providers and bar normalisation come from the pack's
+strategies/market_data.py, the same code the backtest data store uses;
+this module only validates and partitions.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+import yaml
+
+
+ROOT = Path(__file__).resolve().parents[2]
+DATA_DIR = Path(os.environ.get("AEGIS_DATA_DIR", ROOT / "data"))
+BARS_DIR = DATA_DIR / "bars"
+
+# Where the trading universe lives; the pack may sit at the repo root or
+# in its own folder.
+STRATEGY_YAML_CANDIDATES = [
+    ROOT / "brokers" / "E-Trade" / "strategy.yaml",
+    ROOT / "aegis_start_work_pack" / "brokers" / "E-Trade" / "strategy.yaml",
+]
+
+# Same two layouts for the pack's code (strategies/market_data.py)
+for _pack in (ROOT, ROOT / "aegis_start_work_pack"):
+    if (_pack / "strategies" / "market_data.py").is_file():
+        if str(_pack) not in sys.path:
+            sys.path.insert(0, str(_pack))
+        break
+
+from strategies.market_data import (  # noqa: E402
+    BAR_COLUMNS, MarketDataProvider, normalize_bars, provider_from_spec,
+)
+
+REQUIRED_COLUMNS = ["open", "high", "low", "close"]
+
+DEFAULT_LOOKBACK_DAYS = 365 * 5
+DEFAULT_WORKERS = 4
+
+
+# ---------- Universe ----------
+
+def strategy_yaml_path() -> Path:
+    env = os.environ.get("AEGIS_STRATEGY_YAML")
+    if env:
+        return Path(env)
+    for p in STRATEGY_YAML_CANDIDATES:
+        if p.is_file():
+            return p
+    return STRATEGY_YAML_CANDIDATES[0]
+
+
+def load_universe(path: Optional[Path] = None) -> List[str]:
+    path = Path(path) if path else strategy_yaml_path()
+    with open(path, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f) or {}
+    symbols = (cfg.get("universe") or {}).get("symbols") or []
+    out: List[str] = []
+    for s in symbols:
+        s = str(s).strip().upper()
+        if s and s not in out:
+            out.append(s)
+    if not out:
+        raise ValueError(f"No universe.symbols in {path}")
+    return out
+
+
+# ---------- Validation ----------
+
+def validate_bars(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """
+    Drop bars that can't be right; returns (clean, {reason: rows dropped}).
+    """
+    df = normalize_bars(df)
+    missing = [c for c in REQUIRED_COLUMNS if c not in df.columns]
+    if missing and not df.empty:
+        raise ValueError(f"missing columns: {missing}")
+    for c in BAR_COLUMNS:
+        if c not in df.columns:
+            df[c] = float("nan")
+    df = df[BAR_COLUMNS]
+
+    checks = {
+        "missing_ohlc": df[REQUIRED_COLUMNS].isna().any(axis=1),
+        "non_positive_price": (df[REQUIRED_COLUMNS] <= 0).any(axis=1),
+        "high_below_low": df["high"] < df["low"],
+        "close_outside_range": (df["close"] > df["high"] * 1.0001) | (df["close"] < df["low"] * 0.9999),
+        "negative_volume": df["volume"] < 0,
+    }
+    bad = pd.Series(False, index=df.index)
+    dropped: Dict[str, int] = {}
+    for reason, mask in checks.items():
+        new = mask & ~bad
+        if new.any():
+            dropped[reason] = int(new.sum())
+        bad |= mask
+    return df[~bad], dropped
+
+
+# ---------- Partitioned parquet ----------
+
+def _is_intraday(interval: str) -> bool:
+    return not interval.endswith(("d", "wk", "mo"))
+
+
+def partition_keys(index: pd.DatetimeIndex, interval: str) -> Tuple[str, pd.Index]:
+    if _is_intraday(interval):
+        return "date", pd.Index(index.strftime("%Y-%m-%d"))
+    return "year", pd.Index(index.year.astype(str))
+
+
+def symbol_dir(symbol: str, interval: str = "1d", root: Path = BARS_DIR) -> Path:
+    return Path(root) / f"interval={interval}" / f"symbol={symbol.upper()}"
+
+
+def _write_parquet(df: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    df.to_parquet(tmp, index=True)
+    os.replace(tmp, path)
+
+
+def write_partitions(symbol: str, df: pd.DataFrame, interval: str = "1d", root: Path = BARS_DIR) -> int:
+    """
+    Merge bars into their partitions; returns the number of partition
+    files written.
+    """
+    if df.empty:
+        return 0
+    base = symbol_dir(symbol, interval, root)
+    key, values = partition_keys(df.index, interval)
+    written = 0
+    for value, part in df.groupby(values.values, sort=True):
+        path = base / f"{key}={value}" / "part.parquet"
+        if path.is_file():
+            old = pd.read_parquet(path)
+            part = pd.concat([old, part])
+            part = part[~part.index.duplicated(keep="last")].sort_index()
+        _write_parquet(part, path)
+        written += 1
+    return written
+
+
+def read_bars(symbol: str, start=None, end=None, interval: str = "1d", root: Path = BARS_DIR) -> pd.DataFrame:
+    """
+    Bars for one symbol in [start, end), reading only the partitions that
+    overlap the range.
+    """
+    base = symbol_dir(symbol, interval, root)
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+
+    parts = []
+    for p in sorted(base.glob("*=*/part.parquet")):
+        value = p.parent.name.split("=", 1)[1]
+        lo = pd.Timestamp(value)
+        hi = lo + (pd.DateOffset(days=1) if _is_intraday(interval) else pd.DateOffset(years=1))
+        if (start is not None and hi <= start) or (end is not None and lo >= end):
+            continue
+        parts.append(pd.read_parquet(p))
+    if not parts:
+        return normalize_bars(None)
+    df = pd.concat(parts).sort_index()
+    if start is not None:
+        df = df[df.index >= start]
+    if end is not None:
+        df = df[df.index < end]
+    return df
+
+
+def last_bar_date(symbol: str, interval: str = "1d", root: Path = BARS_DIR) -> Optional[pd.Timestamp]:
+    base = symbol_dir(symbol, interval, root)
+    parts = sorted(base.glob("*=*/part.parquet"))
+    if not parts:
+        return None
+    df = pd.read_parquet(parts[-1])
+    return None if df.empty else df.index.max()
+
+
+# ---------- Ingest ----------
+
+@dataclass
+class SymbolResult:
+    symbol: str
+    rows: int = 0
+    partitions: int = 0
+    first: Optional[str] = None
+    last: Optional[str] = None
+    dropped: Dict[str, int] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class IngestReport:
+    interval: str
+    provider: str
+    out_dir: str
+    seconds: float = 0.0
+    symbols: List[SymbolResult] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(r.error is None for r in self.symbols)
+
+    def to_dict(self) -> Dict:
+        d = asdict(self)
+        d["ok"] = self.ok
+        d["rows"] = sum(r.rows for r in self.symbols)
+        d["failed"] = [r.symbol for r in self.symbols if r.error]
+        return d
+
+
+def _batches(items: List[str], size: int) -> Iterable[List[str]]:
+    size = max(1, size)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _store_symbol(symbol: str, raw: Optional[pd.DataFrame], interval: str, root: Path) -> SymbolResult:
+    res = SymbolResult(symbol)
+    try:
+        df, res.dropped = validate_bars(raw)
+        res.partitions = write_partitions(symbol, df, interval, root)
+        res.rows = len(df)
+        if res.rows:
+            res.first = df.index.min().isoformat()
+            res.last = df.index.max().isoformat()
+    except Exception as e:
+        res.error = f"{type(e).__name__}: {e}"
+    return res
+
+
+def _ingest_batch(provider: MarketDataProvider, batch: List[str], start, end, interval: str, root: Path) -> List[SymbolResult]:
+    try:
+        frames = provider.fetch_many(batch, start, end, interval)
+    except Exception as e:
+        if len(batch) == 1:
+            return [SymbolResult(batch[0], error=f"{type(e).__name__}: {e}")]
+        # One bad ticker shouldn't sink the batch: retry symbol by symbol
+        return [r for s in batch for r in _ingest_batch(provider, [s], start, end, interval, root)]
+    return [_store_symbol(s, frames.get(s), interval, root) for s in batch]
+
+
+def run_ingest(
+    symbols: Optional[List[str]] = None,
+    start=None,
+    end=None,
+    interval: str = "1d",
+    provider: Optional[MarketDataProvider] = None,
+    out_dir: Path = BARS_DIR,
+    workers: int = DEFAULT_WORKERS,
+    batch_size: Optional[int] = None,
+) -> IngestReport:
+    """
+    Ingest bars for a whole universe.
+
+    symbols defaults to the strategy.yaml universe. Without start, each
+    symbol resumes from its last stored bar (or DEFAULT_LOOKBACK_DAYS
+    back); end defaults to tomorrow so today's bars are included.
+    Batches of symbols are fetched concurrently, at most `workers` at a
+    time; a failing symbol is reported and skipped, never fatal.
+    """
+    symbols = [s.upper() for s in (symbols or load_universe())]
+    provider = provider or provider_from_spec()
+    out_dir = Path(out_dir)
+    end = pd.Timestamp(end) if end is not None else pd.Timestamp(datetime.now().date() + timedelta(days=1))
+    batch_size = batch_size or provider.batch_size
+
+    # Group symbols by start date so each batch is one provider call
+    by_start: Dict[pd.Timestamp, List[str]] = {}
+    for s in symbols:
+        if start is not None:
+            s_start = pd.Timestamp(start)
+        else:
+            last = last_bar_date(s, interval, out_dir)
+            s_start = last.normalize() if last is not None else end - pd.Timedelta(days=DEFAULT_LOOKBACK_DAYS)
+        by_start.setdefault(s_start, []).append(s)
+
+    report = IngestReport(interval=interval, provider=provider.name, out_dir=str(out_dir))
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as ex:
+        futs = [
+            ex.submit(_ingest_batch, provider, batch, s_start, end, interval, out_dir)
+            for s_start, group in by_start.items()
+            if s_start < end
+            for batch in _batches(group, batch_size)
+        ]
+        for fut in as_completed(futs):
+            report.symbols.extend(fut.result())
+    report.symbols.sort(key=lambda r: symbols.index(r.symbol))
+    report.seconds = round(time.perf_counter() - t0, 3)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Bulk-ingest bars for the trading universe into partitioned parquet.")
+    ap.add_argument("--symbols", nargs="*", help="default: universe from strategy.yaml")
+    ap.add_argument("--universe", help="strategy.yaml to read the universe from")
+    ap.add_argument("--start", help="YYYY-MM-DD (default: resume from last stored bar)")
+    ap.add_argument("--end", help="YYYY-MM-DD, exclusive (default: tomorrow)")
+    ap.add_argument("--interval", default="1d")
+    ap.add_argument("--provider", help='"yfinance" or "csv:<dir>" (default: AEGIS_MARKET_PROVIDER or yfinance)')
+    ap.add_argument("--out", default=str(BARS_DIR))
+    ap.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    ap.add_argument("--batch-size", type=int)
+    args = ap.parse_args()
+
+    symbols = args.symbols or load_universe(args.universe)
+    report = run_ingest(
+        symbols, args.start, args.end, args.interval,
+        provider_from_spec(args.provider), Path(args.out), args.workers, args.batch_size,
+    )
+    for r in report.symbols:
+        status = f"ERROR {r.error}" if r.error else f"{r.rows} rows, {r.partitions} partitions"
+        extra = f" dropped={r.dropped}" if r.dropped else ""
+        print(f"[ingest] {r.symbol:<6} {status}{extra}")
+    print(f"[ingest] {len(report.symbols)} symbols via {report.provider} in {report.seconds}s -> {report.out_dir}")
+    raise SystemExit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1,529 @@
-print('features placeholder')
+"""
+Feature engine: one vectorized pass over a (time x symbol) price panel.
+
+    python src/features/build_features.py                          # universe, DEFAULT_FEATURES
+    python src/features/build_features.py --features sma:20 ema:12 zscore:60 --start 2022-01-01
+
+Features are declared as "<kind>:<window>" specs (see KINDS). Every
+indicator is computed for all symbols at once on a 2-D float64 array, so
+the cost grows with bars x features, not with the number of symbols
+times a pandas call each.
+
+Results are cached under data/features/<key>/ where key hashes the
+feature specs and a fingerprint of the input panel (dates, symbols,
+prices). Unchanged data + unchanged specs is a cache hit that
+memory-maps the stored arrays; any new bar or changed spec gets a fresh
+key. build_features() first tries a pre-key made from the bars
+partition files' mtimes and sizes, so a repeat call on untouched bars
+skips reading and hashing the panel altogether.
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# src/ holds the pipeline stages as plain folders; make them importable
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from data_pipeline.ingest import BARS_DIR, DATA_DIR, load_universe, read_bars, symbol_dir
+
+
+FEATURES_DIR = DATA_DIR / "features"
+
+# Bump when any indicator's definition changes, so old caches are ignored
+FEATURE_VERSION = 1
+
+DEFAULT_FEATURES = [
+    "ret:1", "ret:5", "ret:20",
+    "logret:1",
+    "sma:20", "sma:50", "sma:200",
+    "ema:12", "ema:26",
+    "vol:20", "vol:60",
+    "zscore:20",
+]
+
+
+# ---------- Specs ----------
+
+@dataclass(frozen=True)
+class FeatureSpec:
+    """
+    One declared indicator, e.g. FeatureSpec("sma", 20) / "sma:20".
+    """
+    kind: str
+    window: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.kind}_{self.window}"
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{self.window}"
+
+
+def parse_spec(spec: Union[str, FeatureSpec]) -> FeatureSpec:
+    if isinstance(spec, FeatureSpec):
+        out = spec
+    else:
+        kind, _, window = str(spec).strip().lower().partition(":")
+        if not window.isdigit():
+            raise ValueError(f"Feature spec must look like 'kind:window', got {spec!r}")
+        out = FeatureSpec(kind, int(window))
+    if out.kind not in KINDS:
+        raise ValueError(f"Unknown feature kind {out.kind!r}; expected one of {sorted(KINDS)}")
+    if out.window < 1:
+        raise ValueError(f"Feature window must be >= 1, got {spec!r}")
+    return out
+
+
+def parse_specs(specs: Iterable[Union[str, FeatureSpec]]) -> List[FeatureSpec]:
+    out: List[FeatureSpec] = []
+    for s in specs:
+        s = parse_spec(s)
+        if s not in out:
+            out.append(s)
+    return out
+
+
+# ---------- Kernels (axis 0 = time, axis 1 = symbol) ----------
+#
+# All kernels take a (T, N) float64 array that may contain NaN (symbol not
+# trading yet / missing bar) and return the same shape. A window is only
+# "full" when it has `w` valid values, matching pandas'
+# rolling(w, min_periods=w).
+
+def _nan_layout(x: np.ndarray):
+    """
+    How NaN is laid out in x, so rolling kernels can skip the count work:
+    None (no NaN), ("lead", first) when every column is NaN only before
+    its first valid row (late listings, return warm-up), else ("any", valid).
+    """
+    nan = np.isnan(x)
+    if not nan.any():
+        return None
+    valid = ~nan
+    first = np.where(valid.any(axis=0), valid.argmax(axis=0), x.shape[0])
+    if np.array_equal(nan.sum(axis=0), first):
+        return ("lead", first)
+    return ("any", valid)
+
+
+def _rolling_sum(x: np.ndarray, w: int, layout) -> np.ndarray:
+    """
+    Rolling sum over the trailing w rows; NaN where fewer than w rows
+    exist. NaN inputs count as 0 here, _blank_incomplete() fixes those
+    windows afterwards.
+    """
+    t = x.shape[0]
+    s = np.full(x.shape, np.nan)
+    if w > t:
+        return s
+    csum = np.empty((t + 1,) + x.shape[1:])
+    csum[0] = 0.0
+    np.cumsum(np.nan_to_num(x, nan=0.0) if layout is not None else x, axis=0, out=csum[1:])
+    np.subtract(csum[w:], csum[:-w], out=s[w - 1:])
+    return s
+
+
+def _blank_incomplete(values: np.ndarray, layout, w: int) -> np.ndarray:
+    # NaN out windows that are missing any value
+    if layout is None:
+        return values
+    kind, info = layout
+    if kind == "lead":
+        rows = np.arange(values.shape[0])[:, None]
+        values[rows < info[None, :] + (w - 1)] = np.nan
+    else:
+        count = _rolling_sum(info.astype(np.float64), w, None)
+        values[~(count == w)] = np.nan
+    return values
+
+
+def _column_means(x: np.ndarray) -> np.ndarray:
+    # nanmean without the all-NaN-column warning
+    valid = ~np.isnan(x)
+    n = valid.sum(axis=0, keepdims=True)
+    return np.where(valid, x, 0.0).sum(axis=0, keepdims=True) / np.maximum(n, 1)
+
+
+def _rolling_moments(x: np.ndarray, w: int, ddof: int = 1) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rolling mean and sample std from one pair of cumulative sums. Each
+    column is centred on its own mean first, which keeps the
+    sum-of-squares cancellation error negligible for price-level inputs.
+    """
+    layout = _nan_layout(x)
+    mu = _column_means(x) if layout is not None else x.mean(axis=0, keepdims=True)
+    centred = x - mu
+    s = _rolling_sum(centred, w, layout)
+    centred *= centred
+    s2 = _rolling_sum(centred, w, layout)
+
+    mean = s / w
+    if w > ddof:
+        # What's left of sum((x - mean)^2) below float rounding of the
+        # raw sum of squares is noise: a flat window has std 0, as in pandas
+        tol = s2 * (4 * w * np.finfo(np.float64).eps)
+        s *= mean
+        s2 -= s
+        s2[s2 <= tol] = 0.0
+        s2 /= w - ddof
+        np.maximum(s2, 0.0, out=s2, where=~np.isnan(s2))
+        std = np.sqrt(s2, out=s2)
+    else:
+        std = np.full(x.shape, np.nan)
+    mean += mu
+    return _blank_incomplete(mean, layout, w), _blank_incomplete(std, layout, w)
+
+
+def rolling_mean(x: np.ndarray, w: int) -> np.ndarray:
+    layout = _nan_layout(x)
+    s = _rolling_sum(x, w, layout)
+    s /= w
+    return _blank_incomplete(s, layout, w)
+
+
+def rolling_std(x: np.ndarray, w: int) -> np.ndarray:
+    return _rolling_moments(x, w)[1]
+
+
+def ewma(x: np.ndarray, span: int) -> np.ndarray:
+    """
+    Exponential moving average, alpha = 2 / (span + 1), seeded with each
+    symbol's first valid value (pandas ewm(span, adjust=False,
+    ignore_na=True)). NaN inputs give NaN outputs and don't move the
+    state. Loops over time only; every step updates all symbols.
+    """
+    alpha = 2.0 / (span + 1.0)
+    out = np.full(x.shape, np.nan)
+    state = np.full(x.shape[1], np.nan)
+    for t in range(x.shape[0]):
+        row = x[t]
+        ok = ~np.isnan(row)
+        seed = ok & np.isnan(state)
+        state = np.where(seed, row, state)
+        upd = ok & ~seed
+        state = np.where(upd, state + alpha * (row - state), state)
+        out[t] = np.where(ok, state, np.nan)
+    return out
+
+
+def pct_return(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if k < x.shape[0]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[k:] = x[k:] / x[:-k] - 1.0
+    return out
+
+
+def log_return(x: np.ndarray, k: int) -> np.ndarray:
+    out = np.full(x.shape, np.nan)
+    if k < x.shape[0]:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[k:] = np.log(x[k:] / x[:-k])
+    return out
+
+
+def rolling_vol(x: np.ndarray, w: int) -> np.ndarray:
+    # Std of 1-bar simple returns over w bars (not annualised)
+    return rolling_std(pct_return(x, 1), w)
+
+
+def zscore(x: np.ndarray, w: int) -> np.ndarray:
+    mean, std = _rolling_moments(x, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        z = (x - mean) / std
+    return np.where(np.isfinite(z), z, np.nan)
+
+
+KINDS = {
+    "sma": rolling_mean,
+    "ema": ewma,
+    "std": rolling_std,
+    "vol": rolling_vol,
+    "ret": pct_return,
+    "logret": log_return,
+    "zscore": zscore,
+}
+
+
+def compute_features(prices: np.ndarray, specs: Sequence[Union[str, FeatureSpec]]) -> Dict[str, np.ndarray]:
+    """
+    {feature name: (T, N) array} for a (T, N) price array.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    return {s.name: KINDS[s.kind](prices, s.window) for s in parse_specs(specs)}
+
+
+# ---------- Feature sets ----------
+
+@dataclass
+class FeatureSet:
+    """
+    Features for a universe: one (T, N) array per feature name, rows
+    aligned with `index`, columns with `symbols`.
+    """
+    index: pd.DatetimeIndex
+    symbols: List[str]
+    specs: List[FeatureSpec]
+    values: Dict[str, np.ndarray] = field(repr=False)
+    key: Optional[str] = None
+    cached: bool = False
+
+    @property
+    def names(self) -> List[str]:
+        return [s.name for s in self.specs]
+
+    def panel(self, name: str) -> pd.DataFrame:
+        """
+        One feature for every symbol: rows = dates, columns = symbols.
+        """
+        return pd.DataFrame(self.values[name], index=self.index, columns=self.symbols)
+
+    def frame(self, symbol: str) -> pd.DataFrame:
+        """
+        Every feature for one symbol: rows = dates, columns = feature names.
+        """
+        j = self.symbols.index(symbol.upper())
+        return pd.DataFrame({n: self.values[n][:, j] for n in self.names}, index=self.index)
+
+
+def load_panel(
+    symbols: Sequence[str],
+    start=None,
+    end=None,
+    interval: str = "1d",
+    field: str = "adj_close",
+    bars_root: Path = BARS_DIR,
+) -> pd.DataFrame:
+    """
+    Ingested bars -> (dates x symbols) price panel on the union of dates.
+    Falls back to 'close' for symbols without the requested field.
+    """
+    cols = {}
+    for s in symbols:
+        bars = read_bars(s, start, end, interval, bars_root)
+        col = field if field in bars.columns and bars[field].notna().any() else "close"
+        cols[s.upper()] = bars[col] if col in bars.columns else pd.Series(dtype="float64")
+    panel = pd.DataFrame(cols).sort_index()
+    panel.index = pd.DatetimeIndex(panel.index, name="date")
+    return panel.astype("float64")
+
+
+def data_fingerprint(panel: pd.DataFrame) -> str:
+    h = hashlib.sha256()
+    h.update(json.dumps([str(c) for c in panel.columns]).encode("utf-8"))
+    h.update(np.ascontiguousarray(panel.index.asi8).tobytes())
+    h.update(np.ascontiguousarray(panel.to_numpy(dtype=np.float64)).tobytes())
+    return h.hexdigest()
+
+
+def cache_key(specs: Sequence[FeatureSpec], fingerprint: str) -> str:
+    spec = json.dumps({"version": FEATURE_VERSION, "features": [str(s) for s in specs]}, sort_keys=True)
+    return hashlib.sha256(f"{spec}\n{fingerprint}".encode("utf-8")).hexdigest()[:32]
+
+
+def bars_prekey(
+    specs: Sequence[FeatureSpec],
+    symbols: Sequence[str],
+    start=None,
+    end=None,
+    interval: str = "1d",
+    field: str = "adj_close",
+    bars_root: Path = BARS_DIR,
+) -> str:
+    """
+    Cheap stand-in for cache_key(specs, data_fingerprint(panel)) when the
+    panel comes from ingested bars: the request plus (path, mtime_ns,
+    size) of every partition file of the symbols. Only stats, no parquet
+    reads; ingest rewrites a partition file whenever its bars change.
+    """
+    h = hashlib.sha256(json.dumps({
+        "version": FEATURE_VERSION,
+        "features": [str(s) for s in specs],
+        "symbols": list(symbols),
+        "start": None if start is None else str(pd.Timestamp(start)),
+        "end": None if end is None else str(pd.Timestamp(end)),
+        "interval": interval,
+        "field": field,
+    }, sort_keys=True).encode("utf-8"))
+    for sym in symbols:
+        for p in sorted(symbol_dir(sym, interval, bars_root).glob("*=*/part.parquet")):
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            h.update(f"{sym}/{p.parent.name}|{st.st_mtime_ns}|{st.st_size}\n".encode("utf-8"))
+    return h.hexdigest()[:32]
+
+
+# ---------- Cache ----------
+
+_MANIFEST = "manifest.json"
+_MEM: Dict[str, FeatureSet] = {}     # LRU: least recently used first
+_MEM_LOCK = threading.Lock()
+_MEM_MAX = 8
+_PRE: Dict[str, str] = {}            # bars_prekey -> cache_key, guarded by _MEM_LOCK
+_PRE_MAX = 256
+
+
+def _save(fs: FeatureSet, cache_dir: Path) -> Path:
+    final = Path(cache_dir) / fs.key
+    if (final / _MANIFEST).is_file():
+        return final
+    tmp = Path(cache_dir) / f".{fs.key}.{uuid.uuid4().hex[:8]}.tmp"
+    tmp.mkdir(parents=True)
+    np.save(tmp / "index.npy", fs.index.asi8)
+    for i, name in enumerate(fs.names):
+        np.save(tmp / f"f{i}.npy", np.ascontiguousarray(fs.values[name]))
+    # Manifest last: a directory without one is never read
+    (tmp / _MANIFEST).write_text(json.dumps({
+        "version": FEATURE_VERSION,
+        "key": fs.key,
+        "symbols": fs.symbols,
+        "features": [str(s) for s in fs.specs],
+        "rows": len(fs.index),
+        "created_at": time.time(),
+    }), encoding="utf-8")
+    try:
+        os.replace(tmp, final)
+    except OSError:
+        # Another process stored the same key first; theirs is identical
+        shutil.rmtree(tmp, ignore_errors=True)
+    return final
+
+
+def _load(key: str, cache_dir: Path) -> Optional[FeatureSet]:
+    path = Path(cache_dir) / key
+    try:
+        meta = json.loads((path / _MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if meta.get("version") != FEATURE_VERSION:
+        return None
+    specs = parse_specs(meta["features"])
+    values = {s.name: np.load(path / f"f{i}.npy", mmap_mode="r") for i, s in enumerate(specs)}
+    index = pd.DatetimeIndex(np.load(path / "index.npy").astype("datetime64[ns]"), name="date")
+    return FeatureSet(index, list(meta["symbols"]), specs, values, key=key, cached=True)
+
+
+def _remember(fs: FeatureSet) -> None:
+    with _MEM_LOCK:
+        _MEM.pop(fs.key, None)
+        _MEM[fs.key] = fs
+        while len(_MEM) > _MEM_MAX:
+            _MEM.pop(next(iter(_MEM)))
+
+
+def _lookup(key: str, cache_dir: Optional[Path]) -> Optional[FeatureSet]:
+    # Memory first (a hit moves to the most recent end), then disk
+    with _MEM_LOCK:
+        hit = _MEM.pop(key, None)
+        if hit is not None:
+            _MEM[key] = hit
+            return hit
+    if cache_dir is not None:
+        hit = _load(key, cache_dir)
+        if hit is not None:
+            _remember(hit)
+            return hit
+    return None
+
+
+def features_for_panel(
+    panel: pd.DataFrame,
+    features: Iterable[Union[str, FeatureSpec]] = DEFAULT_FEATURES,
+    cache_dir: Optional[Path] = FEATURES_DIR,
+) -> FeatureSet:
+    """
+    Features for an in-memory (dates x symbols) panel, via the cache.
+    cache_dir=None computes without touching disk.
+    """
+    specs = parse_specs(features)
+    key = cache_key(specs, data_fingerprint(panel))
+    hit = _lookup(key, cache_dir)
+    if hit is not None:
+        return hit
+
+    values = compute_features(panel.to_numpy(dtype=np.float64), specs)
+    fs = FeatureSet(pd.DatetimeIndex(panel.index, name="date"), [str(c) for c in panel.columns], specs, values, key=key)
+    if cache_dir is not None:
+        _save(fs, cache_dir)
+    _remember(fs)
+    return fs
+
+
+def build_features(
+    symbols: Optional[Sequence[str]] = None,
+    start=None,
+    end=None,
+    features: Iterable[Union[str, FeatureSpec]] = DEFAULT_FEATURES,
+    interval: str = "1d",
+    field: str = "adj_close",
+    bars_root: Path = BARS_DIR,
+    cache_dir: Optional[Path] = FEATURES_DIR,
+) -> FeatureSet:
+    """
+    Features for the universe (strategy.yaml by default) from ingested
+    bars. This is what strategies and training should call instead of
+    computing indicators inline.
+    """
+    symbols = [s.upper() for s in (symbols or load_universe())]
+    specs = parse_specs(features)
+    pre = bars_prekey(specs, symbols, start, end, interval, field, bars_root)
+    with _MEM_LOCK:
+        key = _PRE.get(pre)
+    if key is not None:
+        hit = _lookup(key, cache_dir)
+        if hit is not None:
+            return hit
+
+    panel = load_panel(symbols, start, end, interval, field, bars_root)
+    fs = features_for_panel(panel, specs, cache_dir)
+    with _MEM_LOCK:
+        _PRE.pop(pre, None)
+        _PRE[pre] = fs.key
+        while len(_PRE) > _PRE_MAX:
+            _PRE.pop(next(iter(_PRE)))
+    return fs
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compute cached features for the trading universe.")
+    ap.add_argument("--symbols", nargs="*", help="default: universe from strategy.yaml")
+    ap.add_argument("--features", nargs="*", default=DEFAULT_FEATURES, help='specs like "sma:20" "zscore:60"')
+    ap.add_argument("--start")
+    ap.add_argument("--end")
+    ap.add_argument("--interval", default="1d")
+    ap.add_argument("--field", default="adj_close")
+    ap.add_argument("--bars", default=str(BARS_DIR))
+    ap.add_argument("--cache", default=str(FEATURES_DIR))
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    fs = build_features(args.symbols, args.start, args.end, args.features, args.interval, args.field,
+                        Path(args.bars), Path(args.cache))
+    ms = (time.perf_counter() - t0) * 1000.0
+    print(f"[features] {len(fs.names)} features x {len(fs.symbols)} symbols x {len(fs.index)} bars "
+          f"({'cache hit' if fs.cached else 'computed'}, {ms:.0f} ms) -> {Path(args.cache) / fs.key}")
+
+
+if __name__ == "__main__":
+    main()
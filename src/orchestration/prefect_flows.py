@@ -1,9 +1,36 @@
+import sys
+from pathlib import Path
+
 from prefect import flow, task
 
+# src/ holds the pipeline stages as plain folders; make them importable
+SRC = Path(__file__).resolve().parents[1]
+if str(SRC) not in sys.path:
+    sys.path.insert(0, str(SRC))
+
+from data_pipeline.ingest import run_ingest
+from features.build_features import build_features
+
+@task(retries=2, retry_delay_seconds=60)
+def ingest():
+    # Universe from strategy.yaml; provider from AEGIS_MARKET_PROVIDER
+    # (e.g. csv:<dir> for offline runs). Each symbol resumes from its last bar.
+    report = run_ingest()
+    print(f"INGEST (Prefect): {sum(r.rows for r in report.symbols)} rows, "
+          f"{len(report.symbols)} symbols in {report.seconds}s")
+    failed = [r.symbol for r in report.symbols if r.error]
+    if failed:
+        print(f"INGEST (Prefect): failed symbols {failed}")
+    return report.to_dict()
+
 @task
-def ingest(): print("INGEST (Prefect): new data")
-@task
-def features(): print("FEATURES (Prefect): build features")
+def features():
+    # Cached by feature spec + data fingerprint, so a day without new bars is a hit
+    fs = build_features()
+    print(f"FEATURES (Prefect): {len(fs.names)} features x {len(fs.symbols)} symbols x "
+          f"{len(fs.index)} bars ({'cached' if fs.cached else 'computed'}) key={fs.key}")
+    return fs.key
+
 @task
 def train(): print("TRAIN (Prefect): training job")
 @task